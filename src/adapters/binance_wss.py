@@ -1,19 +1,155 @@
 import asyncio
 import base64
+import itertools
+import os
+import random
+import ssl
 import time
+import zlib
+from collections.abc import Coroutine
+from pathlib import Path
 from typing import Any
 from urllib.parse import urlencode
 
 import structlog
-from aiohttp import ClientSession, ClientWebSocketResponse, WSMsgType, client_exceptions
+from aiohttp import ClientSession, ClientWebSocketResponse, TCPConnector, WSMsgType, client_exceptions
 from cryptography.hazmat.primitives.serialization import load_pem_private_key
-from msgspec import json
+from msgspec import DecodeError, Struct, ValidationError, json
 
+from adapters.recorder import FrameRecorder
+from core.metrics import metrics
+from core.order_book import OrderBooks
+from models import BookTicker, DepthUpdate, StreamEvent, Trade
+from models.fixed import AMOUNT_DECIMALS, format_fixed, fraction_digits, parse_fixed
 from settings import settings
 
 logger = structlog.get_logger(__name__)
 decoder = json.Decoder()
 encoder = json.Encoder()
+# strict=False parses "price" strings straight into floats
+event_decoder = json.Decoder(StreamEvent | DepthUpdate, strict=False)
+book_ticker_decoder = json.Decoder(BookTicker, strict=False)
+# per-message logs are skipped entirely (no coroutine, no formatting) when DEBUG is disabled
+DEBUG_LOGS = settings.LOGLEVEL.upper() == "DEBUG"
+# ws-api responses forwarded to the events queue, the channel is "private_<suffix>"
+RESPONSE_CHANNELS = {
+    "account.status": "account_status",
+    "exchangeInfo": "exchangeinfo",
+    "trades.recent": "trades_recent",
+}
+DEDUP_WINDOW = 4096  # trade ids per symbol remembered by the redundant market data arbitration
+# newClientOrderId prefix: process start time and pid, so ids of the restarted bot never repeat the persisted ones
+CLIENT_ORDER_PREFIX = f"tb{time.time_ns() // 1_000_000:x}{os.getpid():x}-"
+client_order_numbers = itertools.count(1)
+
+
+class RequestError(Exception):
+    """ws-api error response (status 0 - request was not sent)"""
+
+    def __init__(self, method: str, status: int, code: int = 0, msg: str = "") -> None:
+        super().__init__(f"{method} failed with status {status}: {code} {msg}".rstrip())
+        self.method = method
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+class PendingRequest:
+    __slots__ = ("method", "symbol", "future", "sent_at", "timeout_handle")
+
+    def __init__(self, method: str, symbol: str, future: asyncio.Future, sent_at: int) -> None:
+        self.method = method
+        self.symbol = symbol
+        self.future = future
+        self.sent_at = sent_at  # perf_counter_ns
+        self.timeout_handle: asyncio.TimerHandle | None = None
+
+
+class Backoff:
+    """Reconnect delays: the first retry is immediate (most drops are one-off), next ones grow exponentially with
+    equal jitter, so channels and workers do not reconnect in lockstep. A connection that stayed up for reset_after
+    seconds resets the attempts."""
+
+    def __init__(self, base: float, cap: float, reset_after: float = 60.0) -> None:
+        self.base = base
+        self.cap = cap
+        self.reset_after = reset_after
+        self.attempts = 0
+
+    def next_delay(self, uptime: float = 0.0) -> float:
+        if uptime >= self.reset_after:
+            self.attempts = 0
+        self.attempts += 1
+        if self.attempts == 1:
+            return 0.0
+        ceiling = min(self.cap, self.base * 2 ** (self.attempts - 2))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)  # noqa: S311
+
+
+class TradeWindow:
+    """Trade ids of a symbol seen among the last `size` ids: the newest id and a bitmask (bit n - id newest - n),
+    with the first arrival time of each id in a ring"""
+
+    __slots__ = ("size", "mask", "newest", "seen", "arrived_at")
+
+    def __init__(self, size: int = DEDUP_WINDOW) -> None:
+        self.size = size
+        self.mask = (1 << size) - 1
+        self.newest = 0
+        self.seen = 0
+        self.arrived_at = [0] * size
+
+    def add(self, trade_id: int, received_at: int) -> bool:
+        """True on the first arrival of the id, ids older than the window are considered seen"""
+        if trade_id > self.newest:
+            shift = trade_id - self.newest
+            self.seen = ((self.seen << shift) | 1) & self.mask if shift < self.size else 1
+            self.newest = trade_id
+        else:
+            age = self.newest - trade_id
+            if age >= self.size or self.seen >> age & 1:
+                return False
+            self.seen |= 1 << age
+        self.arrived_at[trade_id % self.size] = received_at
+        return True
+
+    def arrived(self, trade_id: int) -> int:
+        """First arrival time (perf_counter_ns) of a seen id, 0 if it is out of the window"""
+        return self.arrived_at[trade_id % self.size] if self.newest - trade_id < self.size else 0
+
+
+class TradeArbiter:
+    """First-arrival arbitration of trades from redundant connections: a trade id goes to the queue once, from the
+    connection which delivered it first. Per connection: share of the first arrivals and the lag behind the winner."""
+
+    def __init__(self, window: int = DEDUP_WINDOW) -> None:
+        self.window = window
+        self.symbols: dict[str, TradeWindow] = {}
+        self.trades: dict[str, int] = {}  # channel -> received trades
+        self.wins: dict[str, int] = {}  # channel -> trades delivered first
+
+    def register(self, channel: str) -> None:
+        self.trades[channel] = self.wins[channel] = 0
+        metrics.gauge("feed_trades", lambda: self.trades[channel], channel=channel)
+        metrics.gauge("feed_win_rate", lambda: self.wins[channel] / max(self.trades[channel], 1), channel=channel)
+
+    def first_arrival(self, channel: str, trade: Trade) -> bool:
+        self.trades[channel] += 1
+        if not trade.trade_id:
+            return True  # nothing to deduplicate by
+        if (window := self.symbols.get(trade.symbol)) is None:
+            window = self.symbols[trade.symbol] = TradeWindow(self.window)
+        if window.add(trade.trade_id, trade.received_at):
+            self.wins[channel] += 1
+            return True
+        if (first_at := window.arrived(trade.trade_id)) and trade.received_at:
+            metrics.observe(f"{channel}_feed_lag", first_at, trade.received_at)
+        return False
+
+
+def new_client_order_id() -> str:
+    """Unique id of an order.place (at most 36 characters), the executionReport and order.status carry it back"""
+    return f"{CLIENT_ORDER_PREFIX}{next(client_order_numbers)}"
 
 
 class SingletonMeta(type):
@@ -25,15 +161,36 @@ class SingletonMeta(type):
             cls._instances[cls] = instance
         return cls._instances[cls]
 
+    def new_instance(cls, *args: Any, **kwargs: Any) -> Any:
+        """Instance besides the singleton (redundant connections)"""
+        return super(SingletonMeta, cls).__call__(*args, **kwargs)
+
 
 class BinanceWSS(metaclass=SingletonMeta):
     wss_client: ClientWebSocketResponse = None
     queue: asyncio.Queue = None  # type: ignore
-
-    def __init__(self, symbol: str, channel: str, url: str) -> None:
-        self.symbol = symbol
+    recorder: FrameRecorder | None = None
+    log_sample: int = max(settings.LOG_SAMPLE_TRADES, 1)  # log 1 in N received frames (DEBUG)
+    session: ClientSession | None = None  # shared by all connections of the process, see client_session
+    arbiter: TradeArbiter | None = None  # set for redundant market data connections, see MarketDataFeed
+    books: OrderBooks | None = None  # local order books (ORDER_BOOK), updated by the depth connection
+
+    def __init__(self, symbols: list[str], channel: str, url: str) -> None:
+        self.frames_count = 0
+        self.set_symbols(symbols)
         self.wss_url = url
         self.channel = channel
+        self.stream = settings.WSS_PUBLIC_STREAM  # subscribed stream of the symbols
+        self.backoff = Backoff(settings.WSS_RECONNECT_DELAY, settings.WSS_RECONNECT_MAX_DELAY)
+        self.tasks: set[asyncio.Task] = set()  # child tasks of the current connection, see spawn
+        self.connected_at = 0.0  # monotonic, 0 - not connected
+        self.disconnected_at = 0  # perf_counter_ns of the last drop, for the reconnect downtime
+        metrics.gauge("connection_up", lambda: int(bool(self.connected_at)), channel=channel)
+        metrics.gauge("connection_tasks", lambda: len(self.tasks), channel=channel)
+
+    def set_symbols(self, symbols: list[str]) -> None:
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.symbol = self.symbols[0]
 
     def create_ws_message(self, method: str) -> dict[str, Any]:
         timestamp = int(time.time() * 1000)
@@ -47,7 +204,7 @@ class BinanceWSS(metaclass=SingletonMeta):
                 payload.update(
                     {
                         "id": f"subscribe_{self.symbol}_{timestamp}".lower(),
-                        "params": [f"{self.symbol.lower()}@trade"],
+                        "params": [f"{symbol.lower()}@{self.stream}" for symbol in self.symbols],
                     }
                 )
         return payload
@@ -58,28 +215,68 @@ class BinanceWSS(metaclass=SingletonMeta):
 
     async def after_cancel(self) -> None: ...
 
-    async def send_json(self, message: dict[str, Any]) -> None:
-        await logger.adebug(message, channel=self.channel)
+    async def after_disconnect(self) -> None: ...
+
+    @staticmethod
+    def client_session() -> ClientSession:
+        """One session per process: connections share the connector with its DNS cache and TLS context"""
+        if BinanceWSS.session is None or BinanceWSS.session.closed:
+            connector = TCPConnector(ssl=ssl.create_default_context(), ttl_dns_cache=300, limit=0)
+            BinanceWSS.session = ClientSession(connector=connector)
+        return BinanceWSS.session
+
+    @staticmethod
+    async def close_session() -> None:
+        if BinanceWSS.session:
+            await BinanceWSS.session.close()
+            BinanceWSS.session = None
+
+    def spawn(self, coro: Coroutine[Any, Any, None]) -> asyncio.Task:
+        """Task owned by the current connection, cancelled when it is lost"""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def cancel_tasks(self) -> None:
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def send_json(self, message: dict[str, Any]) -> bool:
+        if DEBUG_LOGS:
+            await logger.adebug(message, channel=self.channel)
         if self.wss_client:
             try:
                 await self.wss_client.send_str(encoder.encode(message).decode(), compress=False)
+                return True
             except client_exceptions.ClientError:
                 await logger.awarning("Failed to send message", message=message, channel=self.channel, exc_info=True)
         else:
             await logger.awarning("WebSocket connection not established", channel=self.channel)
+        return False
 
     async def wss_connect(self, queue: asyncio.Queue) -> None:
+        """Connection supervisor: reconnects with backoff, child tasks of the lost connection are cancelled first"""
         self.queue = queue
+        delay = 0.0
         while True:
             try:
-                async with ClientSession() as session:
-                    await logger.ainfo(f"Connecting to {self.channel} wss channel", channel=self.channel)
-                    async with session.ws_connect(self.wss_url, autoclose=False) as wss:
-                        self.wss_client = wss
-                        await self.after_connect()
-                        await self.receive_messages(queue)
+                if delay:
+                    await asyncio.sleep(delay)
+                await logger.ainfo(f"Connecting to {self.channel} wss channel", channel=self.channel)
+                metrics.inc("connections_total", channel=self.channel)
+                async with self.client_session().ws_connect(self.wss_url, autoclose=False) as wss:
+                    self.connected(wss)
+                    await self.after_connect()
+                    await self.receive_messages(queue)
+                await logger.awarning(
+                    "WebSocket closed, attempting to reconnect...", channel=self.channel, close_code=wss.close_code
+                )
             except asyncio.CancelledError:
                 logger.info(f"Task was cancelled: {self.__class__.__name__}")
+                await self.cancel_tasks()
                 if self.wss_client:
                     await self.wss_client.close()
                 await self.after_cancel()
@@ -88,36 +285,99 @@ class BinanceWSS(metaclass=SingletonMeta):
                 await logger.awarning(
                     "WebSocket connection failed, attempting to reconnect...", channel=self.channel, exception=err
                 )
-                await asyncio.sleep(0.25)  # wait before attempting to reconnect
+            delay = await self.disconnected()
+
+    def connected(self, wss: ClientWebSocketResponse) -> None:
+        self.wss_client = wss
+        self.connected_at = time.monotonic()
+        if self.disconnected_at:
+            metrics.observe(f"{self.channel}_reconnect", self.disconnected_at, time.perf_counter_ns())
+        metrics.mark(f"{self.channel}_connected")
+
+    async def disconnected(self) -> float:
+        """Cleanup of the lost connection (or failed attempt), returns the delay before the next attempt"""
+        uptime = time.monotonic() - self.connected_at if self.connected_at else 0.0
+        if self.connected_at:
+            self.disconnected_at = time.perf_counter_ns()
+        self.wss_client, self.connected_at = None, 0.0  # type: ignore
+        await self.cancel_tasks()
+        await self.after_disconnect()
+        metrics.inc("reconnects_total", channel=self.channel)
+        return self.backoff.next_delay(uptime)
 
     async def receive_messages(self, queue: asyncio.Queue) -> None:
-        while True:
-            if not self.wss_client:
-                await logger.awarning("WebSocket connection not established", channel=self.channel)
-                await asyncio.sleep(0.25)
-                continue
-            async for msg in self.wss_client:  # type: ignore
-                if msg.type == WSMsgType.TEXT:
-                    message = decoder.decode(msg.data)
-                    try:
-                        await self.process_message(message, queue)
-                    except Exception:
-                        await logger.awarning(
-                            "Failed process message", message=message, channel=self.channel, exc_info=True
-                        )
-
-                elif msg.type in (WSMsgType.ERROR, WSMsgType.CLOSED):
-                    await logger.awarning("WebSocket closed", channel=self.channel)
-                    break
-                else:
-                    await logger.awarning(f"Unknown MsgType: {msg.type}", channel=self.channel)
-
-    async def process_message(self, message: dict[str, Any], queue: asyncio.Queue) -> None:
-        message_id, message_ts = self.parse_message_metadata(message)
-        message["channel"] = self.channel
+        """Returns when the connection is closed"""
+        if not self.wss_client:
+            await logger.awarning("WebSocket connection not established", channel=self.channel)
+            return
+        async for msg in self.wss_client:  # type: ignore
+            if msg.type == WSMsgType.TEXT:
+                received_at = time.perf_counter_ns()
+                if self.recorder:
+                    self.recorder.record(self.channel, msg.data)
+                try:
+                    message = self.decode_message(msg.data)
+                except DecodeError:  # a malformed frame must not tear down the connection
+                    await logger.awarning("Failed decode message", data=msg.data, channel=self.channel, exc_info=True)
+                    continue
+                metrics.received(self.channel, message, received_at)
+                try:
+                    await self.process_message(message, queue)
+                except Exception:
+                    await logger.awarning(
+                        "Failed process message", message=message, channel=self.channel, exc_info=True
+                    )
+
+            elif msg.type in (WSMsgType.ERROR, WSMsgType.CLOSED):
+                break
+            else:
+                await logger.awarning(f"Unknown MsgType: {msg.type}", channel=self.channel)
 
-        if message.get("e", ""):
+    @staticmethod
+    def decode_message(
+        data: str | bytes | memoryview, received_ms: int = 0
+    ) -> dict[str, Any] | StreamEvent | DepthUpdate:
+        """Decode stream events (frames starting with the "e" key) and bookTicker updates (starting with the "u" key)
+        straight into typed structs, anything else to dict. bookTicker has no exchange time, its trade_time is the
+        receive time (ms, now by default) for the trader clock checks and the indicator bars"""
+        prefix = data[:5]
+        if prefix in ('{"e":', b'{"e":'):
+            try:
+                return event_decoder.decode(data)
+            except ValidationError:
+                pass  # unknown event type, fallback to the generic decoder
+        elif prefix in ('{"u":', b'{"u":'):
+            ticker = book_ticker_decoder.decode(data)
+            ticker.trade_time = received_ms or time.time_ns() // 1_000_000  # event_time stays 0, see metrics.received
+            return ticker
+        return decoder.decode(data)
+
+    async def process_message(self, message: dict[str, Any] | StreamEvent | DepthUpdate, queue: asyncio.Queue) -> None:
+        if isinstance(message, DepthUpdate):
+            if self.books:
+                self.books.apply(message)
+            return
+        if isinstance(message, Struct):
+            if self.arbiter and isinstance(message, Trade) and not self.arbiter.first_arrival(self.channel, message):
+                return
             queue.put_nowait(message)
+        else:
+            message["channel"] = self.channel
+            if message.get("e", ""):
+                queue.put_nowait(message)
+
+        if DEBUG_LOGS and self.sampled():
+            await self.log_message(message)
+
+    def sampled(self) -> bool:
+        self.frames_count += 1
+        return self.frames_count % self.log_sample == 0
+
+    async def log_message(self, message: dict[str, Any] | StreamEvent | DepthUpdate) -> None:
+        if isinstance(message, Struct):
+            message_ts = message.event_time
+        else:
+            _, message_ts = self.parse_message_metadata(message)
 
         if latency := self.calc_latency(message_ts):
             await logger.adebug(message, channel=self.channel, latency=latency)
@@ -125,10 +385,10 @@ class BinanceWSS(metaclass=SingletonMeta):
             await logger.adebug(message, channel=self.channel)
 
     def parse_message_metadata(self, message: dict[str, Any]) -> tuple[str, int]:
-        if "_" in message.get("id", ""):
-            message_id, message_ts = message.get("id", "").rsplit("_", 1)
+        if isinstance(message_id := message.get("id"), str) and "_" in message_id:
+            message_id, message_ts = message_id.rsplit("_", 1)
         else:
-            message_id, message_ts = "public", message.get("id", 0)
+            message_id, message_ts = "public", 0  # ws-api ids are counters, see BinancePrivateWSS.request
         if message.get("e") and message.get("E"):
             message_ts = int(message["E"])
         return message_id, int(message_ts)
@@ -136,20 +396,37 @@ class BinanceWSS(metaclass=SingletonMeta):
     def calc_latency(self, message_ts: int | str) -> int:
         if isinstance(message_ts, str):
             message_ts = int(message_ts) if message_ts.isdigit() else 0
-        elif not isinstance(message_ts, int):
+        if not isinstance(message_ts, int) or not message_ts:
             return 0
         return int(time.time() * 1000) - message_ts
 
 
 class BinancePrivateWSS(BinanceWSS):
-    extra_tasks: list[asyncio.Task] = []
-
-    def __init__(self, symbol: str, channel: str, url: str, api_key: str, private_key_base64: str) -> None:
-        super().__init__(symbol, channel, url)
+    log_sample = 1  # every private frame is logged
+    auth_complete: bool = False
+    # requests sent after connect without waiting for responses, the supervisor and its workers split them
+    # (account / trading). userDataStream.start goes first: the user stream connection is the longest startup chain.
+    startup_methods: tuple[str, ...] = (
+        "userDataStream.start",
+        "session.logon",
+        "account.status",
+        "exchangeInfo",
+        "trades.recent",
+    )
+
+    def __init__(
+        self, symbols: list[str], channel: str, url: str, api_key: str, private_key_base64: str, offline: bool = False
+    ) -> None:
+        super().__init__(symbols, channel, url)
         self.listen_key = None
+        self.request_ids = itertools.count(1)  # compact ids, unique for the process lifetime
+        self.pending: dict[int, PendingRequest] = {}
+        self.step_sizes: dict[str, str] = {}  # symbol -> LOT_SIZE stepSize
+        self.order_templates: dict[tuple[str, str, float], str] = {}  # (symbol, side, quantity) -> order.place
         if not hasattr(self, "api_initialized"):
             self.api_key = api_key
-            self.private_key = self.load_private_key(private_key_base64)
+            # offline tools (backtest, sweep) send orders to a simulated exchange and have no key to load
+            self.private_key: Any = None if offline else self.load_private_key(private_key_base64)
             self.api_initialized = True
 
     @staticmethod
@@ -165,10 +442,11 @@ class BinancePrivateWSS(BinanceWSS):
     def generate_signature(self, data: str) -> str:
         return base64.b64encode(self.private_key.sign(data.encode())).decode()
 
-    def create_ws_message(self, method: str) -> dict[str, Any]:
+    def create_ws_message(self, method: str, symbol: str | None = None) -> dict[str, Any]:
         timestamp = int(time.time() * 1000)
+        symbol = symbol or self.symbol
         payload = {
-            "id": f"{method}_{timestamp}".replace(".", "_").lower(),
+            "id": next(self.request_ids),
             "method": method,
             "params": {"apiKey": self.api_key, "timestamp": timestamp},
         }
@@ -178,9 +456,13 @@ class BinancePrivateWSS(BinanceWSS):
                 pre_signature = {"apiKey": self.api_key, "timestamp": timestamp}
                 payload["params"]["signature"] = self.generate_signature(urlencode(pre_signature))  # type: ignore
             case "exchangeInfo":
-                payload["params"] = {"symbols": [self.symbol.upper()]}  # type: ignore
+                payload["params"] = {"symbols": self.symbols}  # type: ignore
             case "trades.recent":
-                payload["params"] = {"symbol": self.symbol.upper(), "limit": 1}  # type: ignore
+                payload["params"] = {"symbol": symbol, "limit": 1}  # type: ignore
+            case "depth":
+                payload["params"] = {"symbol": symbol, "limit": settings.ORDER_BOOK_DEPTH}  # type: ignore
+            case "order.status":
+                payload["params"] = {"symbol": symbol, "timestamp": timestamp}  # type: ignore
             case "userDataStream.start":
                 payload["params"] = {"apiKey": self.api_key}  # type: ignore
             case "userDataStream.ping":
@@ -188,102 +470,314 @@ class BinancePrivateWSS(BinanceWSS):
 
         return payload
 
+    async def depth_snapshot(self, symbol: str) -> dict[str, Any]:
+        """Order book snapshot (lastUpdateId, bids, asks) for OrderBooks"""
+        response = await self.request(self.create_ws_message("depth", symbol=symbol), symbol=symbol)
+        return (await response)["result"]
+
+    async def order_status(self, symbol: str, client_order_id: str) -> dict[str, Any]:
+        """Order by its newClientOrderId (status, executedQty, cummulativeQuoteQty), RequestError -2013 if the
+        exchange has no such order"""
+        message = self.create_ws_message("order.status", symbol=symbol)
+        message["params"]["origClientOrderId"] = client_order_id
+        response = await self.request(message, symbol=symbol)
+        return (await response)["result"]
+
     async def user_data_stream_connect(self) -> None:
         if self.queue and self.listen_key:
-            await UserStreamWSS(
-                symbol=self.symbol,
+            user_stream = UserStreamWSS(
+                symbols=self.symbols,
                 channel="user_stream",
-                url="wss://testnet.binance.vision/ws",
+                url=settings.WSS_USER_STREAM_URL,
                 listen_key=self.listen_key,
-            ).wss_connect(self.queue)
+            )
+            user_stream.wss_url = f"{settings.WSS_USER_STREAM_URL}/{self.listen_key}"  # singleton, key of this session
+            await user_stream.wss_connect(self.queue)
 
     async def user_data_stream_ping_worker(self) -> None:
         while True:
             await asyncio.sleep(60 * 30)  # send ping every 30 minutes
             await logger.ainfo("Sending UserStream listenKey update.", channel=self.channel)
-            await self.send_json(self.create_ws_message("userDataStream.ping"))  # type: ignore
+            await self.request(self.create_ws_message("userDataStream.ping"))
+
+    async def wss_connect(self, queue: asyncio.Queue) -> None:
+        self.load_exchange_info_cache(queue)
+        await super().wss_connect(queue)
+
+    def load_exchange_info_cache(self, queue: asyncio.Queue) -> None:
+        """Last good exchangeInfo is used optimistically, the fresh response is parsed again when it arrives"""
+        if not settings.EXCHANGE_INFO_CACHE or "exchangeInfo" not in self.startup_methods:
+            return
+        try:
+            exchange_info = decoder.decode(self.exchange_info_cache_path().read_bytes())
+        except (OSError, ValueError):
+            return  # no cache yet or broken file
+        if not set(self.symbols) <= {details.get("symbol") for details in exchange_info.get("symbols", [])}:
+            return
+
+        self.prepare_order_templates(exchange_info)
+        queue.put_nowait({"status": 200, "result": exchange_info, "channel": f"{self.channel}_exchangeinfo"})
+        metrics.mark("exchange_info_cached")
+        logger.info("Exchange info loaded from cache", channel=self.channel, path=str(self.exchange_info_cache_path()))
+
+    def exchange_info_cache_path(self) -> Path:
+        """File per symbols set: workers request exchangeInfo of their own shard and must not overwrite each other"""
+        path = Path(settings.EXCHANGE_INFO_CACHE)
+        symbols = "-".join(sorted(self.symbols))
+        if len(symbols) > 64:
+            symbols = f"{zlib.crc32(symbols.encode()):08x}"
+        return path.with_name(f"{path.stem}.{symbols}{path.suffix}")
+
+    def save_exchange_info_cache(self, exchange_info: dict[str, Any]) -> None:
+        if not settings.EXCHANGE_INFO_CACHE or not exchange_info.get("symbols"):
+            return
+        path = self.exchange_info_cache_path()
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")  # workers may write at the same time
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(encoder.encode(exchange_info))
+            os.replace(temp_path, path)
+        except OSError:
+            logger.warning("Failed to save exchange info cache", channel="private", exc_info=True)
 
     async def after_cancel(self) -> None:
-        if self.extra_tasks:
-            for task in self.extra_tasks:
-                task.cancel()
+        self.fail_pending(ConnectionError("WebSocket connection closed"))
+
+    async def after_disconnect(self) -> None:
+        self.auth_complete = False
+        self.fail_pending(ConnectionError("WebSocket connection lost"))  # responses never come on a new connection
 
     async def after_connect(self) -> None:
         if self.wss_client:
-            for method in (
-                "session.logon",
-                "trades.recent",
-                "exchangeInfo",
-                "account.status",
-                "userDataStream.start",
-            ):
-                await self.send_json(self.create_ws_message(method))
+            for method in self.startup_methods:
+                if method == "trades.recent":
+                    for symbol in self.symbols:
+                        await self.request(self.create_ws_message(method, symbol=symbol), symbol=symbol)
+                else:
+                    await self.request(self.create_ws_message(method))
         else:
             await logger.awarning("WebSocket connection not established", channel=self.channel)
 
-    async def process_message(self, message: dict[str, Any], queue: asyncio.Queue) -> None:
+    async def request(
+        self, message: dict[str, Any], symbol: str = "", timeout: float = settings.WSS_API_TIMEOUT, sent_at: int = 0
+    ) -> asyncio.Future:
+        """Send ws-api request, the future is resolved with the response of the same id, failed with RequestError
+        on the error response and with TimeoutError if there is no response in time. Awaiting it is optional,
+        failures are logged here."""
+        future = self.register_request(message["method"], message["id"], symbol, timeout, sent_at)
+        if not await self.send_json(message):
+            self.request_failed(message["id"], RequestError(message["method"], 0, msg="request was not sent"))
+        return future
+
+    def register_request(
+        self,
+        method: str,
+        request_id: int,
+        symbol: str = "",
+        timeout: float = settings.WSS_API_TIMEOUT,
+        sent_at: int = 0,
+    ) -> asyncio.Future:
+        """Registered before sending, the response may be received while the frame is being written"""
+        loop = asyncio.get_running_loop()
+        request = PendingRequest(method, symbol, loop.create_future(), sent_at or time.perf_counter_ns())
+        request.future.add_done_callback(self.request_done)
+        request.timeout_handle = loop.call_later(timeout, self.request_failed, request_id)
+        self.pending[request_id] = request
+        metrics.inc("ws_requests_total", method=method)
+        return request.future
+
+    def failed_request(self, error: Exception) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(self.request_done)
+        future.set_exception(error)
+        return future
+
+    def request_done(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and (error := future.exception()):  # retrieved, so never reported by asyncio
+            logger.warning(f"ws-api request failed: {error}", channel=self.channel)
+
+    def request_failed(self, request_id: int, error: Exception | None = None) -> None:
+        """Fail pending request, without the error it is the response timeout"""
+        if request := self.pending.pop(request_id, None):
+            if error is None:
+                metrics.inc("ws_request_timeouts_total", method=request.method)
+                error = TimeoutError(f"{request.method} response timeout")
+            elif request.timeout_handle:
+                request.timeout_handle.cancel()
+            request.future.set_exception(error)
+
+    def fail_pending(self, error: Exception) -> None:
+        pending, self.pending = self.pending, {}
+        for request in pending.values():
+            if request.timeout_handle:
+                request.timeout_handle.cancel()
+            request.future.set_exception(error)
+
+    def resolve_request(self, message: dict[str, Any]) -> PendingRequest | None:
+        """Match the response with its request: RTT metrics, future result or RequestError"""
+        if (request := self.pending.pop(message.get("id"), None)) is None:  # type: ignore
+            return None  # unknown or timed out request
+        if request.timeout_handle:
+            request.timeout_handle.cancel()
+        stage = "order_to_response" if request.method == "order.place" else "request_to_response"
+        metrics.observe(stage, request.sent_at, time.perf_counter_ns())
+
+        if (status := message.get("status", 200)) == 200:
+            request.future.set_result(message)
+            return request
+        error = message.get("error", {})
+        metrics.inc("ws_request_errors_total", method=request.method)
+        request.future.set_exception(RequestError(request.method, status, error.get("code", 0), error.get("msg", "")))
+        return None
+
+    async def process_message(self, message: dict[str, Any] | StreamEvent | DepthUpdate, queue: asyncio.Queue) -> None:
         await super().process_message(message, queue)
+        if not isinstance(message, dict) or not (request := self.resolve_request(message)):
+            return
 
-        message_id, message_ts = message.get("id", "").rsplit("_", 1)
-        latency = int(time.time() * 1000) - int(message_ts) if message_ts.isdigit() else -1
-
-        match message_id:
-            case "session_logon":
-                await logger.ainfo(f"Auth Done ({message_id}) for {latency}ms", channel=self.channel)
+        match request.method:
+            case "session.logon":
+                rtt = (time.perf_counter_ns() - request.sent_at) // 1_000_000
+                await logger.ainfo(f"Auth Done (session.logon) for {rtt}ms", channel=self.channel)
                 self.auth_complete = True
-            case "account_status" | "exchangeinfo" | "trades_recent":
-                queue.put_nowait({**message, **{"channel": f"{self.channel}_{message_id}"}})
-            case "userdatastream_start":
+                metrics.mark("logon")
+            case "exchangeInfo":
+                self.prepare_order_templates(message.get("result", {}))
+                queue.put_nowait({**message, **{"channel": f"{self.channel}_{RESPONSE_CHANNELS[request.method]}"}})
+                metrics.mark("exchange_info")
+                self.save_exchange_info_cache(message.get("result", {}))
+            case "account.status":
+                metrics.mark("account_status")
+                queue.put_nowait({**message, **{"channel": f"{self.channel}_{RESPONSE_CHANNELS[request.method]}"}})
+            case "trades.recent":  # response has no symbol, it is kept in the pending request
+                queue.put_nowait({**message, **{"channel": f"{self.channel}_trades_recent", "symbol": request.symbol}})
+            case "userDataStream.start":
                 if listen_key := message.get("result", {}).get("listenKey"):
                     self.listen_key = listen_key
-                    self.extra_tasks = [
-                        asyncio.create_task(self.user_data_stream_connect()),
-                        asyncio.create_task(self.user_data_stream_ping_worker()),
-                    ]
-
-    async def order_place(self, side: str, quantity: float) -> None:
+                    await self.cancel_tasks()  # one user stream per session
+                    self.spawn(self.user_data_stream_connect())
+                    self.spawn(self.user_data_stream_ping_worker())
+
+    def prepare_order_templates(self, exchange_info: dict[str, Any]) -> None:
+        """Serialize order.place payloads of the traded quantity for both sides, see order_place"""
+        for details in exchange_info.get("symbols", []):
+            steps = [f.get("stepSize", "") for f in details.get("filters", []) if f["filterType"] == "LOT_SIZE"]
+            if (symbol := details.get("symbol")) in self.symbols and steps:
+                self.step_sizes[symbol] = steps[0]
+                for side in ("BUY", "SELL"):
+                    self.order_template(symbol, side, settings.POSITION_QUANTITY)
+
+    def format_quantity(self, symbol: str, quantity: float) -> str:
+        """Quantity rounded down to the LOT_SIZE step, without trailing zeros beyond the step precision"""
+        step_size = self.step_sizes.get(symbol, "")
+        decimals = fraction_digits(step_size)
+        if not step_size or not (step := parse_fixed(step_size, decimals)):
+            return f"{quantity:.9f}".rstrip("0") + "0"
+        units = parse_fixed(f"{quantity:.{decimals + AMOUNT_DECIMALS}f}", decimals)  # float noise is rounded off
+        return format_fixed(units - units % step, decimals)
+
+    def order_template(self, symbol: str, side: str, quantity: float) -> str:
+        """order.place frame with id, client order id and timestamp placeholders (%d, %s, %d), symbol/side/quantity
+        are never escaped"""
+        message = {
+            "id": 0,
+            "method": "order.place",
+            "params": {
+                "symbol": symbol,
+                "quantity": self.format_quantity(symbol, quantity),
+                "side": side,
+                "type": "MARKET",
+                "newClientOrderId": "%s",
+                "timestamp": 0,
+            },
+        }
+        template = encoder.encode(message).decode()
+        template = template.replace('"id":0', '"id":%d').replace('"timestamp":0', '"timestamp":%d')
+        self.order_templates[(symbol, side, quantity)] = template
+        return template
+
+    async def order_place(
+        self, side: str, quantity: float, symbol: str | None = None, client_order_id: str = ""
+    ) -> asyncio.Future | None:
+        """Returns the order.place response future (see request), None for invalid side. The frame is a prepared
+        template with the ids and timestamp patched in, sent without the send_json encoding"""
         if side not in ("BUY", "SELL"):
             await logger.awarning(f"Invalid side: {side}", channel=self.channel)
-            return
+            return None
 
+        symbol = symbol or self.symbol
         if not self.wss_client or not self.auth_complete:
             await logger.awarning("WebSocket connection not established or not authenticated", channel=self.channel)
-            return
-        await self.send_json(
-            {
-                "id": f"{side}_market_{int(time.time() * 1000)}".lower(),
-                "method": "order.place",
-                "params": {
-                    "symbol": self.symbol.upper(),
-                    "quantity": f"{quantity:.9f}".rstrip("0") + "0",
-                    "side": side,
-                    "type": "MARKET",
-                    "timestamp": int(time.time() * 1000),
-                },
-            }
-        )
+            return self.failed_request(RequestError("order.place", 0, msg="not authenticated"))
+
+        template = self.order_templates.get((symbol, side, quantity)) or self.order_template(symbol, side, quantity)
+        request_id = next(self.request_ids)
+        data = template % (request_id, client_order_id or new_client_order_id(), time.time_ns() // 1_000_000)
+        future = self.register_request("order.place", request_id, symbol, sent_at=metrics.order_sent(symbol, side))
+        try:
+            await self.wss_client.send_str(data, compress=False)
+        except client_exceptions.ClientError:
+            await logger.awarning("Failed to send message", message=data, channel=self.channel, exc_info=True)
+            self.request_failed(request_id, RequestError("order.place", 0, msg="request was not sent"))
+        if DEBUG_LOGS:
+            await logger.adebug(data, channel=self.channel)
+        return future
 
 
 class UserStreamWSS(BinanceWSS):
-    def __init__(self, symbol: str, channel: str, url: str, listen_key: str) -> None:
-        super().__init__(symbol, channel, url)
+    log_sample = 1
+
+    def __init__(self, symbols: list[str], channel: str, url: str, listen_key: str) -> None:
+        super().__init__(symbols, channel, url)
         self.wss_url = f"{url}/{listen_key}"
 
     async def after_connect(self) -> None:
         self.queue.put_nowait({"channel": self.channel, "event": "connected"})  # type: ignore
-        pass
 
-    async def process_message(self, message: dict[str, Any], queue: asyncio.Queue) -> None:
-        await super().process_message(message, queue)
-        await logger.adebug(message, channel=self.channel)
 
+class MarketDataFeed:
+    """Redundant public connections (WSS_PUBLIC_CONNECTIONS), possibly to different endpoints (WSS_PUBLIC_URLS).
+    Every connection reconnects on its own, trades are merged by id (see TradeArbiter), so a stalled connection
+    does not delay prices while any other is alive. Depth diffs of the local books (ORDER_BOOK) have their own
+    connection, so trade frames never wait behind a burst of diffs in one socket."""
+
+    def __init__(self, primary: BinanceWSS, urls: list[str], depth: bool = False) -> None:
+        self.arbiter = TradeArbiter()
+        self.connections = [primary] + [
+            BinanceWSS.new_instance(primary.symbols, f"{primary.channel}_{index}", url)  # type: ignore
+            for index, url in enumerate(urls, start=1)
+        ]
+        if urls:
+            for connection in self.connections:
+                connection.arbiter = self.arbiter
+                self.arbiter.register(connection.channel)
+        if depth:
+            self.connections.append(BinanceWSS.new_instance(primary.symbols, "depth", primary.wss_url))
+            self.connections[-1].stream = "depth@100ms"
+
+    def set_symbols(self, symbols: list[str]) -> None:
+        for connection in self.connections:
+            connection.set_symbols(symbols)
+        if BinanceWSS.books:
+            BinanceWSS.books.set_symbols(symbols)
 
-public_wss_client = BinanceWSS(symbol=settings.SYMBOL, channel="public", url="wss://testnet.binance.vision/ws")
+    async def wss_connect(self, queue: asyncio.Queue) -> None:
+        await asyncio.gather(*(connection.wss_connect(queue) for connection in self.connections))
+
+
+public_wss_client: BinanceWSS | MarketDataFeed = BinanceWSS(
+    symbols=settings.symbols, channel="public", url=settings.public_urls[0]
+)
+if len(settings.public_urls) > 1 or settings.ORDER_BOOK:
+    public_wss_client = MarketDataFeed(public_wss_client, settings.public_urls[1:], settings.ORDER_BOOK)  # type: ignore
 
 private_wss_client = BinancePrivateWSS(
-    symbol=settings.SYMBOL,
+    symbols=settings.symbols,
     channel="private",
-    url="wss://testnet.binance.vision/ws-api/v3",
+    url=settings.WSS_API_URL,
     api_key=settings.API_KEY,
     private_key_base64=settings.PRIVATE_KEY_BASE64,
+    offline=settings.OFFLINE,
 )
+if settings.ORDER_BOOK:
+    BinanceWSS.books = OrderBooks(settings.symbols, private_wss_client.depth_snapshot)
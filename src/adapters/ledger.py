@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from contextlib import suppress
+from pathlib import Path
+from queue import SimpleQueue
+from typing import NamedTuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+ROWS_SUFFIX = ".rows"
+CHUNK_SUFFIX = ".npz"
+CHUNK_ROWS = 65536
+
+LEDGER_DTYPE: np.dtype = np.dtype(
+    [
+        ("symbol", "S16"),
+        ("entry_time", "<i8"),  # ms, fill transaction time
+        ("exit_time", "<i8"),
+        ("entry_price", "<f8"),
+        ("exit_price", "<f8"),
+        ("quantity", "<f8"),
+        ("commission", "<f8"),  # of the exit fill, as accounted in pnl
+        ("entry_commission", "<f8"),  # of the entry fill in the quote asset, not accounted in pnl
+        ("commission_asset", "S16"),
+        ("pnl", "<f8"),
+        ("exit_reason", "u1"),  # EXIT_REASON value
+        ("entry_latency", "<i8"),  # us, order.place -> fill, 0 - unknown
+        ("exit_latency", "<i8"),
+    ]
+)
+
+
+class RoundTrip(NamedTuple):
+    symbol: str
+    entry_time: int
+    exit_time: int
+    entry_price: float
+    exit_price: float
+    quantity: float
+    commission: float
+    entry_commission: float
+    commission_asset: str
+    pnl: float
+    exit_reason: int
+    entry_latency: int
+    exit_latency: int
+
+
+LEDGER_COLUMNS = RoundTrip._fields  # in the order of LEDGER_DTYPE
+
+
+class TradeLedger:
+    """Append-only ledger of closed positions. Rows are appended to a file of fixed-size records (a crash loses at
+    most the record being written), a full file is sealed to a columnar chunk (one array per column), so reports load
+    only the columns they use. The event loop only puts rows to the queue, writes are in a thread."""
+
+    def __init__(self, path: str | Path, chunk_rows: int = CHUNK_ROWS) -> None:
+        self.path = Path(path)
+        self.chunk_rows = chunk_rows
+        self.queue: SimpleQueue = SimpleQueue()
+        self.thread = threading.Thread(target=self.writer, name="trade-ledger", daemon=True)
+        self.rows_count = 0
+
+    def start(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.thread.start()
+
+    def append(self, trip: RoundTrip) -> None:
+        self.queue.put(trip)
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def seal(self, rows_file: Path) -> None:
+        """Rewrite a full rows file to a columnar chunk, the rows file is removed only after the chunk is in place"""
+        rows = read_rows(rows_file)
+        chunk = rows_file.with_suffix(CHUNK_SUFFIX)
+        with chunk.with_suffix(".tmp").open("wb") as file:
+            np.savez(file, **{name: rows[name] for name in LEDGER_COLUMNS})  # type: ignore[arg-type]
+        os.replace(chunk.with_suffix(".tmp"), chunk)
+        rows_file.unlink()
+
+    def writer(self) -> None:
+        file, rows_file, file_rows = None, self.path, 0
+        failed = False
+        try:
+            while (trip := self.queue.get()) is not None:
+                if file is None:
+                    rows_file = self.path / f"{time.time_ns()}{ROWS_SUFFIX}"
+                    file, file_rows = rows_file.open("ab"), 0
+                file.write(np.array([trip], dtype=LEDGER_DTYPE).tobytes())
+                file.flush()
+                self.rows_count += 1
+                file_rows += 1
+                if file_rows >= self.chunk_rows:
+                    file.close()
+                    file = None
+                    self.seal(rows_file)
+        except Exception:
+            failed = True
+            logger.error("Trade ledger failed", path=str(rows_file), exc_info=True)
+        finally:
+            if file and failed:
+                with suppress(OSError):  # close flushes the unwritten row again and would raise over the logged error
+                    file.close()
+            elif file:
+                file.close()
+
+
+def read_rows(path: Path) -> np.ndarray:
+    rows = np.fromfile(path, dtype=np.uint8)
+    count = len(rows) // LEDGER_DTYPE.itemsize  # incomplete record at the tail (crash while writing)
+    return rows[: count * LEDGER_DTYPE.itemsize].view(LEDGER_DTYPE)
+
+
+def read_columns(path: Path, columns: tuple[str, ...]) -> dict[str, np.ndarray]:
+    if path.suffix == CHUNK_SUFFIX:
+        with np.load(path) as chunk:
+            return {name: chunk[name] for name in columns}
+    rows = read_rows(path)
+    return {name: np.ascontiguousarray(rows[name]) for name in columns}
+
+
+def read_ledger(path: str | Path, columns: tuple[str, ...] = LEDGER_COLUMNS) -> dict[str, np.ndarray]:
+    """Columns of all rows in a ledger directory (workers write to subdirectories) ordered by exit time"""
+    path = Path(path)
+    files = sorted(path.rglob(f"*{CHUNK_SUFFIX}"))
+    # rows file is left next to its chunk if sealing was interrupted
+    files += [file for file in sorted(path.rglob(f"*{ROWS_SUFFIX}")) if not file.with_suffix(CHUNK_SUFFIX).exists()]
+    parts = [read_columns(file, columns) for file in files]
+    result = {
+        name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0, dtype=LEDGER_DTYPE[name])
+        for name in columns
+    }
+
+    exit_time = result.get("exit_time")
+    if exit_time is not None and len(exit_time) and (np.diff(exit_time) < 0).any():  # files of several workers
+        order = np.argsort(exit_time, kind="stable")
+        result = {name: values[order] for name, values in result.items()}
+    return result
@@ -0,0 +1,135 @@
+import mmap
+import struct
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import suppress
+from pathlib import Path
+from queue import Empty, SimpleQueue
+from typing import NamedTuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+SEGMENT_MAGIC = b"BTBFRM01"
+SEGMENT_SUFFIX = ".seg"
+# frame header: payload length, receive timestamp (ns), channel tag
+FRAME_HEADER = struct.Struct("<IQB")
+
+PUBLIC_CONNECTION_TAG = 16  # redundant public connections (public_N) are tagged 16 + N
+
+CHANNEL_TAGS = {"public": 1, "private": 2, "user_stream": 3, "depth": 4} | {
+    f"public_{index}": PUBLIC_CONNECTION_TAG + index for index in range(1, 256 - PUBLIC_CONNECTION_TAG)
+}
+CHANNEL_NAMES = {tag: name for name, tag in CHANNEL_TAGS.items()}
+
+
+class Frame(NamedTuple):
+    received_at: int  # ns
+    channel: str
+    data: memoryview
+
+
+class FrameRecorder:
+    """Append-only capture of raw wss frames, the event loop only puts frames to the queue, writes are in a thread"""
+
+    def __init__(self, path: str | Path, segment_size: int = 256 * 1024 * 1024, buffer_size: int = 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.segment_size = segment_size
+        self.buffer_size = buffer_size
+        self.queue: SimpleQueue = SimpleQueue()
+        self.thread = threading.Thread(target=self.writer, name="frame-recorder", daemon=True)
+        self.frames_count = 0
+
+    def start(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.thread.start()
+
+    def record(self, channel: str, data: str | bytes) -> None:
+        self.queue.put((time.time_ns(), CHANNEL_TAGS.get(channel, 0), data))
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def open_segment(self) -> None:
+        self.segment = self.path / f"{time.time_ns()}{SEGMENT_SUFFIX}"
+        self.segment.write_bytes(SEGMENT_MAGIC)
+        self.segment_written = len(SEGMENT_MAGIC)
+        self.file = self.segment.open("ab")
+
+    def flush(self, buffer: bytearray) -> None:
+        if buffer:
+            self.file.write(buffer)
+            self.file.flush()
+            self.segment_written += len(buffer)
+            buffer.clear()
+        if self.segment_written >= self.segment_size:
+            self.file.close()
+            self.open_segment()
+
+    def writer(self) -> None:
+        buffer = bytearray()
+        failed = False
+        self.open_segment()
+        try:
+            while True:
+                try:
+                    # block only when there is nothing to flush
+                    item = self.queue.get(timeout=0.1) if buffer else self.queue.get()
+                except Empty:
+                    item = ()  # idle, flush buffered frames
+
+                if item is None:
+                    break
+                if item:
+                    received_at, channel, data = item
+                    payload = data.encode() if isinstance(data, str) else data
+                    buffer += FRAME_HEADER.pack(len(payload), received_at, channel)
+                    buffer += payload
+                    self.frames_count += 1
+                    if len(buffer) < self.buffer_size:
+                        continue
+                self.flush(buffer)
+        except Exception:
+            failed = True  # the file is broken, flushing it again would only raise over this error
+            logger.error("Frame recorder failed", path=str(self.segment), exc_info=True)
+        finally:
+            if not failed:
+                self.flush(buffer)
+            with suppress(OSError):
+                self.file.close()
+
+
+class FrameReader:
+    """Iterates over recorded frames of a segment file (or directory of segments) without copying payloads"""
+
+    def __init__(self, path: str | Path) -> None:
+        path = Path(path)
+        self.segments = sorted(path.glob(f"*{SEGMENT_SUFFIX}")) if path.is_dir() else [path]
+
+    def __iter__(self) -> Iterator[Frame]:
+        for segment in self.segments:
+            yield from self.read_segment(segment)
+
+    @staticmethod
+    def read_segment(segment: Path) -> Iterator[Frame]:
+        """Frames data are views of the mapped file, it stays mapped until the last view is released"""
+        if segment.stat().st_size <= len(SEGMENT_MAGIC):
+            return
+        with segment.open("rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[: len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+            raise ValueError(f"{segment} is not a frames segment")
+
+        view = memoryview(buffer)
+        offset, size = len(SEGMENT_MAGIC), len(buffer)
+        while offset + FRAME_HEADER.size <= size:
+            length, received_at, channel = FRAME_HEADER.unpack_from(buffer, offset)
+            offset += FRAME_HEADER.size
+            if offset + length > size:  # incomplete frame at the tail (crash while writing)
+                break
+            yield Frame(received_at, CHANNEL_NAMES.get(channel, "unknown"), view[offset : offset + length])
+            offset += length
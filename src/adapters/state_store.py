@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from queue import Empty, SimpleQueue
+
+import structlog
+from msgspec import json
+
+from models.state import StateSnapshot
+
+logger = structlog.get_logger(__name__)
+encoder = json.Encoder()
+decoder = json.Decoder(StateSnapshot)
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS state (symbol TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at INTEGER NOT NULL)"
+UPSERT = (
+    "INSERT INTO state (symbol, data, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (symbol) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at"
+)
+
+
+class StateStore:
+    """Trader state snapshots in SQLite (WAL), one row per symbol. The event loop only puts encoded snapshots to the
+    queue, the writer thread commits the latest snapshot of each symbol at most flush_interval seconds after it was
+    saved, so fsync never blocks trading and the stored state is at most flush_interval stale."""
+
+    def __init__(self, path: str | Path, flush_interval: float = 0.5) -> None:
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.queue: SimpleQueue = SimpleQueue()
+        self.thread = threading.Thread(target=self.writer, name="state-store", daemon=True)
+        self.commits_count = 0
+
+    def connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)  # worker processes share the database
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.execute(SCHEMA)
+        return connection
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def load(self, symbol: str) -> StateSnapshot | None:
+        """Read on startup, before the writer has anything to write"""
+        connection = self.connect()
+        try:
+            row = connection.execute("SELECT data FROM state WHERE symbol = ?", (symbol,)).fetchone()
+        finally:
+            connection.close()
+        return decoder.decode(row[0]) if row else None
+
+    def save(self, symbol: str, snapshot: StateSnapshot) -> None:
+        self.queue.put((symbol, encoder.encode(snapshot), time.time_ns() // 1_000_000))
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def flush(self, connection: sqlite3.Connection, pending: dict[str, tuple[str, bytes, int]]) -> None:
+        if pending:
+            with connection:
+                connection.executemany(UPSERT, pending.values())
+            self.commits_count += 1
+            pending.clear()
+
+    def writer(self) -> None:
+        pending: dict[str, tuple[str, bytes, int]] = {}  # symbol -> latest snapshot row
+        connection = self.connect()
+        try:
+            self.write_snapshots(connection, pending)
+        except Exception:
+            # not flushed again, the same commit would fail and raise over this error
+            logger.error("State store failed", path=str(self.path), exc_info=True)
+        else:
+            self.flush(connection, pending)
+        finally:
+            connection.close()
+
+    def write_snapshots(self, connection: sqlite3.Connection, pending: dict[str, tuple[str, bytes, int]]) -> None:
+        """Commits the queued snapshots until close, the ones not flushed yet are left in pending"""
+        flush_at = 0.0
+        while True:
+            try:
+                # block only when there is nothing to flush
+                item = self.queue.get(timeout=max(flush_at - time.monotonic(), 0)) if pending else self.queue.get()
+            except Empty:
+                item = ()  # flush interval elapsed
+
+            if item is None:
+                return
+            if item:
+                if not pending:
+                    flush_at = time.monotonic() + self.flush_interval
+                pending[item[0]] = item
+                if time.monotonic() < flush_at:
+                    continue
+            self.flush(connection, pending)
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import os
+
+# keys are not needed for offline replay, but settings require them
+os.environ.setdefault("API_KEY", "")
+os.environ.setdefault("PRIVATE_KEY_BASE64", "")
+os.environ["OFFLINE"] = "True"
+
+import uvloop  # noqa: E402
+from adapters.ledger import TradeLedger  # noqa: E402
+from core.backtester import Backtester, load_trades  # noqa: E402
+from core.logging import setup_logging  # noqa: E402
+from core.trader import Trader  # noqa: E402
+from msgspec import json  # noqa: E402
+from settings import settings  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay historical trades through the trader logic")
+    parser.add_argument("path", help="trades csv (or zip) from data.binance.vision, or recorded frames")
+    parser.add_argument("--symbol", default=settings.SYMBOL)
+    parser.add_argument("--quantity", type=float, default=settings.POSITION_QUANTITY)
+    parser.add_argument("--sl", type=float, default=settings.POSITION_SL_PERCENT, help="stop loss (percent)")
+    parser.add_argument("--tp", type=float, default=settings.POSITION_TP_PERCENT, help="take profit (percent)")
+    parser.add_argument(
+        "--levels",
+        default=settings.POSITION_LEVELS,
+        choices=("percent", "atr", "volatility"),
+        help="SL/TP distance: --sl/--tp percents or multipliers of the ATR / realized volatility",
+    )
+    parser.add_argument("--sl-mult", type=float, default=settings.POSITION_SL_MULTIPLIER, help="stop loss multiplier")
+    parser.add_argument("--tp-mult", type=float, default=settings.POSITION_TP_MULTIPLIER, help="take profit multiplier")
+    parser.add_argument("--hold", type=int, default=settings.POSITION_HOLD_TIME, help="hold time (seconds)")
+    parser.add_argument("--sleep", type=int, default=settings.POSITION_SLEEP_TIME, help="sleep time (seconds)")
+    parser.add_argument("--balance", type=float, default=10000.0, help="initial quote balance")
+    parser.add_argument("--commission", type=float, default=0.0, help="commission rate, 0.001 = 0.1%%")
+    parser.add_argument("--latency", type=int, default=0, help="order fill latency (ms)")
+    parser.add_argument("--fixed-point", action="store_true", help="exact SL/TP and PnL in ticks/steps (FIXED_POINT)")
+    parser.add_argument("--tick-size", default="0.01000000", help="PRICE_FILTER tickSize for --fixed-point")
+    parser.add_argument("--step-size", default="0.00001000", help="LOT_SIZE stepSize for --fixed-point")
+    parser.add_argument("--ledger", help="write closed positions to the ledger directory (tools.ledger_report)")
+    parser.add_argument("--loglevel", default="WARNING")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.ledger:
+        Trader.ledger = TradeLedger(args.ledger)
+        Trader.ledger.start()
+    backtester = Backtester(
+        load_trades(args.path, settings.SYMBOL),
+        quote_balance=args.balance,
+        commission=args.commission,
+        latency=args.latency,
+        tick_size=args.tick_size,
+        step_size=args.step_size,
+    )
+    result = await backtester.run()
+    Trader.close_storage()
+    print(json.format(json.encode(result)).decode())  # noqa: T201
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    settings.SYMBOL = arguments.symbol
+    settings.POSITION_QUANTITY = arguments.quantity
+    settings.POSITION_SL_PERCENT = arguments.sl
+    settings.POSITION_TP_PERCENT = arguments.tp
+    settings.POSITION_LEVELS = arguments.levels
+    settings.POSITION_SL_MULTIPLIER = arguments.sl_mult
+    settings.POSITION_TP_MULTIPLIER = arguments.tp_mult
+    settings.POSITION_HOLD_TIME = arguments.hold
+    settings.POSITION_SLEEP_TIME = arguments.sleep
+    settings.FIXED_POINT = arguments.fixed_point
+    settings.LOGLEVEL = arguments.loglevel
+    setup_logging()
+
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        runner.run(main(arguments))
@@ -0,0 +1,264 @@
+import logging as std_logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import UTC, datetime
+from json import dumps
+from pathlib import Path
+from typing import Any, TextIO
+
+import structlog
+from settings import settings
+
+# raw record, rendering is done in the writer thread:
+# (time, level, logger name, contextvars, bound context, event, event kwargs)
+LogRecord = tuple[float, int, str, dict[str, Any], dict[str, Any], Any, dict[str, Any]]
+
+
+class RotatingFile:
+    """Size based rotation: path -> path.1 -> ... -> path.N"""
+
+    def __init__(self, path: str | Path, max_bytes: int, backup_count: int) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = self.path.open("a", encoding="utf-8")
+
+    def write(self, data: str) -> None:
+        self.file.write(data)
+        self.file.flush()
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self) -> None:
+        self.file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            if (source := self.path.with_name(f"{self.path.name}.{index}")).exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backup_count:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self.file = self.path.open("a", encoding="utf-8")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class LogRingBuffer:
+    """Bounded buffer of raw log records, the event loop only appends a tuple, the rest is done by the writer thread:
+    processors chain, rendering and batched writes. Records are dropped (and counted) when the buffer is full. The
+    writer sleeps on the wakeup event, set by the first record appended after the writer took the previous ones."""
+
+    def __init__(
+        self,
+        capacity: int,
+        processors: list[Any],
+        stream: TextIO | None = None,
+        file: RotatingFile | None = None,
+        batch_size: int = 1024,
+    ) -> None:
+        self.capacity = capacity
+        self.processors = processors
+        self.stream = stream
+        self.file = file
+        self.batch_size = batch_size
+        self.records: deque[LogRecord] = deque()
+        self.dropped = 0
+        self.reported_dropped = 0
+        self.closing = False
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.writer, name="log-writer", daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def put(self, record: LogRecord) -> None:
+        if len(self.records) >= self.capacity:
+            self.dropped += 1
+            return
+        self.records.append(record)
+        if not self.wakeup.is_set():  # the lock of set() is taken once per batch, not per record
+            self.wakeup.set()
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.closing = True
+            self.wakeup.set()
+            self.thread.join()
+        if self.file:
+            self.file.close()
+
+    def render(self, record: LogRecord) -> str:
+        timestamp, level, name, contextvars, context, event, kwargs = record
+        event_dict = {**contextvars, **context, **kwargs, "event": event}
+        event_dict["level"] = std_logging.getLevelName(level).lower()
+        event_dict["logger"] = name
+        event_dict["timestamp"] = datetime.fromtimestamp(timestamp, UTC).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        method_name = event_dict["level"]
+        result: Any = event_dict
+        for processor in self.processors:
+            result = processor(None, method_name, result)
+        return result
+
+    def dropped_record(self) -> LogRecord:
+        dropped, self.reported_dropped = self.dropped - self.reported_dropped, self.dropped
+        return time.time(), std_logging.WARNING, __name__, {}, {}, "Log records dropped", {"dropped": dropped}
+
+    def writer(self) -> None:
+        while True:
+            if not self.records:
+                if self.closing:
+                    break
+                self.wakeup.wait()
+                self.wakeup.clear()  # before taking the records, the ones appended after it set the event again
+                continue
+
+            lines: list[str] = []
+            while self.records and len(lines) < self.batch_size:
+                try:
+                    lines.append(self.render(self.records.popleft()))
+                except Exception as err:  # broken record must not stop the writer
+                    lines.append(f"Failed to render log record: {err!r}")
+            if self.dropped != self.reported_dropped:
+                lines.append(self.render(self.dropped_record()))
+            self.write("\n".join(lines) + "\n")
+
+    def write(self, data: str) -> None:
+        if self.stream:
+            self.stream.write(data)
+            self.stream.flush()
+        if self.file:
+            self.file.write(data)
+
+
+class SinkLogger:
+    """Logger created by structlog factory, holds the name and the shared buffer"""
+
+    def __init__(self, name: str, buffer: LogRingBuffer, level: int) -> None:
+        self.name = name
+        self.buffer = buffer
+        self.level = level
+
+
+class RingBufferLogger(structlog.BoundLoggerBase):
+    """Bound logger for the async logging mode: filters by level and enqueues raw event, nothing is rendered on the
+    caller thread. Async methods are plain enqueue too, there is no executor hop."""
+
+    _logger: SinkLogger
+
+    def enqueue(self, level: int, event: Any, args: tuple, kwargs: dict[str, Any]) -> None:
+        if level < self._logger.level:
+            return
+        if kwargs.get("exc_info") is True:  # traceback exists only while handling the exception
+            kwargs["exc_info"] = sys.exc_info()
+        if args:
+            event = event % args
+        self._logger.buffer.put(
+            (
+                time.time(),
+                level,
+                self._logger.name,
+                structlog.contextvars.get_contextvars(),
+                self._context,  # type: ignore
+                event,
+                kwargs,
+            )
+        )
+
+    def debug(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.DEBUG, event, args, kwargs)
+
+    def info(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.INFO, event, args, kwargs)
+
+    def warning(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.WARNING, event, args, kwargs)
+
+    def error(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.ERROR, event, args, kwargs)
+
+    def critical(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.CRITICAL, event, args, kwargs)
+
+    def exception(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("exc_info", True)
+        self.enqueue(std_logging.ERROR, event, args, kwargs)
+
+    async def adebug(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.DEBUG, event, args, kwargs)
+
+    async def ainfo(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.INFO, event, args, kwargs)
+
+    async def awarning(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.WARNING, event, args, kwargs)
+
+    async def aerror(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.ERROR, event, args, kwargs)
+
+    async def acritical(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.enqueue(std_logging.CRITICAL, event, args, kwargs)
+
+    async def aexception(self, event: Any = None, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("exc_info", True)
+        self.enqueue(std_logging.ERROR, event, args, kwargs)
+
+
+class RingBufferHandler(std_logging.Handler):
+    """Stdlib records (aiohttp, asyncio) go to the same buffer"""
+
+    def __init__(self, buffer: LogRingBuffer) -> None:
+        super().__init__()
+        self.buffer = buffer
+
+    def emit(self, record: std_logging.LogRecord) -> None:
+        kwargs = {"exc_info": record.exc_info} if record.exc_info else {}
+        self.buffer.put((record.created, record.levelno, record.name, {}, {}, record.getMessage(), kwargs))
+
+
+def create_log_buffer() -> LogRingBuffer:
+    renderer = (
+        structlog.processors.JSONRenderer(serializer=dumps)
+        if settings.JSON_LOGS
+        else structlog.dev.ConsoleRenderer(colors=settings.COLORED_LOGS, event_key="message")
+    )
+    file = (
+        RotatingFile(settings.LOG_FILE_PATH, settings.LOG_FILE_MAX_BYTES, settings.LOG_FILE_BACKUP_COUNT)
+        if settings.SAVE_LOG_FILE
+        else None
+    )
+    return LogRingBuffer(
+        capacity=settings.LOG_BUFFER_SIZE,
+        processors=[
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.EventRenamer("message"),
+            renderer,
+        ],
+        stream=sys.stderr,
+        file=file,
+    )
+
+
+def setup_async_logging() -> LogRingBuffer:
+    buffer = create_log_buffer()
+    level = std_logging.getLevelName(settings.LOGLEVEL)
+    structlog.configure(
+        processors=[],
+        wrapper_class=RingBufferLogger,
+        logger_factory=lambda name=__name__, *args: SinkLogger(name, buffer, level),
+        cache_logger_on_first_use=True,
+    )
+
+    root = std_logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(RingBufferHandler(buffer))
+    root.setLevel(level)
+
+    buffer.start()
+    return buffer
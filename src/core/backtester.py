@@ -0,0 +1,246 @@
+import csv
+import io
+import time
+import zipfile
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO
+
+from msgspec import Struct
+
+from adapters.binance_wss import BinanceWSS, TradeWindow
+from adapters.recorder import SEGMENT_SUFFIX, FrameReader
+from core.timers import TimerQueue
+from core.trader import Trader
+from models import AccountPosition, BalanceUpdate, FixedPoint, Order, Trade
+from models.state import Balances
+from settings import settings
+
+QUOTE_ASSETS = ("USDT", "USDC", "FDUSD", "BUSD", "TUSD", "BTC", "ETH", "BNB", "EUR", "TRY")
+
+
+class BacktestResult(Struct):
+    symbol: str
+    trades: int
+    orders: int
+    round_trips: int
+    total_tp_trades: int
+    total_sl_trades: int
+    total_pnl: float
+    base_balance: float
+    quote_balance: float
+    first_trade_time: int
+    last_trade_time: int
+    elapsed: float
+
+
+class SimulatedClock:
+    """Clock driven by replayed data, replaces time.time() in the trader"""
+
+    def __init__(self) -> None:
+        self.timestamp = 0  # ms
+
+    def __call__(self) -> float:
+        return self.timestamp / 1000
+
+
+class SimulatedExchange:
+    """Matching engine for MARKET orders, orders are filled by the first trade after placement (+ latency)"""
+
+    def __init__(
+        self,
+        symbol: str,
+        base_asset: str,
+        quote_asset: str,
+        clock: SimulatedClock,
+        commission: float = 0.0,
+        latency: int = 0,
+    ) -> None:
+        self.symbol = symbol
+        self.base_asset = base_asset
+        self.quote_asset = quote_asset
+        self.clock = clock
+        self.commission = commission
+        self.latency = latency
+        self.balances: dict[str, float] = {base_asset: 0.0, quote_asset: 0.0}
+        self.pending: list[tuple[int, str, float, str]] = []  # (placed_at, side, quantity, client_order_id)
+        self.orders_count = 0
+
+    async def order_place(
+        self, side: str, quantity: float, symbol: str | None = None, client_order_id: str = ""
+    ) -> None:
+        self.pending.append((self.clock.timestamp, side, quantity, client_order_id))
+
+    def match(self, trade: Trade) -> list[Order | AccountPosition]:
+        """Fill pending orders by the trade, returns user stream events (executionReport, outboundAccountPosition)"""
+        if not self.pending:
+            return []
+
+        events: list[Order | AccountPosition] = []
+        not_filled = []
+        for order in self.pending:
+            placed_at, side, quantity, client_order_id = order
+            if trade.trade_time < placed_at + self.latency:
+                not_filled.append(order)
+                continue
+            events.append(self.fill(side, quantity, trade.price, trade.trade_time, client_order_id))
+            events.append(self.account_position(trade.trade_time))
+        self.pending = not_filled
+        return events
+
+    def fill(self, side: str, quantity: float, price: float, transaction_time: int, client_order_id: str = "") -> Order:
+        notional = price * quantity
+        commission = notional * self.commission
+        if side == "BUY":
+            self.balances[self.base_asset] += quantity
+            self.balances[self.quote_asset] -= notional + commission
+        else:
+            self.balances[self.base_asset] -= quantity
+            self.balances[self.quote_asset] += notional - commission
+        self.orders_count += 1
+        return Order(
+            event_time=transaction_time,
+            symbol=self.symbol,
+            side=side,
+            order_type="MARKET",
+            quantity=quantity,
+            price=0.0,
+            current_order_status="FILLED",
+            last_executed_quantity=quantity,
+            last_executed_price=price,
+            commission_amount=commission,
+            commission_asset=self.quote_asset,
+            transaction_time=transaction_time,
+            client_order_id=client_order_id,
+        )
+
+    def account_position(self, event_time: int) -> AccountPosition:
+        return AccountPosition(
+            event_time=event_time,
+            balances=[BalanceUpdate(asset=asset, free=free, locked=0.0) for asset, free in self.balances.items()],
+        )
+
+
+class Backtester:
+    """Replays trades through the real Trader logic with simulated order matching and data driven time"""
+
+    def __init__(
+        self,
+        trades: Iterable[Trade],
+        quote_balance: float = 10000.0,
+        commission: float = 0.0,
+        latency: int = 0,
+        min_notional: float = 5.0,
+        tick_size: str = "0.01000000",
+        step_size: str = "0.00001000",
+    ) -> None:
+        self.trades = trades
+        self.clock = SimulatedClock()
+        base_asset, quote_asset = split_symbol(settings.SYMBOL)
+        self.exchange = SimulatedExchange(
+            settings.SYMBOL, base_asset, quote_asset, self.clock, commission=commission, latency=latency
+        )
+        self.exchange.balances[quote_asset] = quote_balance
+        self.timers = TimerQueue(self.clock)
+        self.trader = Trader(symbol=settings.SYMBOL, order_client=self.exchange, clock=self.clock, timers=self.timers)
+        self.prepare_state(base_asset, quote_asset, min_notional)
+        if settings.FIXED_POINT:
+            self.trader.fixed = FixedPoint(tick_size, step_size)
+
+    def prepare_state(self, base_asset: str, quote_asset: str, min_notional: float) -> None:
+        state = self.trader.state
+        state.balances = Balances()
+        for asset, free in self.exchange.balances.items():
+            state.balances.update_balance(asset, free, 0.0)
+        state.base_asset = base_asset
+        state.quote_asset = quote_asset
+        state.min_qty = settings.POSITION_QUANTITY
+        state.min_notional = min_notional
+        state.stream_ready = state.balance_ready = state.symbols_ready = True
+
+    async def run(self) -> BacktestResult:
+        started = time.perf_counter()
+        trader, exchange, clock, timers = self.trader, self.exchange, self.clock, self.timers
+        trades_count, first_trade_time = 0, 0
+
+        for trade in self.trades:
+            clock.timestamp = trade.trade_time
+            if exchange.pending:
+                for event in exchange.match(trade):
+                    await trader.handle_message(event)
+            if timers.due(trade.trade_time):
+                await timers.run_due(trade.trade_time)
+            await trader.handle_message(trade)
+            if not trades_count:
+                first_trade_time = trade.trade_time
+            trades_count += 1
+
+        state = trader.state
+        return BacktestResult(
+            symbol=settings.SYMBOL,
+            trades=trades_count,
+            orders=exchange.orders_count,
+            round_trips=state.total_tp_trades + state.total_sl_trades,
+            total_tp_trades=state.total_tp_trades,
+            total_sl_trades=state.total_sl_trades,
+            total_pnl=round(state.total_pnl, 8),
+            base_balance=round(exchange.balances[exchange.base_asset], 8),
+            quote_balance=round(exchange.balances[exchange.quote_asset], 8),
+            first_trade_time=first_trade_time,
+            last_trade_time=clock.timestamp,
+            elapsed=round(time.perf_counter() - started, 3),
+        )
+
+
+def split_symbol(symbol: str) -> tuple[str, str]:
+    for quote_asset in QUOTE_ASSETS:
+        if symbol.endswith(quote_asset) and symbol != quote_asset:
+            return symbol[: -len(quote_asset)], quote_asset
+    raise ValueError(f"Unable to detect quote asset for {symbol}")
+
+
+def open_trades_file(path: Path) -> IO[str]:
+    if path.suffix == ".zip":
+        archive = zipfile.ZipFile(path)
+        return io.TextIOWrapper(archive.open(archive.namelist()[0]), encoding="utf-8")
+    return path.open(encoding="utf-8")
+
+
+def load_trades(path: str | Path, symbol: str) -> Iterator[Trade]:
+    path = Path(path)
+    if path.is_dir() or path.suffix == SEGMENT_SUFFIX:
+        return load_recorded_trades(path, symbol)
+    return load_csv_trades(path, symbol)
+
+
+def load_recorded_trades(path: Path, symbol: str) -> Iterator[Trade]:
+    """Read price updates (any WSS_PUBLIC_STREAM) from public channel frames captured by FrameRecorder, trades of the
+    redundant connections (public_N) are merged by id in the order of arrival, as TradeArbiter does live"""
+    window = TradeWindow()
+    for frame in FrameReader(path):
+        if frame.channel != "public" and not frame.channel.startswith("public_"):
+            continue
+        message = BinanceWSS.decode_message(frame.data, frame.received_at // 1_000_000)
+        if isinstance(message, Trade) and message.symbol == symbol:
+            if message.trade_id and not window.add(message.trade_id, frame.received_at):
+                continue
+            yield message
+
+
+def load_csv_trades(path: Path, symbol: str) -> Iterator[Trade]:
+    """Read trades dump from data.binance.vision (id,price,qty,quote_qty,time,is_buyer_maker,is_best_match)"""
+    with open_trades_file(path) as file:
+        for row in csv.reader(file):
+            if not row or not row[0].isdigit():  # header
+                continue
+            trade_time = int(row[4])
+            if trade_time > 10**14:  # spot dumps since 2025 are in microseconds
+                trade_time //= 1000
+            yield Trade(
+                event_time=trade_time,
+                symbol=symbol,
+                price=float(row[1]),
+                trade_time=trade_time,
+                quantity=float(row[2]),
+                trade_id=int(row[0]),
+            )
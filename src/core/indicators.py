@@ -0,0 +1,139 @@
+import math
+
+import numpy as np
+
+
+class RollingIndicators:
+    """Rolling VWAP and realized volatility of the last `window` trades and ATR of the last `bars` time bars of a
+    symbol. Trades and bar ranges are kept in NumPy ring buffers. The hot path (update) only adjusts running sums with
+    the entering and the evicted element, O(1) without array operations; recompute rebuilds the sums from the buffers
+    with vectorized operations (on demand and every `window` trades, which also cancels the floating point drift of
+    the running sums)."""
+
+    __slots__ = (
+        "window",
+        "prices",
+        "quantities",
+        "returns",
+        "index",
+        "count",
+        "updates",
+        "last_price",
+        "notional",
+        "volume",
+        "variance",
+        "bar_ms",
+        "bar_id",
+        "bar_high",
+        "bar_low",
+        "bar_last",
+        "previous_close",
+        "ranges",
+        "range_index",
+        "range_count",
+        "ranges_sum",
+    )
+
+    def __init__(self, window: int = 1000, bar_ms: int = 1000, bars: int = 14) -> None:
+        self.window = window
+        self.prices = np.zeros(window)
+        self.quantities = np.zeros(window)
+        self.returns = np.zeros(window)  # log returns trade to trade
+        self.index = 0  # next slot of the trades ring
+        self.count = 0  # trades in the ring
+        self.updates = 0  # since the last recompute
+        self.last_price = 0.0
+        self.notional = self.volume = self.variance = 0.0  # running sums of price * quantity, quantity, return ** 2
+
+        self.bar_ms = bar_ms
+        self.bar_id = 0  # trade_time // bar_ms of the current bar, 0 - no bar yet
+        self.bar_high, self.bar_low, self.bar_last = 0.0, math.inf, 0.0
+        self.previous_close = 0.0  # of the last closed bar
+        self.ranges = np.zeros(bars)  # true ranges of the closed bars
+        self.range_index = self.range_count = 0
+        self.ranges_sum = 0.0
+
+    def update(self, price: float, quantity: float, trade_time: int, high: float = 0.0, low: float = math.inf) -> None:
+        """Trade (high/low - price range of the trades conflated into it)"""
+        index = self.index
+        if self.count == self.window:
+            old_quantity: float = self.quantities.item(index)
+            old_return: float = self.returns.item(index)
+            self.notional -= self.prices.item(index) * old_quantity
+            self.volume -= old_quantity
+            self.variance -= old_return * old_return
+        else:
+            self.count += 1
+        log_return = math.log(price / self.last_price) if self.last_price else 0.0
+        self.prices[index], self.quantities[index], self.returns[index] = price, quantity, log_return
+        self.notional += price * quantity
+        self.volume += quantity
+        self.variance += log_return * log_return
+        self.last_price = price
+        self.index = index + 1 if index + 1 < self.window else 0
+
+        self.updates += 1
+        if self.updates >= self.window:
+            self.recompute()
+        if not trade_time:  # no time to bar by, ATR stays empty
+            return
+        if trade_time // self.bar_ms != self.bar_id:
+            self.next_bar(trade_time // self.bar_ms)
+        # conditionals instead of max/min calls, this is the hot path
+        high = high if high > price else price
+        low = low if low < price else price
+        if high > self.bar_high:
+            self.bar_high = high
+        if low < self.bar_low:
+            self.bar_low = low
+        self.bar_last = price
+
+    def next_bar(self, bar_id: int) -> None:
+        if self.bar_id:
+            self.close_bar()
+        self.bar_id, self.bar_high, self.bar_low = bar_id, 0.0, math.inf
+
+    def close_bar(self) -> None:
+        previous = self.previous_close or self.bar_last
+        true_range = max(self.bar_high, previous) - min(self.bar_low, previous)
+        index = self.range_index
+        if self.range_count == len(self.ranges):
+            self.ranges_sum -= self.ranges.item(index)
+        else:
+            self.range_count += 1
+        self.ranges[index] = true_range
+        self.ranges_sum += true_range
+        self.range_index = index + 1 if index + 1 < len(self.ranges) else 0
+        self.previous_close = self.bar_last
+
+    def recompute(self) -> None:
+        """Running sums from the buffers"""
+        count = self.count
+        prices, quantities, returns = self.prices[:count], self.quantities[:count], self.returns[:count]
+        self.notional = float(np.dot(prices, quantities))
+        self.volume = float(quantities.sum())
+        self.variance = float(np.dot(returns, returns))
+        self.ranges_sum = float(self.ranges[: self.range_count].sum())
+        self.updates = 0
+
+    @property
+    def vwap(self) -> float:
+        return self.notional / self.volume if self.volume > 0 else self.last_price
+
+    @property
+    def volatility(self) -> float:
+        """Realized volatility of the window: square root of the sum of squared log returns"""
+        return math.sqrt(max(self.variance, 0.0))
+
+    @property
+    def atr(self) -> float:
+        """Average true range of the closed bars"""
+        return self.ranges_sum / self.range_count if self.range_count else 0.0
+
+    def level_unit(self, source: str, price: float) -> float:
+        """Price distance of one SL/TP multiplier unit, 0.0 until the window (or the bars) is filled"""
+        if source == "atr":
+            return self.atr if self.range_count == len(self.ranges) else 0.0
+        if source == "volatility":
+            return price * self.volatility if self.count == self.window else 0.0
+        return 0.0
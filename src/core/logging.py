@@ -1,7 +1,9 @@
+import atexit
 import logging.config
 from json import dumps
 
 import structlog
+from core.async_logging import setup_async_logging
 from msgspec.json import Encoder
 from settings import settings
 
@@ -10,6 +12,10 @@ logging.basicConfig(format="%(message)s", level=settings.LOGLEVEL)  # type: igno
 
 
 def setup_logging(cache_logger_on_first_use: bool = True) -> None:
+    if settings.LOG_ASYNC:
+        atexit.register(setup_async_logging().close)
+        return
+
     processors = [
         structlog.contextvars.merge_contextvars,
         structlog.processors.add_log_level,
@@ -0,0 +1,191 @@
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# log-linear buckets: 2^SUB_BUCKET_BITS linear sub-buckets per power of two, relative error <= 1/2^SUB_BUCKET_BITS
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_MAGNITUDE = 40  # values up to 2^40 us (~12 days)
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram:
+    """HDR-style histogram of non-negative integer values (microseconds), O(1) record without allocations"""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (SUB_BUCKETS * (MAX_MAGNITUDE - SUB_BUCKET_BITS + 1))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def bucket_upper(index: int) -> int:
+        if index < SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        value = min(max(value, 0), (1 << MAX_MAGNITUDE) - 1)
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantiles(self, quantiles: tuple[float, ...] = QUANTILES) -> list[int]:
+        """Upper bounds of the buckets holding the quantiles (nearest rank), capped by the max value"""
+        counts, count, result = list(self.counts), sum(self.counts), []
+        for quantile in quantiles:
+            rank, seen = max(1, int(quantile * count + 0.999999)), 0
+            for index, bucket_count in enumerate(counts):
+                seen += bucket_count
+                if seen >= rank:
+                    result.append(min(self.bucket_upper(index), self.max))
+                    break
+            else:
+                result.append(0)
+        return result
+
+
+class Metrics:
+    """In-process metrics registry, recorded by the event loop and rendered in Prometheus text format by the scrape
+    thread (reads are copies, nothing is locked)"""
+
+    def __init__(self) -> None:
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], int] = {}
+        self.gauges: dict[tuple[str, tuple[tuple[str, str], ...]], Callable[[], float]] = {}
+        self.dequeued_at = 0  # perf_counter_ns of the message being handled, 0 outside of message handling
+        self.orders_sent: dict[str, int] = {}  # symbol -> perf_counter_ns of the last order.place
+        self.started = time.perf_counter_ns()
+        self.startup: dict[str, int] = {}  # startup stage -> ms since start (first occurrence)
+
+    def histogram(self, stage: str) -> Histogram:
+        if (histogram := self.histograms.get(stage)) is None:
+            histogram = self.histograms[stage] = Histogram()
+        return histogram
+
+    def observe(self, stage: str, started_ns: int, finished_ns: int) -> None:
+        self.histogram(stage).record((finished_ns - started_ns) // 1000)
+
+    def inc(self, name: str, value: int = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name: str, getter: Callable[[], float], **labels: str) -> None:
+        """Value is read by the getter on scrape"""
+        self.gauges[(name, tuple(sorted(labels.items())))] = getter
+
+    def mark(self, stage: str) -> bool:
+        """Startup stage reached, False if it was already marked"""
+        if stage in self.startup:
+            return False
+        self.startup[stage] = (time.perf_counter_ns() - self.started) // 1_000_000
+        return True
+
+    # pipeline stages
+
+    def received(self, channel: str, message: Any, received_at: int) -> None:
+        self.inc("messages_total", channel=channel)
+        if getattr(message, "received_at", None) is not None:
+            message.received_at = received_at
+            if event_time := message.event_time:  # bookTicker updates have no event time
+                self.histogram("event_to_receive").record(int(time.time() * 1_000_000) - event_time * 1000)
+
+    def dequeued(self, message: Any) -> None:
+        self.dequeued_at = time.perf_counter_ns()
+        if received_at := getattr(message, "received_at", 0):
+            self.observe("receive_to_dequeue", received_at, self.dequeued_at)
+
+    def handled(self) -> None:
+        self.dequeued_at = 0
+
+    def order_sent(self, symbol: str, side: str) -> int:
+        sent_at = time.perf_counter_ns()
+        self.inc("orders_total", symbol=symbol, side=side)
+        self.orders_sent[symbol] = sent_at
+        if self.dequeued_at:  # order decided by the handled message (not by the time watcher)
+            self.observe("dequeue_to_order", self.dequeued_at, sent_at)
+        return sent_at
+
+    def order_filled(self, symbol: str, received_at: int) -> int:
+        """Order to fill latency (us), 0 if the order was not sent by this process"""
+        if (sent_at := self.orders_sent.pop(symbol, 0)) and received_at:
+            self.observe("order_to_fill", sent_at, received_at)
+            return (received_at - sent_at) // 1000
+        return 0
+
+    # Prometheus text format
+
+    def render(self) -> str:
+        lines = []
+        lines.append("# TYPE btb_stage_latency_microseconds summary")
+        for stage, histogram in list(self.histograms.items()):
+            for quantile, value in zip(QUANTILES, histogram.quantiles(), strict=True):
+                lines.append(f'btb_stage_latency_microseconds{{stage="{stage}",quantile="{quantile}"}} {value}')
+            lines.append(f'btb_stage_latency_microseconds_sum{{stage="{stage}"}} {histogram.total}')
+            lines.append(f'btb_stage_latency_microseconds_count{{stage="{stage}"}} {histogram.count}')
+
+        self.render_samples(lines, "counter", sorted(self.counters.items()))
+
+        if self.startup:
+            lines.append("# TYPE btb_startup_milliseconds gauge")
+        for stage, value in list(self.startup.items()):
+            lines.append(f'btb_startup_milliseconds{{stage="{stage}"}} {value}')
+
+        gauges = sorted(self.gauges.items(), key=lambda item: item[0])
+        self.render_samples(lines, "gauge", [(key, getter()) for key, getter in gauges])
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def render_samples(lines: list[str], metric_type: str, samples: list[tuple[tuple[str, Any], float]]) -> None:
+        """Samples are sorted by name, so samples of a metric are grouped under one TYPE line"""
+        typed = set()
+        for (name, labels), value in samples:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE btb_{name} {metric_type}")
+            labels_text = ",".join(f'{key}="{label}"' for key, label in labels)
+            lines.append(f"btb_{name}{{{labels_text}}} {value}" if labels else f"btb_{name} {value}")
+
+
+metrics = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass  # scrapes are not logged
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Scrape endpoint runs in a daemon thread, the trading loop only updates counters"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Metrics endpoint: http://{host}:{server.server_address[1]}/metrics", channel="metrics")
+    return server
@@ -0,0 +1,164 @@
+import asyncio
+import math
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Awaitable, Callable
+from functools import partial
+from typing import Any
+
+import structlog
+
+from core.metrics import metrics
+from models import DepthUpdate
+
+logger = structlog.get_logger(__name__)
+
+PENDING_UPDATES = 1000  # diffs buffered while the snapshot is requested, older ones are dropped (and resynced)
+
+
+class BookSide:
+    """Price levels sorted from the best one: sort keys (prices, negated for bids) and quantities in parallel lists.
+    A level is found by bisect (O(log n)), insert/delete shift the tail of the arrays (memmove of pointers)."""
+
+    __slots__ = ("sign", "keys", "quantities")
+
+    def __init__(self, sign: int) -> None:
+        self.sign = sign  # 1 - asks (ascending prices), -1 - bids (descending prices)
+        self.keys: list[float] = []
+        self.quantities: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self) -> None:
+        self.keys.clear()
+        self.quantities.clear()
+
+    def update(self, price: float, quantity: float) -> None:
+        key = price * self.sign
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            if quantity:
+                self.quantities[index] = quantity
+            else:
+                del self.keys[index], self.quantities[index]
+        elif quantity:
+            self.keys.insert(index, key)
+            self.quantities.insert(index, quantity)
+
+    def best(self) -> float:
+        return self.keys[0] * self.sign if self.keys else 0.0
+
+    def fill_price(self, quantity: float) -> float:
+        """Average price of a market order of the quantity walking the levels, 0.0 if the side is too thin"""
+        remaining, cost = quantity, 0.0
+        for key, level_quantity in zip(self.keys, self.quantities, strict=True):
+            if level_quantity >= remaining:
+                return (cost + remaining * key * self.sign) / quantity
+            remaining -= level_quantity
+            cost += level_quantity * key * self.sign
+        return 0.0
+
+
+class OrderBook:
+    """Local L2 book of a symbol: depth diffs applied on top of a ws-api snapshot. Diffs received before the snapshot
+    are buffered, a gap in update ids (lost frame, reconnect) drops the book until the next snapshot. Diffs already
+    applied (redundant connections, buffered before the snapshot) are skipped by the update id."""
+
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol
+        self.bids = BookSide(-1)
+        self.asks = BookSide(1)
+        self.update_id = 0  # final update id of the last applied diff, 0 - not synced
+        self.pending: deque[DepthUpdate] = deque(maxlen=PENDING_UPDATES)
+
+    @property
+    def synced(self) -> bool:
+        return self.update_id > 0
+
+    def reset(self) -> None:
+        self.update_id = 0
+        self.bids.clear()
+        self.asks.clear()
+
+    def apply(self, update: DepthUpdate) -> bool:
+        """False when the book waits for a snapshot"""
+        if not self.update_id:
+            self.pending.append(update)
+            return False
+        if update.final_update_id <= self.update_id:
+            return True
+        if update.first_update_id > self.update_id + 1:
+            self.reset()
+            self.pending.append(update)
+            return False
+        for price, quantity in update.bids:
+            self.bids.update(price, quantity)
+        for price, quantity in update.asks:
+            self.asks.update(price, quantity)
+        self.update_id = update.final_update_id
+        return True
+
+    def load_snapshot(self, snapshot: dict[str, Any]) -> bool:
+        """ws-api depth result, False if the buffered diffs don't continue it (the snapshot is too old)"""
+        self.reset()
+        for price, quantity in snapshot["bids"]:
+            self.bids.update(float(price), float(quantity))
+        for price, quantity in snapshot["asks"]:
+            self.asks.update(float(price), float(quantity))
+        self.update_id = snapshot["lastUpdateId"]
+        pending, self.pending = self.pending, deque(maxlen=PENDING_UPDATES)
+        applied = [self.apply(update) for update in pending]  # after a gap the rest is buffered again
+        return all(applied)
+
+    def side(self, order_side: str) -> BookSide:
+        """Levels a market order of the side is filled against"""
+        return self.asks if order_side == "BUY" else self.bids
+
+    def fill_price(self, order_side: str, quantity: float) -> float:
+        return self.side(order_side).fill_price(quantity) if self.update_id else 0.0
+
+    def slippage(self, order_side: str, quantity: float) -> float:
+        """Percent of the expected fill price beyond the best price, inf if the book is not synced or too thin"""
+        side = self.side(order_side)
+        if not (fill_price := self.fill_price(order_side, quantity)):
+            return math.inf
+        return (fill_price - side.best()) * side.sign / side.best() * 100
+
+
+class OrderBooks:
+    """Books of the traded symbols. Diffs are applied as the frames are received (not through the events queue), so
+    the book is never behind the trades the trader is processing. Snapshots are requested when a book is dropped."""
+
+    def __init__(self, symbols: list[str], snapshot: Callable[[str], Awaitable[dict[str, Any]]]) -> None:
+        self.snapshot = snapshot
+        self.books: dict[str, OrderBook] = {}
+        self.syncing: dict[str, asyncio.Task] = {}
+        self.set_symbols(symbols)
+
+    def set_symbols(self, symbols: list[str]) -> None:
+        self.books = {symbol: OrderBook(symbol) for symbol in symbols}
+        for symbol in symbols:
+            metrics.gauge("book_synced", partial(self.synced, symbol), symbol=symbol)
+
+    def get(self, symbol: str) -> OrderBook | None:
+        return self.books.get(symbol)
+
+    def synced(self, symbol: str) -> int:
+        return int(bool((book := self.books.get(symbol)) and book.synced))
+
+    def apply(self, update: DepthUpdate) -> None:
+        book = self.books.get(update.symbol)
+        if book and not book.apply(update) and update.symbol not in self.syncing:
+            self.syncing[update.symbol] = asyncio.create_task(self.sync(book))
+
+    async def sync(self, book: OrderBook) -> None:
+        metrics.inc("book_snapshots_total", symbol=book.symbol)
+        try:
+            if not book.load_snapshot(await self.snapshot(book.symbol)):
+                await logger.awarning("Order book snapshot is behind the diffs", channel="depth", symbol=book.symbol)
+        except Exception as error:
+            book.reset()  # requested again on the next diff
+            await logger.awarning(f"Order book snapshot failed: {error}", channel="depth", symbol=book.symbol)
+        finally:
+            del self.syncing[book.symbol]
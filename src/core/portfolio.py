@@ -0,0 +1,68 @@
+import asyncio
+from asyncio import Queue
+from typing import Any
+
+import structlog
+
+from core.metrics import metrics
+from core.timers import TimerQueue
+from core.trader import Trader
+from models import Order, StreamEvent, Trade
+from models.state import Balances
+
+logger = structlog.get_logger(__name__)
+
+
+class Portfolio:
+    """Traders for several symbols in one process, sharing connections and account balances"""
+
+    def __init__(self, symbols: list[str], order_client: Any = None, balances: Balances | None = None) -> None:
+        self.balances = Balances() if balances is None else balances
+        self.timers = TimerQueue()
+        self.traders = {
+            symbol: Trader(symbol=symbol, order_client=order_client, balances=self.balances, timers=self.timers)
+            for symbol in symbols
+        }
+
+    async def events_processing(self, queue: Queue) -> None:
+        while True:
+            try:
+                message = await queue.get()
+                metrics.dequeued(message)
+                await self.handle_message(message)
+                metrics.handled()
+                queue.task_done()
+
+            except asyncio.CancelledError:
+                await logger.ainfo("Task was cancelled: msg processing", channel="trader")
+                break
+
+    async def handle_message(self, message: dict[str, Any] | StreamEvent) -> None:
+        if symbol := self.message_symbol(message):
+            if trader := self.traders.get(symbol):
+                self.bind_symbol(symbol)
+                await trader.handle_message(message)
+            return
+
+        # account wide messages (balances, exchange info, user stream events)
+        for symbol, trader in self.traders.items():
+            self.bind_symbol(symbol)
+            await trader.handle_message(message)
+
+    @staticmethod
+    def message_symbol(message: dict[str, Any] | StreamEvent) -> str:
+        if isinstance(message, Trade | Order):
+            return message.symbol
+        if isinstance(message, dict):
+            return message.get("s") or message.get("symbol") or ""
+        return ""
+
+    @staticmethod
+    def bind_symbol(symbol: str) -> None:
+        """Bind symbol to the log context of the calling task (events and timers tasks have their own contexts),
+        trader logs pass the symbol explicitly, the binding covers the adapters called on its behalf"""
+        structlog.contextvars.bind_contextvars(symbol=symbol)
+
+    async def time_watcher(self) -> None:
+        """Single timers task for all symbols, see TimerQueue"""
+        await self.timers.run()
@@ -0,0 +1,138 @@
+import asyncio
+from collections import deque
+from typing import Any
+
+import structlog
+from core.metrics import metrics
+from models import Trade
+from settings import settings
+
+logger = structlog.get_logger(__name__)
+
+
+class ConflatingQueue(asyncio.Queue):
+    """Events queue which collapses pending trades of a symbol into the newest one when the consumer falls behind.
+
+    Merged trade keeps max/min price of the collapsed trades (high_price/low_price), so TP/SL crossing isn't missed.
+    Any other event (orders, balances, session responses) is never merged and works as a barrier: trades received
+    after it are not merged into trades received before it.
+    """
+
+    def _init(self, maxsize: int) -> None:
+        self._queue: deque = deque()
+        self.pending: dict[str, Trade] = {}
+        self.conflated = 0
+        self.peak_size = 0
+
+    def _put(self, item: Any) -> None:
+        self._queue.append(item)
+        self.peak_size = max(self.peak_size, self.qsize())
+
+    def _get(self) -> Any:
+        item = self._queue.popleft()
+        self.release(item)
+        return item
+
+    def put_nowait(self, item: Any) -> None:
+        if isinstance(item, Trade):
+            if self.merge(item):
+                return
+        else:
+            self.barrier()
+        super().put_nowait(item)
+
+    def merge(self, trade: Trade) -> bool:
+        """Merge trade into the pending one of the same symbol, the first trade becomes pending"""
+        if (pending := self.pending.get(trade.symbol)) is None:
+            self.pending[trade.symbol] = trade
+            return False
+        pending.high_price = max(pending.high_price, pending.price, trade.price)
+        pending.low_price = min(pending.low_price, pending.price, trade.price)
+        pending.event_time, pending.trade_time = trade.event_time, trade.trade_time
+        pending.price, pending.quantity = trade.price, trade.quantity
+        self.conflated += 1
+        return True
+
+    def barrier(self) -> None:
+        self.pending.clear()
+
+    def release(self, item: Any) -> None:
+        """Consumed trade must not be updated anymore"""
+        if isinstance(item, Trade) and self.pending.get(item.symbol) is item:
+            del self.pending[item.symbol]
+
+
+class PriorityLanesQueue(ConflatingQueue):
+    """Events queue with two FIFO lanes: orders, balances, ws-api responses and stream events are always drained
+    before market data, so a fill isn't waiting behind thousands of trades. Market data lane is optionally conflating,
+    a high lane event still closes the pending merges: a fill jumps ahead of them, so trades received after it must not
+    be merged into the high/low range of trades received before it (a false TP/SL right after the entry).
+    """
+
+    def __init__(self, maxsize: int = 0, conflation: bool = False) -> None:
+        self.conflation = conflation
+        super().__init__(maxsize)
+
+    def _init(self, maxsize: int) -> None:
+        super()._init(maxsize)
+        self.market_data: deque = deque()
+
+    def _put(self, item: Any) -> None:
+        if is_market_data(item):
+            self.market_data.append(item)
+        else:
+            self._queue.append(item)
+        self.peak_size = max(self.peak_size, self.qsize())
+
+    def _get(self) -> Any:
+        item = self._queue.popleft() if self._queue else self.market_data.popleft()
+        self.release(item)
+        return item
+
+    def qsize(self) -> int:
+        return len(self._queue) + len(self.market_data)
+
+    def empty(self) -> bool:
+        return not (self._queue or self.market_data)
+
+    def merge(self, trade: Trade) -> bool:
+        return self.conflation and super().merge(trade)
+
+
+def is_market_data(item: Any) -> bool:
+    return isinstance(item, Trade) or (isinstance(item, dict) and item.get("e") == "trade")
+
+
+def create_events_queue() -> asyncio.Queue:
+    if settings.QUEUE_PRIORITY_LANES:
+        return PriorityLanesQueue(conflation=settings.QUEUE_CONFLATION)
+    return ConflatingQueue() if settings.QUEUE_CONFLATION else asyncio.Queue()
+
+
+def register_queue_metrics(queue: asyncio.Queue) -> None:
+    metrics.gauge("events_queue_size", queue.qsize)
+    if isinstance(queue, ConflatingQueue):
+        metrics.gauge("events_queue_conflated", lambda: queue.conflated)
+
+
+async def queue_reporter(queue: asyncio.Queue, interval: float) -> None:
+    """Periodically log events queue depth (and conflated trades count for ConflatingQueue)"""
+    while True:
+        try:
+            await asyncio.sleep(interval)
+            if isinstance(queue, ConflatingQueue):
+                await logger.ainfo(
+                    "Events queue stats",
+                    channel="queue",
+                    size=queue.qsize(),
+                    peak_size=queue.peak_size,
+                    conflated=queue.conflated,
+                    market_data=len(queue.market_data) if isinstance(queue, PriorityLanesQueue) else None,
+                )
+                queue.peak_size = queue.qsize()
+            else:
+                await logger.ainfo("Events queue stats", channel="queue", size=queue.qsize())
+
+        except asyncio.CancelledError:
+            await logger.ainfo("Task was cancelled: queue reporter", channel="queue")
+            break
@@ -0,0 +1,208 @@
+import asyncio
+import os
+import signal
+import threading
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+import msgspec
+import structlog
+import uvloop
+from adapters.binance_wss import BinanceWSS, private_wss_client, public_wss_client
+from adapters.recorder import FrameRecorder
+from core.metrics import start_metrics_server
+from core.portfolio import Portfolio
+from core.queues import create_events_queue, queue_reporter, register_queue_metrics
+from core.trader import Trader
+from models import AccountPosition, BalanceUpdate, Order, StreamEvent
+from models.state import SharedBalances
+from settings import settings
+
+logger = structlog.get_logger(__name__)
+
+# the supervisor owns the account, workers only trade their symbols
+ACCOUNT_METHODS = ("userDataStream.start", "account.status")
+WORKER_METHODS = ("session.logon", "trades.recent", "exchangeInfo")
+
+
+def close_tasks(tasks: list) -> None:
+    for task in tasks:
+        task.cancel()
+
+
+def split_symbols(symbols: list[str], workers: int) -> list[list[str]]:
+    """Round-robin symbols to workers, there are no empty shards"""
+    return [symbols[index::workers] for index in range(min(workers, len(symbols)))]
+
+
+class Supervisor:
+    """Runs symbols shards in worker processes pinned to cores. The supervisor holds the only user data stream:
+    balances are published to the workers through shared memory, execution reports are routed by symbol"""
+
+    def __init__(self, symbols: list[str], workers: int) -> None:
+        self.context = get_context("spawn")
+        self.shards = split_symbols(symbols, workers)
+        self.balances = SharedBalances()
+        self.queues = [self.context.Queue() for _ in self.shards]
+        self.routes = {symbol: queue for shard, queue in zip(self.shards, self.queues, strict=True) for symbol in shard}
+        self.processes: list[Any] = []
+
+    @staticmethod
+    def worker_cpu(index: int) -> int | None:
+        """Cpu for the worker, the first available one is left to the supervisor when there are enough cores"""
+        if not hasattr(os, "sched_getaffinity"):
+            return None
+        cpus = sorted(os.sched_getaffinity(0))
+        return cpus[(index + 1) % len(cpus)]
+
+    def start_workers(self) -> None:
+        for index, (symbols, queue) in enumerate(zip(self.shards, self.queues, strict=True)):
+            process = self.context.Process(
+                target=run_worker,
+                args=(index, symbols, queue, self.balances.reader(), self.worker_cpu(index)),
+                name=f"worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+            logger.info(f"Worker {index} started for {','.join(symbols)}", channel="supervisor", pid=process.pid)
+
+    def stop_workers(self) -> None:
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process, queue in zip(self.processes, self.queues, strict=True):
+            process.join(timeout=10)
+            queue.close()
+            queue.cancel_join_thread()
+
+    async def run(self) -> None:
+        self.start_workers()
+        private_wss_client.startup_methods = ACCOUNT_METHODS
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks = [
+            asyncio.create_task(private_wss_client.wss_connect(queue)),
+            asyncio.create_task(self.events_processing(queue)),
+            asyncio.create_task(self.workers_watcher()),
+        ]
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            asyncio.get_running_loop().add_signal_handler(sig, lambda: close_tasks(tasks))
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.stop_workers()
+
+    async def events_processing(self, queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                message = await queue.get()
+                await self.handle_message(message)
+                queue.task_done()
+
+            except asyncio.CancelledError:
+                await logger.ainfo("Task was cancelled: msg processing", channel="supervisor")
+                break
+
+    async def handle_message(self, message: dict[str, Any] | StreamEvent) -> None:
+        if isinstance(message, dict) and message.get("e") in ("executionReport", "outboundAccountPosition"):
+            message = msgspec.convert(message, type=Order | AccountPosition, strict=False)  # type: ignore
+
+        match message:
+            case Order():
+                if queue := self.routes.get(message.symbol):
+                    queue.put(message)
+            case AccountPosition():
+                self.update_balances(message.balances)
+            case dict() if message.get("channel") == "private_account_status":
+                for bal in message.get("result", {}).get("balances", []):
+                    self.balances.update_balance(bal["asset"], float(bal["free"]), float(bal["locked"]))
+                self.broadcast(message)  # workers become balance ready, values are read from the shared table
+            case dict() if message.get("channel") == "user_stream" and message.get("event") == "connected":
+                self.broadcast(message)
+
+    def update_balances(self, data: list[BalanceUpdate]) -> None:
+        for bal in data:
+            self.balances.update_balance(bal.asset, bal.free, bal.locked)
+        logger.debug("Shared balances updated", channel="supervisor", assets=len(data))
+
+    def broadcast(self, message: dict[str, Any]) -> None:
+        for queue in self.queues:
+            queue.put(message)
+
+    async def workers_watcher(self) -> None:
+        """Worker exits only on fatal errors (see Trader.exit_with_error), stop the whole bot in that case"""
+        while True:
+            try:
+                for index, process in enumerate(self.processes):
+                    if not process.is_alive():
+                        await logger.aerror(f"Worker {index} exited with code {process.exitcode}", channel="supervisor")
+                        os.kill(os.getpid(), signal.SIGTERM)
+                        return
+                await asyncio.sleep(1)
+
+            except asyncio.CancelledError:
+                await logger.ainfo("Task was cancelled: workers watcher", channel="supervisor")
+                break
+
+
+def forward_events(source: Any, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue) -> None:
+    """Move supervisor messages from the process queue to the worker event loop"""
+    while True:
+        message = source.get()
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+        except RuntimeError:  # loop is closed
+            break
+
+
+def run_worker(index: int, symbols: list[str], source: Any, balances: SharedBalances, cpu: int | None) -> None:
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        runner.run(worker_main(index, symbols, source, balances))
+
+
+async def worker_main(index: int, symbols: list[str], source: Any, balances: SharedBalances) -> None:
+    structlog.contextvars.bind_contextvars(
+        symbol=",".join(symbols), worker=index, version=settings.VERSION, environment=settings.ENVIRONMENT
+    )
+
+    if settings.RECORD_FRAMES:
+        BinanceWSS.recorder = FrameRecorder(Path(settings.RECORD_PATH) / f"worker_{index}")
+        BinanceWSS.recorder.start()
+
+    if settings.METRICS_PORT:
+        start_metrics_server(settings.METRICS_PORT + 1 + index)
+
+    # one state database for all workers (rows are per symbol), ledger files of a worker are in its subdirectory
+    Trader.open_storage(Path(settings.LEDGER_PATH) / f"worker_{index}")
+
+    public_wss_client.set_symbols(symbols)
+    private_wss_client.set_symbols(symbols)
+    private_wss_client.startup_methods = WORKER_METHODS
+
+    portfolio = Portfolio(symbols, balances=balances)
+    queue: asyncio.Queue = create_events_queue()
+    register_queue_metrics(queue)
+    threading.Thread(
+        target=forward_events, args=(source, asyncio.get_running_loop(), queue), name="supervisor-events", daemon=True
+    ).start()
+    tasks = [
+        asyncio.create_task(public_wss_client.wss_connect(queue)),
+        asyncio.create_task(private_wss_client.wss_connect(queue)),
+        asyncio.create_task(portfolio.events_processing(queue)),
+        asyncio.create_task(portfolio.time_watcher()),
+    ]
+    if settings.QUEUE_REPORT_INTERVAL:
+        tasks.append(asyncio.create_task(queue_reporter(queue, settings.QUEUE_REPORT_INTERVAL)))
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(sig, lambda: close_tasks(tasks))
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    if BinanceWSS.recorder:
+        BinanceWSS.recorder.close()
+    Trader.close_storage()
+    await BinanceWSS.close_session()
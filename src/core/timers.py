@@ -0,0 +1,82 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from collections.abc import Awaitable, Callable
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "symbol", "cancelled")
+
+    def __init__(self, deadline: float, callback: Callable[[], Awaitable[None]], symbol: str = "") -> None:
+        self.deadline = deadline
+        self.callback = callback
+        self.symbol = symbol
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Cancelled timer stays in the heap and is dropped when it reaches the top"""
+        self.cancelled = True
+
+
+class TimerQueue:
+    """Deadlines (ms of the trader clock, exchange time) of all symbols in one heap, served by a single task.
+    The task sleeps on the loop clock until the nearest deadline and is woken only when an earlier timer is added.
+    Backtester drives the same queue from trade timestamps with run_due."""
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self.clock = clock
+        self.heap: list[tuple[float, int, Timer]] = []
+        self.counter = itertools.count()  # equal deadlines fire in scheduling order
+        self.wakeup = asyncio.Event()
+
+    def schedule(self, deadline: float, callback: Callable[[], Awaitable[None]], symbol: str = "") -> Timer:
+        timer = Timer(deadline, callback, symbol)
+        heapq.heappush(self.heap, (deadline, next(self.counter), timer))
+        if self.heap[0][2] is timer:
+            self.wakeup.set()
+        return timer
+
+    def next_deadline(self) -> float | None:
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def due(self, timestamp: float) -> bool:
+        return bool(self.heap) and self.heap[0][0] <= timestamp
+
+    async def run_due(self, timestamp: float) -> None:
+        while (deadline := self.next_deadline()) is not None and deadline <= timestamp:
+            _, _, timer = heapq.heappop(self.heap)
+            timer.cancelled = True  # fired, late cancel is a no-op
+            if timer.symbol:  # log context of the timers task, the events task binds its own
+                structlog.contextvars.bind_contextvars(symbol=timer.symbol)
+            try:
+                await timer.callback()
+            except Exception:  # a failed callback must not stop the deadlines of the other timers and symbols
+                logger.exception("Timer callback failed", channel="trader", symbol=timer.symbol)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                self.wakeup.clear()
+                if (deadline := self.next_deadline()) is None:
+                    await self.wakeup.wait()
+                    continue
+
+                timestamp = self.clock() * 1000
+                if deadline > timestamp:
+                    with contextlib.suppress(TimeoutError):
+                        async with asyncio.timeout((deadline - timestamp) / 1000):
+                            await self.wakeup.wait()
+                    continue
+                await self.run_due(timestamp)
+
+            except asyncio.CancelledError:
+                await logger.ainfo("Task was cancelled: timers", channel="trader")
+                break
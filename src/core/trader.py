@@ -1,47 +1,137 @@
 import asyncio
+import math
 import os
 import signal
 import sys
 import time
 from asyncio import Queue
-from typing import Any
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable
 
 import msgspec
 import structlog
-from adapters.binance_wss import private_wss_client
-from models import STATUS, Order, Position, State, Trade
+from adapters.binance_wss import BinanceWSS, RequestError, new_client_order_id, private_wss_client
+from adapters.ledger import RoundTrip, TradeLedger
+from adapters.state_store import StateStore
+from core.indicators import RollingIndicators
+from core.metrics import metrics
+from core.order_book import OrderBook
+from core.timers import Timer, TimerQueue
+from models import (
+    EXIT_REASON,
+    STATUS,
+    AccountPosition,
+    BalanceUpdate,
+    BookTicker,
+    FixedPoint,
+    Order,
+    PendingOrder,
+    Position,
+    State,
+    StreamEvent,
+    Trade,
+)
+from models.state import Balances, StateSnapshot
 from settings import settings
 
 logger = structlog.get_logger(__name__)
 
+ORDER_RETRY_DELAY = 1000  # ms before closing again after a failed close order, doubled on every next failure
+ORDER_RETRY_MAX_DELAY = 30000
+ORDER_NOT_FOUND = -2013  # order.status error code, the order never reached the exchange
 
-class Trader:
-    def __init__(self) -> None:
-        self.state = State()
-
-    def parse_message(self, message: dict[str, Any]) -> Trade | Order | None:
-        if not (event_type := message.get("e", message.get("channel"))):
-            return None
 
-        match event_type:
+class Trader:
+    store: StateStore | None = None
+    ledger: TradeLedger | None = None
+
+    def __init__(
+        self,
+        symbol: str = settings.SYMBOL,
+        order_client: Any = None,
+        clock: Callable[[], float] = time.time,
+        balances: Balances | None = None,
+        timers: TimerQueue | None = None,
+    ) -> None:
+        self.symbol = symbol
+        self.state = State() if balances is None else State(balances=balances)
+        self.order_client = order_client or private_wss_client
+        self.clock = clock
+        self.timers = TimerQueue(clock) if timers is None else timers
+        self.hold_timer: Timer | None = None
+        self.order_quote = (0.0, 0.0)  # best and expected fill price of the last order (local book), 0 - unknown
+        self.entry_postponed = False  # by the slippage cap, logged once
+        self.close_retry_at = 0  # ms, TP/SL close is not sent again before it (rejected close order), 0 - no backoff
+        self.close_failures = 0
+        self.fixed: FixedPoint | None = None  # FIXED_POINT, from the symbol filters of exchangeInfo
+        self.indicators: RollingIndicators | None = None
+        if settings.POSITION_LEVELS != "percent":
+            self.indicators = RollingIndicators(
+                settings.INDICATOR_WINDOW, settings.INDICATOR_BAR_SECONDS * 1000, settings.INDICATOR_BARS
+            )
+            for name in ("vwap", "volatility", "atr"):
+                metrics.gauge(f"indicator_{name}", partial(getattr, self.indicators, name), symbol=self.symbol)
+        if self.store and (snapshot := self.store.load(self.symbol)):
+            self.restore_state(snapshot)
+
+    @classmethod
+    def open_storage(cls, ledger_path: str | Path) -> None:
+        """State store and trade ledger shared by the traders of the process"""
+        if settings.STATE_DB_PATH:
+            cls.store = StateStore(settings.STATE_DB_PATH, settings.STATE_FLUSH_INTERVAL)
+            cls.store.start()
+        if settings.LEDGER_PATH:
+            cls.ledger = TradeLedger(ledger_path)
+            cls.ledger.start()
+
+    @property
+    def book(self) -> OrderBook | None:
+        return BinanceWSS.books.get(self.symbol) if BinanceWSS.books else None
+
+    @classmethod
+    def close_storage(cls) -> None:
+        for writer in (cls.store, cls.ledger):
+            if writer:
+                writer.close()
+
+    def parse_message(self, message: dict[str, Any] | StreamEvent) -> Trade | Order | None:
+        if not isinstance(message, dict):
+            return self.parse_struct(message)
+
+        match event_type := message.get("e", message.get("channel")):
             case "trade":
-                return msgspec.convert(message, type=Trade)
+                return msgspec.convert(message, type=Trade, strict=False)
             case "executionReport":
-                return msgspec.convert(message, type=Order)
+                return msgspec.convert(message, type=Order, strict=False)
             case "outboundAccountPosition":
-                self.update_balances(message["B"])
-
-            case t if t.startswith("private_"):
-                _, msg_type = event_type.split("_", 1)
-                match msg_type:
-                    case "trades_recent":
-                        self.parse_recent_trades(message.get("result", {}))
-                    case "order":
-                        return msgspec.convert(message, type=Order)
-                    case "exchangeinfo":
-                        self.parse_exchange_info(message.get("result", {}))
-                    case "account_status":
-                        self.parse_and_update_balances(message.get("result", {}))
+                self.update_balances(msgspec.convert(message, type=AccountPosition, strict=False).balances)
+            case str() if event_type.startswith("private_"):
+                return self.parse_private_response(event_type.split("_", 1)[1], message)
+        return None
+
+    def parse_struct(self, message: StreamEvent) -> Trade | Order | None:
+        """Event already decoded by the stream into its struct"""
+        match message:
+            case Trade() | Order():
+                return message
+            case AccountPosition():
+                self.update_balances(message.balances)
+        return None
+
+    def parse_private_response(self, msg_type: str, message: dict[str, Any]) -> Order | None:
+        """Response of the private (ws api) connection, msg_type is the channel without the "private_" prefix"""
+        match msg_type:
+            case "trades_recent":
+                if message.get("symbol", self.symbol) == self.symbol:
+                    self.parse_recent_trades(message.get("result", {}))
+            case "order":
+                return msgspec.convert(message, type=Order, strict=False)
+            case "exchangeinfo":
+                self.parse_exchange_info(message.get("result", {}))
+            case "account_status":
+                self.parse_and_update_balances(message.get("result", {}))
+        return None
 
     def parse_recent_trades(self, data: dict[str, Any]) -> None:
         for trade in data:
@@ -58,35 +148,38 @@ class Trader:
         self.state.balance_ready = True
         logger.info(
             f"Balances updated: "
-            f"{self.state.base_asset}: {getattr(self.state.balances, self.state.base_asset).free}, "
-            f"{self.state.quote_asset}: {getattr(self.state.balances, self.state.quote_asset).free}",
+            f"{self.state.base_asset}: {self.balance_free(self.state.base_asset)}, "
+            f"{self.state.quote_asset}: {self.balance_free(self.state.quote_asset)}",
             channel="trader",
+            symbol=self.symbol,
         )
 
-    def update_balances(self, data: dict[str, Any]) -> None:
+    def update_balances(self, data: list[BalanceUpdate]) -> None:
         for bal in data:
-            asset = bal["a"]  # type: ignore
-            free = float(bal["f"])  # type: ignore
-            locked = float(bal["l"])  # type: ignore
-            self.state.balances.update_balance(asset, free, locked)
+            self.state.balances.update_balance(bal.asset, bal.free, bal.locked)
         logger.info(
             f"Balances updated: "
-            f"{self.state.base_asset}: {getattr(self.state.balances, self.state.base_asset).free}, "
-            f"{self.state.quote_asset}: {getattr(self.state.balances, self.state.quote_asset).free}",
+            f"{self.state.base_asset}: {self.balance_free(self.state.base_asset)}, "
+            f"{self.state.quote_asset}: {self.balance_free(self.state.quote_asset)}",
             channel="trader",
+            symbol=self.symbol,
         )
 
+    def balance_free(self, asset: str) -> float:
+        """Free balance for logs, assets are unknown until exchange info (may come later in worker processes)"""
+        balance = getattr(self.state.balances, asset) if asset else None
+        return balance.free if balance else 0.0
+
     def parse_exchange_info(self, data: dict[str, Any]) -> None:
-        if info_symbol := data.get("symbols", [])[0].get("symbol"):
-            if settings.SYMBOL == info_symbol:
-                symbol_details = data.get("symbols", [])[0]
+        for symbol_details in data.get("symbols", []):
+            if symbol_details.get("symbol") == self.symbol:
                 filters = symbol_details.get("filters", [])
 
                 self.state.base_asset = symbol_details.get("baseAsset")
                 self.state.quote_asset = symbol_details.get("quoteAsset")
 
                 if not symbol_details.get("status") == "TRADING":
-                    logger.error(f"Symbol {settings.SYMBOL} is not in TRADING state", channel="trader")
+                    logger.error(f"Symbol {self.symbol} is not in TRADING state", channel="trader", symbol=self.symbol)
                     self.exit_with_error()
                     return
 
@@ -94,111 +187,171 @@ class Trader:
                 self.state.min_qty = float(min_qtys[0]) if min_qtys else 0.0
                 min_notional = [f["minNotional"] for f in filters if f["filterType"] == "NOTIONAL"]
                 self.state.min_notional = float(min_notional[0]) if min_notional else 0.0
+                if settings.FIXED_POINT:
+                    self.set_fixed_point(filters)
 
                 if not self.state.min_qty or settings.POSITION_QUANTITY < self.state.min_qty:
                     logger.error(
-                        f"Invalid position amount, min_qty for {settings.SYMBOL} is {self.state.min_qty}, "
+                        f"Invalid position amount, min_qty for {self.symbol} is {self.state.min_qty}, "
                         f"but you try to trade {settings.POSITION_QUANTITY}",
                         channel="trader",
+                        symbol=self.symbol,
                     )
                     self.exit_with_error()
                     return
 
                 self.state.symbols_ready = True
-        logger.info("Symbols updated", channel="trader")
+        logger.info("Symbols updated", channel="trader", symbol=self.symbol)
+
+    def set_fixed_point(self, filters: list[dict[str, Any]]) -> None:
+        if not (fixed := FixedPoint.from_filters(filters)):
+            logger.warning(
+                f"No tickSize/stepSize for {self.symbol}, prices are compared as floats",
+                channel="trader",
+                symbol=self.symbol,
+            )
+        self.fixed = fixed
 
     async def events_processing(self, queue: Queue) -> None:
         while True:
             try:
                 message = await queue.get()
-                await self.check_event_messages(message)
-                await self.check_state()
+                metrics.dequeued(message)
+                await self.handle_message(message)
+                metrics.handled()
+                queue.task_done()
 
-                if not (parsed_msg := self.parse_message(message)):
-                    queue.task_done()
-                    continue
+            except asyncio.CancelledError:
+                await logger.ainfo("Task was cancelled: msg processing", channel="trader", symbol=self.symbol)
+                break
 
-                if isinstance(parsed_msg, Trade):
-                    await self.process_trade(parsed_msg)
-                elif isinstance(parsed_msg, Order):
-                    await self.process_order(parsed_msg)
+    async def handle_message(self, message: dict[str, Any] | StreamEvent) -> None:
+        await self.check_event_messages(message)
+        await self.check_state()
 
-                match self.state.status:
-                    case STATUS.IN_POSITION:
-                        await self.check_position_actions()
-                    case STATUS.READY:
-                        await self.create_new_position()
+        if not (parsed_msg := self.parse_message(message)):
+            return
 
-                queue.task_done()
+        if isinstance(parsed_msg, Trade):
+            await self.process_trade(parsed_msg)
+        elif isinstance(parsed_msg, Order):
+            await self.process_order(parsed_msg)
 
-            except asyncio.CancelledError:
-                await logger.ainfo("Task was cancelled: msg processing", channel="trader")
-                break
+        match self.state.status:
+            case STATUS.IN_POSITION:
+                await self.check_position_actions()
+            case STATUS.READY:
+                await self.create_new_position()
 
-    async def check_event_messages(self, message: dict[str, Any]) -> None:
-        if not message.get("channel"):
+    async def check_event_messages(self, message: dict[str, Any] | StreamEvent) -> None:
+        if not isinstance(message, dict) or not message.get("channel"):
             return
 
         if message.get("channel") == "user_stream" and message.get("event") == "connected":
             self.state.stream_ready = True
-            await logger.adebug("User stream connected", channel="trader")
+            await logger.adebug("User stream connected", channel="trader", symbol=self.symbol)
 
     async def process_trade(self, trade: Trade) -> None:
-        self.state.last_price = float(trade.price)
+        if trade.trade_time < self.state.last_price_time:
+            return  # overtaken on another market data connection, the price is stale
+        self.state.last_price, self.state.last_price_time = trade.price, trade.trade_time
+        self.state.high_price, self.state.low_price = trade.high_price, trade.low_price
+        if self.indicators:
+            # bookTicker quantity is the best bid size, not a traded volume: no weight in the VWAP
+            quantity = 0.0 if type(trade) is BookTicker else trade.quantity
+            self.indicators.update(trade.price, quantity, trade.trade_time, trade.high_price, trade.low_price)
 
     async def check_state(self) -> None:
         if self.state.last_price and self.state.status == STATUS.INITIAL:
-            if all((self.state.stream_ready, self.state.balance_ready, self.state.symbols_ready)):
+            if all((self.state.stream_ready, self.state.balance_ready, self.state.symbols_ready)) and (
+                not self.state.sleeping_at or self.clock() * 1000 >= self.state.sleeping_at  # restored sleep
+            ):
                 self.state.status = STATUS.READY
-                await logger.ainfo("TestBot is ready for trading..", channel="trader")
+                metrics.mark("ready")
+                await logger.ainfo("TestBot is ready for trading..", channel="trader", symbol=self.symbol)
 
     async def process_order(self, order: Order) -> None:
-        if not order.symbol == settings.SYMBOL:
+        if not order.symbol == self.symbol:
             """Simple check for allow run multiple bot instances on same account and different symbols"""
             return
         if order.current_order_status == "FILLED":
-            if self.state.status == STATUS.ENTERING_POSITION and self.state.position:
+            latency = metrics.order_filled(self.symbol, order.received_at)
+            pending = self.state.pending_order
+            expected = not pending or not order.client_order_id or order.client_order_id == pending.client_order_id
+            if expected and self.state.status == STATUS.ENTERING_POSITION and self.state.position:
                 await logger.ainfo(
                     f"Position entered at: {order.last_executed_price}, quantity: {order.last_executed_quantity}"
                     f" {self.state.base_asset}",
                     channel="trader",
+                    symbol=self.symbol,
+                    **self.fill_slippage(order),
                 )
                 price = order.last_executed_price
                 self.state.position.price = price  # type: ignore
                 self.state.position.position_time = order.transaction_time
-                self.state.position.sl_price = price - (price * (settings.POSITION_SL_PERCENT / 100))  # type: ignore
-                self.state.position.tp_price = price + (price * (settings.POSITION_SL_PERCENT / 100))  # type: ignore
+                self.state.position.commission = self.commission_value(order)
+                self.state.position.sl_price, self.state.position.tp_price = self.position_levels(price)
+                if self.fixed:
+                    self.set_position_units(self.state.position, self.fixed)
                 self.state.status = STATUS.IN_POSITION
-            elif self.state.status == STATUS.CLOSING_POSITION:
+                self.state.entry_latency = latency
+                self.state.high_price, self.state.low_price = 0.0, math.inf  # trades range before entry
+                self.state.pending_order = None
+                self.schedule_hold_timer()
+                self.save_state()
+            elif expected and self.state.status == STATUS.CLOSING_POSITION:
                 pnl = self.pnl_calculation(order)
                 await logger.ainfo(
                     f"Position closed at: {order.last_executed_price}, quantity: {order.last_executed_quantity} "
                     f"{self.state.base_asset}, PnL: {pnl}",
                     channel="trader",
+                    symbol=self.symbol,
                     pnl=pnl,
                     total_trades=self.state.total_tp_trades + self.state.total_sl_trades,
                     total_pnl=self.state.total_pnl,
+                    **self.fill_slippage(order),
+                )
+                self.record_round_trip(order, pnl, latency)
+                self.state.position, self.state.pending_order = None, None
+                self.close_retry_at = self.close_failures = 0
+                self.start_sleeping(order.transaction_time)
+                self.save_state()
+                await logger.ainfo(
+                    f"Sleeping for {settings.POSITION_SLEEP_TIME} sec", channel="trader", symbol=self.symbol
                 )
-                self.state.status = STATUS.SLEEPING
-                self.state.sleeping_at = order.transaction_time + settings.POSITION_SLEEP_TIME * 1000
-                self.state.position = None
-                await logger.ainfo(f"Sleeping for {settings.POSITION_SLEEP_TIME} sec", channel="trader")
             else:
                 await logger.aerror(
                     f"Unexpected filled order: {order.current_order_status}, state: {self.state.status}"
                     f"order: {order}",
                     channel="trader",
+                    symbol=self.symbol,
                 )
 
+    def position_levels(self, price: float) -> tuple[float, float]:
+        """SL and TP prices of a position entered at the price, by percents until the indicators are warmed up"""
+        if self.indicators:
+            self.indicators.recompute()  # exact sums instead of the running ones, once per position
+            if unit := self.indicators.level_unit(settings.POSITION_LEVELS, price):
+                return price - unit * settings.POSITION_SL_MULTIPLIER, price + unit * settings.POSITION_TP_MULTIPLIER
+        return (
+            price - (price * (settings.POSITION_SL_PERCENT / 100)),
+            price + (price * (settings.POSITION_TP_PERCENT / 100)),
+        )
+
+    @staticmethod
+    def set_position_units(position: Position, fixed: FixedPoint) -> None:
+        """SL/TP are rounded to the ticks they are crossed at: SL down, TP up"""
+        position.price_units = fixed.price(position.price)
+        position.amount_units = fixed.quantity(position.amount)
+        position.sl_units = fixed.floor_price(position.sl_price)
+        position.tp_units = fixed.ceil_price(position.tp_price)
+
     def pnl_calculation(self, order: Order) -> float:
+        if self.fixed and self.state.position and self.state.position.price_units:
+            return self.fixed_pnl_calculation(order, self.state.position, self.fixed)
         transaction_value = order.last_executed_price * order.quantity  # type: ignore
         position_value = self.state.position.price * self.state.position.amount  # type: ignore
-
-        if order.commission_asset == self.state.base_asset:
-            commission_value = order.commission_amount * order.last_executed_price  # type: ignore
-        else:
-            commission_value = order.commission_amount
-        pnl = transaction_value - position_value - commission_value  # type: ignore
+        pnl = transaction_value - position_value - self.commission_value(order)  # type: ignore
         self.state.total_pnl += pnl
 
         if pnl > 0:
@@ -207,30 +360,209 @@ class Trader:
             self.state.total_sl_trades += 1
         return round(pnl, 6)
 
+    def commission_value(self, order: Order) -> float:
+        if order.commission_asset == self.state.base_asset:
+            return order.commission_amount * order.last_executed_price
+        return order.commission_amount
+
+    def fixed_pnl_calculation(self, order: Order, position: Position, fixed: FixedPoint) -> float:
+        """Exact PnL in notional units, the total is kept on the decimal grid of the units (no float drift)"""
+        price = fixed.price(order.last_executed_price)
+        pnl_units = (
+            fixed.notional(price, fixed.quantity(order.quantity))
+            - fixed.notional(position.price_units, position.amount_units)
+            - fixed.commission(order.commission_amount, price, order.commission_asset == self.state.base_asset)
+        )
+        pnl = fixed.to_quote(pnl_units)
+        self.state.total_pnl = round(self.state.total_pnl + pnl, fixed.notional_decimals)
+
+        if pnl_units > 0:
+            self.state.total_tp_trades += 1
+        else:
+            self.state.total_sl_trades += 1
+        return round(pnl, 6)
+
+    def record_round_trip(self, order: Order, pnl: float, exit_latency: int) -> None:
+        if self.ledger and (position := self.state.position):
+            self.ledger.append(
+                RoundTrip(
+                    symbol=self.symbol,
+                    entry_time=position.position_time,
+                    exit_time=order.transaction_time,
+                    entry_price=position.price,
+                    exit_price=order.last_executed_price,
+                    quantity=order.last_executed_quantity,
+                    commission=order.commission_amount,
+                    entry_commission=position.commission,
+                    commission_asset=order.commission_asset or "",
+                    pnl=pnl,
+                    exit_reason=self.state.exit_reason.value,
+                    entry_latency=self.state.entry_latency,
+                    exit_latency=exit_latency,
+                )
+            )
+        self.state.exit_reason, self.state.entry_latency = EXIT_REASON.UNKNOWN, 0
+
     async def check_position_actions(self) -> None:
         """Check if position should be closed due to TP or SL limits"""
 
         if self.state.status == STATUS.IN_POSITION and self.state.position:
-            if self.state.last_price >= self.state.position.tp_price:
+            if 0 < self.state.last_price_time < self.state.position.position_time:
+                return  # trades made before the fill (market data lane is drained after orders)
+            if self.close_retry_at and self.clock() * 1000 < self.close_retry_at:
+                return  # the last close order was rejected, levels stay crossed
+            take_profit, stop_loss = self.levels_crossed(self.state.position)
+            if take_profit:
                 self.state.status = STATUS.CLOSING_POSITION
-                await logger.ainfo(f"Closing position (take profit): {self.state.last_price}", channel="trader")
-                await private_wss_client.order_place(side="SELL", quantity=self.state.position.amount)
+                self.state.exit_reason = EXIT_REASON.TAKE_PROFIT
+                self.cancel_hold_timer()
+                await logger.ainfo(
+                    f"Closing position (take profit): {self.state.last_price}", channel="trader", symbol=self.symbol
+                )
+                await self.place_order("SELL", self.state.position.amount)
 
-            elif self.state.last_price <= self.state.position.sl_price:
+            elif stop_loss:
                 self.state.status = STATUS.CLOSING_POSITION
-                await logger.ainfo(f"Closing position (stop loss): {self.state.last_price}", channel="trader")
-                await private_wss_client.order_place(side="SELL", quantity=self.state.position.amount)
+                self.state.exit_reason = EXIT_REASON.STOP_LOSS
+                self.cancel_hold_timer()
+                await logger.ainfo(
+                    f"Closing position (stop loss): {self.state.last_price}", channel="trader", symbol=self.symbol
+                )
+                await self.place_order("SELL", self.state.position.amount)
+
+    def levels_crossed(self, position: Position) -> tuple[bool, bool]:
+        """TP and SL crossed by the last price (or the range of the conflated trades)"""
+        high = max(self.state.last_price, self.state.high_price)
+        low = min(self.state.last_price, self.state.low_price)
+        if self.fixed and position.tp_units:  # positions entered before FIXED_POINT have no units
+            return self.fixed.price(high) >= position.tp_units, self.fixed.price(low) <= position.sl_units
+        return high >= position.tp_price, low <= position.sl_price
 
     async def create_new_position(self) -> None:
         if not self.state.status == STATUS.READY:
             return
+        # claimed before any await, the sleep timer and the trade path must not both enter
+        self.state.status = STATUS.ENTERING_POSITION
+        self.state.position = Position(amount=settings.POSITION_QUANTITY)
 
         await self.check_position_limitations()
+        if not self.slippage_allowed():
+            self.state.status, self.state.position = STATUS.READY, None
+            return
 
-        await logger.ainfo(f"Entering new position: {self.state.last_price}", channel="trader")
-        self.state.status = STATUS.ENTERING_POSITION
-        self.state.position = Position(amount=settings.POSITION_QUANTITY)
-        await private_wss_client.order_place(side="BUY", quantity=settings.POSITION_QUANTITY)
+        await logger.ainfo(f"Entering new position: {self.state.last_price}", channel="trader", symbol=self.symbol)
+        await self.place_order("BUY", settings.POSITION_QUANTITY)
+
+    async def place_order(self, side: str, quantity: float) -> None:
+        """The fill comes from the user stream, the order.place response (if the client returns it) is only checked
+        for rejection. The order is persisted as pending until then, a restart reconciles it (reconcile_order)."""
+        self.quote_order(side, quantity)
+        pending = self.state.pending_order = PendingOrder(new_client_order_id(), side, int(self.clock() * 1000))
+        response = await self.order_client.order_place(
+            side=side, quantity=quantity, symbol=self.symbol, client_order_id=pending.client_order_id
+        )
+        if isinstance(response, asyncio.Future):
+            response.add_done_callback(partial(self.order_response, side))
+        self.save_state()
+        if metrics.mark("first_order"):
+            await logger.ainfo("Startup timings (ms)", channel="trader", symbol=self.symbol, **metrics.startup)
+
+    def slippage_allowed(self) -> bool:
+        """Entry waits while the expected slippage (local book) is above POSITION_MAX_SLIPPAGE or can't be estimated"""
+        if not settings.POSITION_MAX_SLIPPAGE or not (book := self.book):
+            return True
+        slippage = book.slippage("BUY", settings.POSITION_QUANTITY)
+        if slippage <= settings.POSITION_MAX_SLIPPAGE:
+            self.entry_postponed = False
+            return True
+        metrics.inc("slippage_rejects_total", symbol=self.symbol)
+        if not self.entry_postponed:
+            self.entry_postponed = True
+            logger.warning(f"Entry postponed, expected slippage: {slippage:.4f}%", channel="trader", symbol=self.symbol)
+        return False
+
+    def quote_order(self, side: str, quantity: float) -> None:
+        """Best and expected fill price before sending the order, the fill is compared with them (fill_slippage)"""
+        if (book := self.book) and book.synced:
+            self.order_quote = (book.side(side).best(), book.fill_price(side, quantity))
+        else:
+            self.order_quote = (0.0, 0.0)
+
+    def fill_slippage(self, order: Order) -> dict[str, float]:
+        """Log fields: expected fill price and the realized slippage (percent beyond the best price)"""
+        best_price, expected_price = self.order_quote
+        if not best_price:
+            return {}
+        sign = 1 if order.side == "BUY" else -1
+        slippage = (order.last_executed_price - best_price) * sign / best_price * 100
+        return {"expected_price": round(expected_price, 8), "slippage": round(slippage, 6)}
+
+    def order_response(self, side: str, response: asyncio.Future) -> None:
+        """Rejected (or not sent) order reverts the status. On timeout or lost connection the order may still be
+        executed, so the trader keeps waiting for the user stream."""
+        if response.cancelled() or not isinstance(error := response.exception(), RequestError):
+            return
+        self.order_rejected(side, error)
+
+    def order_rejected(self, side: str, error: Exception | str) -> None:
+        if side == "BUY" and self.state.status == STATUS.ENTERING_POSITION:
+            logger.error(f"Entering position failed: {error}", channel="trader", symbol=self.symbol)
+            self.state.position, self.state.pending_order = None, None
+            self.start_sleeping(int(self.clock() * 1000))
+            self.save_state()
+            logger.info(f"Sleeping for {settings.POSITION_SLEEP_TIME} sec", channel="trader", symbol=self.symbol)
+        elif side == "SELL" and self.state.status == STATUS.CLOSING_POSITION and self.state.position:
+            delay = min(ORDER_RETRY_DELAY * 2**self.close_failures, ORDER_RETRY_MAX_DELAY)
+            logger.error(f"Closing position failed: {error}, retry in {delay} ms", channel="trader", symbol=self.symbol)
+            self.state.status, self.state.pending_order = STATUS.IN_POSITION, None
+            self.close_failures += 1
+            self.close_retry_at = int(self.clock() * 1000) + delay
+            self.schedule_hold_timer(self.close_retry_at)  # closes again if hold time elapsed
+            self.save_state()
+
+    async def reconcile_order(self) -> None:
+        """Order in flight at the restart: its fill may have been sent while the bot was down, so it is looked up
+        with order.status. An order the exchange doesn't have never reached it and is handled as rejected."""
+        if not (pending := self.state.pending_order):
+            return
+        try:
+            result = await self.order_client.order_status(self.symbol, pending.client_order_id)
+        except (RequestError, TimeoutError) as error:
+            if not isinstance(error, RequestError) or error.code != ORDER_NOT_FOUND:
+                logger.warning(f"Order status failed: {error}", channel="trader", symbol=self.symbol)
+                self.timers.schedule(int(self.clock() * 1000) + ORDER_RETRY_DELAY, self.reconcile_order, self.symbol)
+                return
+            result = {"status": "NOT_FOUND"}
+        if self.state.pending_order is not pending:
+            return  # the user stream delivered the fill meanwhile
+
+        match result["status"]:
+            case "FILLED":
+                await self.process_order(self.status_order(result, pending))
+            case "NEW" | "PARTIALLY_FILLED" | "PENDING_NEW":
+                self.timers.schedule(int(self.clock() * 1000) + ORDER_RETRY_DELAY, self.reconcile_order, self.symbol)
+            case status:
+                self.order_rejected(pending.side, f"order {pending.client_order_id} {status}")
+
+    def status_order(self, result: dict[str, Any], pending: PendingOrder) -> Order:
+        """Fill of the order.status response, the commission isn't reported there"""
+        executed = float(result["executedQty"])
+        update_time = int(result.get("updateTime", self.clock() * 1000))
+        return Order(
+            event_time=update_time,
+            symbol=self.symbol,
+            side=pending.side,
+            order_type=result.get("type", "MARKET"),
+            quantity=float(result.get("origQty", executed)),
+            price=0.0,
+            current_order_status="FILLED",
+            last_executed_quantity=executed,
+            last_executed_price=float(result["cummulativeQuoteQty"]) / executed,
+            commission_amount=0.0,
+            commission_asset=None,
+            transaction_time=update_time,
+            client_order_id=pending.client_order_id,
+        )
 
     async def check_position_limitations(self) -> None:
         quote_balance = getattr(self.state.balances, self.state.quote_asset).free
@@ -240,6 +572,7 @@ class Trader:
                 f"Not enough balance to enter new position. You balance: {quote_balance}, requested: "
                 f"{requested_balance}",
                 channel="trader",
+                symbol=self.symbol,
             )
             self.exit_with_error()
             return
@@ -250,44 +583,92 @@ class Trader:
                 f"Requested value for order is {requested_balance} {self.state.quote_asset}, "
                 f"minimal is {self.state.min_notional}",
                 channel="trader",
+                symbol=self.symbol,
             )
             self.exit_with_error()
             return
 
     async def time_watcher(self) -> None:
-        """Check for position exists, and wait for POSITION_HOLD_TIME, after time elapsed, close position"""
-        while True:
-            timestamp = int(time.time() * 1000)
-            try:
-                if (
-                    self.state.status == STATUS.SLEEPING
-                    and self.state.sleeping_at
-                    and timestamp >= self.state.sleeping_at
-                ):
-                    await logger.ainfo("sleeping complete, ready for entering new position.")
-                    self.state.status = STATUS.READY
-                    self.state.sleeping_at = 0
-
-                elif self.state.status == STATUS.READY:  # force create new position without waiting new trades
-                    await self.create_new_position()
-
-                if not self.state.status == STATUS.IN_POSITION or not self.state.position:
-                    await asyncio.sleep(1)
-                    continue
-
-                if timestamp >= self.state.position.position_time + settings.POSITION_HOLD_TIME * 1000:
-                    """Close position if hold time exceeded"""
-                    self.state.status = STATUS.CLOSING_POSITION
-                    await logger.ainfo(
-                        f"Closing position (hold time exceeded): {self.state.last_price}", channel="trader"
-                    )
-                    await private_wss_client.order_place(side="SELL", quantity=self.state.position.amount)
+        """Serve hold time and sleep deadlines, see TimerQueue"""
+        await self.timers.run()
+
+    def schedule_hold_timer(self, not_before: int = 0) -> None:
+        self.cancel_hold_timer()
+        deadline = self.state.position.position_time + settings.POSITION_HOLD_TIME * 1000  # type: ignore
+        self.hold_timer = self.timers.schedule(max(deadline, not_before), self.hold_expired, self.symbol)
+
+    def start_sleeping(self, timestamp: int) -> None:
+        self.state.status = STATUS.SLEEPING
+        self.state.sleeping_at = timestamp + settings.POSITION_SLEEP_TIME * 1000
+        self.timers.schedule(self.state.sleeping_at, self.sleep_expired, self.symbol)
+
+    def save_state(self) -> None:
+        if self.store:
+            self.store.save(
+                self.symbol,
+                StateSnapshot(
+                    status=self.state.status.value,
+                    position=self.state.position,
+                    pending_order=self.state.pending_order,
+                    sleeping_at=self.state.sleeping_at,
+                    total_tp_trades=self.state.total_tp_trades,
+                    total_sl_trades=self.state.total_sl_trades,
+                    total_pnl=self.state.total_pnl,
+                ),
+            )
 
-                await asyncio.sleep(0.1)
+    def restore_state(self, snapshot: StateSnapshot) -> None:
+        """Open position is managed right away (SL/TP on trades, hold timer), sleep delays the READY status, the
+        order in flight is reconciled after the session logon"""
+        self.state.total_tp_trades = snapshot.total_tp_trades
+        self.state.total_sl_trades = snapshot.total_sl_trades
+        self.state.total_pnl = snapshot.total_pnl
+        if snapshot.position and (pending := snapshot.pending_order):
+            self.state.position, self.state.pending_order = snapshot.position, pending
+            self.state.status = STATUS.ENTERING_POSITION if pending.side == "BUY" else STATUS.CLOSING_POSITION
+            self.timers.schedule(int(self.clock() * 1000) + ORDER_RETRY_DELAY, self.reconcile_order, self.symbol)
+        elif snapshot.position:
+            self.state.position = snapshot.position
+            self.state.status = STATUS.IN_POSITION
+            self.schedule_hold_timer(int(self.clock() * 1000) + ORDER_RETRY_DELAY)  # wait for the session logon
+        elif snapshot.status == STATUS.SLEEPING.value:
+            self.state.sleeping_at = snapshot.sleeping_at
+        logger.info(
+            "State restored",
+            channel="trader",
+            symbol=self.symbol,
+            status=self.state.status.name,
+            position=snapshot.position,
+            total_pnl=snapshot.total_pnl,
+        )
 
-            except asyncio.CancelledError:
-                await logger.ainfo("Task was cancelled: time watcher", channel="trader")
-                break
+    def cancel_hold_timer(self) -> None:
+        if self.hold_timer:
+            self.hold_timer.cancel()
+            self.hold_timer = None
+
+    async def hold_expired(self) -> None:
+        """Close position if hold time exceeded"""
+        self.hold_timer = None
+        if not self.state.status == STATUS.IN_POSITION or not self.state.position:
+            return
+
+        self.state.status = STATUS.CLOSING_POSITION
+        self.state.exit_reason = EXIT_REASON.HOLD_TIME
+        await logger.ainfo(
+            f"Closing position (hold time exceeded): {self.state.last_price}", channel="trader", symbol=self.symbol
+        )
+        await self.place_order("SELL", self.state.position.amount)
+
+    async def sleep_expired(self) -> None:
+        """Wake up after sleeping and enter new position without waiting new trades"""
+        if not self.state.status == STATUS.SLEEPING:
+            return
+
+        await logger.ainfo("sleeping complete, ready for entering new position.", channel="trader", symbol=self.symbol)
+        self.state.status = STATUS.READY
+        self.state.sleeping_at = 0
+        await self.create_new_position()
 
     @staticmethod
     def exit_with_error() -> None:
@@ -3,8 +3,13 @@ import signal
 
 import structlog
 import uvloop
-from adapters.binance_wss import private_wss_client, public_wss_client
+from adapters.binance_wss import BinanceWSS, private_wss_client, public_wss_client
+from adapters.recorder import FrameRecorder
 from core.logging import setup_logging
+from core.metrics import start_metrics_server
+from core.portfolio import Portfolio
+from core.queues import create_events_queue, queue_reporter, register_queue_metrics
+from core.supervisor import Supervisor
 from core.trader import Trader
 from settings import settings
 
@@ -16,19 +21,20 @@ def close_tasks(tasks: list) -> None:
         task.cancel()
 
 
-async def main() -> None:
-    structlog.contextvars.bind_contextvars(
-        symbol=settings.SYMBOL, version=settings.VERSION, environment=settings.ENVIRONMENT
-    )
-
-    trader = Trader()
-    queue: asyncio.Queue = asyncio.Queue()
+async def run_portfolio() -> None:
+    """All symbols in the main process"""
+    Trader.open_storage(settings.LEDGER_PATH)
+    portfolio = Portfolio(settings.symbols)
+    queue: asyncio.Queue = create_events_queue()
+    register_queue_metrics(queue)
     tasks = [
         asyncio.create_task(public_wss_client.wss_connect(queue)),
         asyncio.create_task(private_wss_client.wss_connect(queue)),
-        asyncio.create_task(trader.events_processing(queue)),
-        asyncio.create_task(trader.time_watcher()),
+        asyncio.create_task(portfolio.events_processing(queue)),
+        asyncio.create_task(portfolio.time_watcher()),
     ]
+    if settings.QUEUE_REPORT_INTERVAL:
+        tasks.append(asyncio.create_task(queue_reporter(queue, settings.QUEUE_REPORT_INTERVAL)))
 
     for sig in (signal.SIGTERM, signal.SIGINT):
         asyncio.get_running_loop().add_signal_handler(sig, lambda: close_tasks(tasks))
@@ -36,6 +42,29 @@ async def main() -> None:
     await asyncio.gather(*tasks, return_exceptions=True)
 
 
+async def main() -> None:
+    structlog.contextvars.bind_contextvars(
+        symbol=",".join(settings.symbols), version=settings.VERSION, environment=settings.ENVIRONMENT
+    )
+
+    if settings.RECORD_FRAMES:
+        BinanceWSS.recorder = FrameRecorder(settings.RECORD_PATH)
+        BinanceWSS.recorder.start()
+
+    if settings.METRICS_PORT:
+        start_metrics_server(settings.METRICS_PORT)
+
+    if settings.WORKERS:
+        await Supervisor(settings.symbols, settings.WORKERS).run()
+    else:
+        await run_portfolio()
+
+    if BinanceWSS.recorder:
+        BinanceWSS.recorder.close()
+    Trader.close_storage()
+    await BinanceWSS.close_session()
+
+
 if __name__ == "__main__":
     with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
         runner.run(main())
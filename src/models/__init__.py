@@ -1,3 +1,8 @@
+from .account import AccountPosition, BalanceUpdate  # noqa: F401
+from .depth import DepthUpdate  # noqa: F401
+from .fixed import FixedPoint  # noqa: F401
 from .order import Order  # noqa: F401
-from .state import STATUS, Position, State  # noqa: F401
-from .trade import Trade  # noqa: F401
+from .state import EXIT_REASON, STATUS, PendingOrder, Position, State  # noqa: F401
+from .trade import AggTrade, BookTicker, Trade  # noqa: F401
+
+StreamEvent = Trade | AggTrade | Order | AccountPosition  # BookTicker has no event type, see decode_message
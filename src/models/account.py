@@ -0,0 +1,14 @@
+from msgspec import Struct, field
+
+
+class BalanceUpdate(Struct):
+    asset: str = field(name="a")
+    free: float = field(name="f")
+    locked: float = field(name="l")
+
+
+class AccountPosition(Struct, tag_field="e", tag="outboundAccountPosition"):
+    event_time: int = field(name="E")
+    balances: list[BalanceUpdate] = field(name="B")
+
+    received_at: int = 0  # perf_counter_ns when the frame was received, not a part of the stream
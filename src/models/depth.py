@@ -0,0 +1,13 @@
+from msgspec import Struct, field
+
+
+class DepthUpdate(Struct, tag_field="e", tag="depthUpdate"):
+    """Diff of the order book levels (absolute quantities, 0 - level removed) for update ids first..final"""
+
+    event_time: int = field(name="E")
+    symbol: str = field(name="s")
+    first_update_id: int = field(name="U")
+    final_update_id: int = field(name="u")
+    bids: list[tuple[float, float]] = field(name="b")
+    asks: list[tuple[float, float]] = field(name="a")
+    received_at: int = 0  # perf_counter_ns when the frame was received
@@ -0,0 +1,86 @@
+import math
+from typing import Any
+
+AMOUNT_DECIMALS = 8  # Binance decimal strings (quantities, balances, commissions) have at most 8 fraction digits
+
+
+def fraction_digits(size: str) -> int:
+    """Precision of a tickSize/stepSize: "0.01000000" -> 2"""
+    return len(size.partition(".")[2].rstrip("0"))
+
+
+def parse_fixed(text: str, decimals: int) -> int:
+    """Decimal string to an integer of 10 ** -decimals units, digits beyond the precision are truncated"""
+    whole, _, fraction = text.partition(".")
+    return int(whole + fraction[:decimals].ljust(decimals, "0"))
+
+
+def format_fixed(value: int, decimals: int) -> str:
+    """Integer of 10 ** -decimals units to a decimal string with exactly `decimals` fraction digits"""
+    if not decimals:
+        return str(value)
+    whole, fraction = divmod(abs(value), 10**decimals)
+    return f"{'-' if value < 0 else ''}{whole}.{fraction:0{decimals}d}"
+
+
+class FixedPoint:
+    """Scaled integers of a symbol: prices in units of the PRICE_FILTER tickSize precision, quantities in units of the
+    LOT_SIZE stepSize precision, notionals (price * quantity, commissions) in units of 10 ** -(price decimals + 8).
+
+    Stream values are already parsed by msgspec (the nearest double to the wire string), rounding them to units is
+    exact while the value is below 2 ** 52 units and cheaper than parsing the strings in Python."""
+
+    __slots__ = (
+        "price_decimals",
+        "quantity_decimals",
+        "price_scale",
+        "quantity_scale",
+        "quantity_factor",
+        "notional_decimals",
+        "notional_scale",
+    )
+
+    def __init__(self, tick_size: str, step_size: str) -> None:
+        self.price_decimals = fraction_digits(tick_size)
+        self.quantity_decimals = fraction_digits(step_size)
+        self.price_scale = 10**self.price_decimals
+        self.quantity_scale = 10**self.quantity_decimals
+        self.quantity_factor = 10 ** (AMOUNT_DECIMALS - self.quantity_decimals)  # quantity units to amount units
+        self.notional_decimals = self.price_decimals + AMOUNT_DECIMALS
+        self.notional_scale = 10**self.notional_decimals
+
+    @classmethod
+    def from_filters(cls, filters: list[dict[str, Any]]) -> "FixedPoint | None":
+        """Symbol filters of exchangeInfo, None if the tick or the step size is missing (or 0 - filter disabled)"""
+        sizes = {f["filterType"]: f for f in filters}
+        tick_size = sizes.get("PRICE_FILTER", {}).get("tickSize", "")
+        step_size = sizes.get("LOT_SIZE", {}).get("stepSize", "")
+        if not tick_size or not step_size or not float(tick_size) or not float(step_size):
+            return None
+        return cls(tick_size, step_size)
+
+    def price(self, value: float) -> int:
+        return round(value * self.price_scale)
+
+    def quantity(self, value: float) -> int:
+        return round(value * self.quantity_scale)
+
+    def floor_price(self, value: float) -> int:
+        """Computed level (not on the tick grid) to the last tick below it, float noise of the level arithmetic is
+        rounded off before"""
+        return math.floor(round(value * self.price_scale, 6))
+
+    def ceil_price(self, value: float) -> int:
+        return math.ceil(round(value * self.price_scale, 6))
+
+    def notional(self, price: int, quantity: int) -> int:
+        return price * quantity * self.quantity_factor
+
+    def commission(self, amount: float, price: int, base_asset: bool) -> int:
+        """Commission in notional units, the base asset commission is valued at the fill price"""
+        if base_asset:
+            return round(amount * 10**AMOUNT_DECIMALS) * price
+        return round(amount * self.notional_scale)
+
+    def to_quote(self, notional: int) -> float:
+        return notional / self.notional_scale
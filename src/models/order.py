@@ -1,24 +1,19 @@
 from msgspec import Struct, field
 
 
-class Order(Struct):
-    event_type: str = field(name="e")
+class Order(Struct, tag_field="e", tag="executionReport"):
     event_time: int = field(name="E")
     symbol: str = field(name="s")
     side: str = field(name="S")
     order_type: str = field(name="o")
-    quantity: str = field(name="q")
-    price: str = field(name="p")
+    quantity: float = field(name="q")
+    price: float = field(name="p")
     current_order_status: str = field(name="X")
-    last_executed_quantity: str = field(name="l")
-    last_executed_price: str = field(name="L")
-    commission_amount: str = field(name="n")
+    last_executed_quantity: float = field(name="l")
+    last_executed_price: float = field(name="L")
+    commission_amount: float = field(name="n")
     commission_asset: str | None = field(name="N")
     transaction_time: int = field(name="T")
+    client_order_id: str = field(name="c", default="")
 
-    def __post_init__(self) -> None:
-        self.price = float(self.price)  # type: ignore
-        self.quantity = float(self.quantity)  # type: ignore
-        self.last_executed_price = float(self.last_executed_price)  # type: ignore
-        self.last_executed_quantity = float(self.last_executed_quantity)  # type: ignore
-        self.commission_amount = float(self.commission_amount)  # type: ignore
+    received_at: int = 0  # perf_counter_ns when the frame was received, not a part of the stream
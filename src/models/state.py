@@ -1,3 +1,6 @@
+import math
+import multiprocessing
+import struct
 from enum import Enum
 from typing import Any
 
@@ -14,12 +17,45 @@ class STATUS(Enum):
     ERROR = 9
 
 
+class EXIT_REASON(Enum):
+    UNKNOWN = 0
+    TAKE_PROFIT = 1
+    STOP_LOSS = 2
+    HOLD_TIME = 3
+
+
 class Position(Struct):
     price: float = 0.0
     position_time: int = 0
     amount: float = 0.0
     sl_price: float = 0.0
     tp_price: float = 0.0
+    commission: float = 0.0  # of the entry fill in the quote asset, not a part of the trader pnl
+    # FIXED_POINT: entry price, SL/TP in price units and amount in quantity units (models.fixed), 0 - not set
+    price_units: int = 0
+    amount_units: int = 0
+    sl_units: int = 0
+    tp_units: int = 0
+
+
+class PendingOrder(Struct):
+    """Order sent and not filled or rejected yet, persisted so a restart can reconcile it (Trader.reconcile_order)"""
+
+    client_order_id: str
+    side: str
+    placed_at: int = 0  # ms of the trader clock
+
+
+class StateSnapshot(Struct):
+    """Persisted part of the trader State (see adapters.state_store)"""
+
+    status: int
+    position: Position | None = None
+    pending_order: PendingOrder | None = None
+    sleeping_at: float = 0.0
+    total_tp_trades: int = 0
+    total_sl_trades: int = 0
+    total_pnl: float = 0.0
 
 
 class Balance:
@@ -40,6 +76,59 @@ class Balances:
         return self._balances.get(item, None)
 
 
+# shared balances slot: asset name, free, locked
+BALANCE_SLOT = struct.Struct("<16sdd")
+MAX_SHARED_ASSETS = 256
+
+
+class SharedBalances(Balances):
+    """Balances table in shared memory, only the owner (supervisor) writes, worker processes read a view of it"""
+
+    def __init__(self, buffer: Any = None, lock: Any = None, owner: bool = True) -> None:
+        context = multiprocessing.get_context("spawn")
+        self._buffer = context.RawArray("B", BALANCE_SLOT.size * MAX_SHARED_ASSETS) if buffer is None else buffer
+        self._lock = lock or context.Lock()
+        self._owner = owner
+        self._slots: dict[str, int] = {}
+
+    def reader(self) -> "SharedBalances":
+        return SharedBalances(self._buffer, self._lock, owner=False)
+
+    def update_balance(self, asset: str, free: float, locked: float) -> None:
+        if not self._owner:  # account messages are applied once by the owner
+            return
+        with self._lock:
+            if (slot := self.find_slot(asset)) is None and (slot := self.find_slot("")) is None:
+                raise OverflowError(f"Shared balances table is full ({MAX_SHARED_ASSETS} assets)")
+            BALANCE_SLOT.pack_into(self._buffer, slot * BALANCE_SLOT.size, asset.encode(), free, locked)
+            self._slots[asset] = slot
+
+    def find_slot(self, asset: str) -> int | None:
+        if asset in self._slots:
+            return self._slots[asset]
+        name = asset.encode()
+        for slot in range(MAX_SHARED_ASSETS):
+            slot_name = BALANCE_SLOT.unpack_from(self._buffer, slot * BALANCE_SLOT.size)[0].rstrip(b"\0")
+            if slot_name == name:
+                if asset:  # slots are never moved, so found assets are cached
+                    self._slots[asset] = slot
+                return slot
+            if not slot_name:  # assets are appended, the rest of table is empty
+                return None
+        return None
+
+    def __getattr__(self, item: str) -> Any:
+        if item.startswith("_"):  # attributes lookup while unpickling in the worker process
+            raise AttributeError(item)
+        if not item:
+            return None
+        with self._lock:
+            if (slot := self.find_slot(item)) is None:
+                return None
+            _, free, locked = BALANCE_SLOT.unpack_from(self._buffer, slot * BALANCE_SLOT.size)
+        return Balance(item, free, locked)
+
+
 class State(Struct):
     balances: Balances = Balances()
 
@@ -54,8 +143,14 @@ class State(Struct):
 
     status: STATUS = STATUS.INITIAL
     last_price: float = 0.0
+    last_price_time: int = 0  # trade time of the last price
+    high_price: float = 0.0  # price range of the last (conflated) trade, reset on entering position
+    low_price: float = math.inf
     position: Position | None = None
+    pending_order: PendingOrder | None = None  # while ENTERING_POSITION / CLOSING_POSITION
     sleeping_at: float = 0.0
+    exit_reason: EXIT_REASON = EXIT_REASON.UNKNOWN  # of the position being closed
+    entry_latency: int = 0  # us, order.place -> fill of the position entry, 0 - unknown
 
     total_tp_trades: int = 0
     total_sl_trades: int = 0
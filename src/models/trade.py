@@ -1,14 +1,37 @@
+import math
+
 from msgspec import Struct, field
 
 
-class Trade(Struct):
-    event_type: str = field(name="e")
+class Trade(Struct, tag_field="e", tag="trade"):
+    """Price update the trader consumes, decoded from the stream selected by WSS_PUBLIC_STREAM"""
+
     event_time: int = field(name="E")
     symbol: str = field(name="s")
-    price: str = field(name="p")
+    price: float = field(name="p")
     trade_time: int = field(name="T")
-    quantity: str = field(name="q")
+    quantity: float = field(name="q")
+    trade_id: int = field(name="t", default=0)
+
+    # price range of the trades conflated into this one (see core.queues.ConflatingQueue), not a part of the stream
+    high_price: float = 0.0
+    low_price: float = math.inf
+    received_at: int = 0  # perf_counter_ns when the frame was received
+
+
+class AggTrade(Trade, tag="aggTrade"):
+    """Trades of one taker order at one price, the id is the aggregate trade id"""
+
+    trade_id: int = field(name="a", default=0)
+
+
+class BookTicker(Trade):
+    """Best bid/ask update (no "e" key and no timestamps in the stream). The price is the best bid, which is what a
+    market sell gets, so SL/TP are checked against the executable price. The id is the book update id."""
 
-    def __post_init__(self) -> None:
-        self.price = float(self.price)  # type: ignore
-        self.quantity = float(self.quantity)  # type: ignore
+    event_time: int = field(name="E", default=0)
+    symbol: str = field(name="s", default="")
+    price: float = field(name="b", default=0.0)
+    trade_time: int = field(name="T", default=0)
+    quantity: float = field(name="B", default=0.0)  # best bid quantity
+    trade_id: int = field(name="u", default=0)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -10,16 +12,70 @@ class Settings(BaseSettings):
     COLORED_LOGS: bool = not JSON_LOGS
     SAVE_LOG_FILE: bool = False
     LOG_FILE_PATH: str = "logs/test_bot.log"
+    LOG_SAMPLE_TRADES: int = 1  # DEBUG logs 1 in N public stream frames, private frames are always logged
+    LOG_ASYNC: bool = False  # render and write logs in a background thread, the event loop only enqueues records
+    LOG_BUFFER_SIZE: int = 100_000  # records, newer records are dropped when the buffer is full (LOG_ASYNC)
+    LOG_FILE_MAX_BYTES: int = 100 * 1024 * 1024  # log file rotation size, 0 - no rotation (LOG_ASYNC)
+    LOG_FILE_BACKUP_COUNT: int = 5
 
     SYMBOL: str = "BTCUSDT"
+    SYMBOLS: str = ""  # comma separated symbols for trading in one process, SYMBOL is used when empty
+    WORKERS: int = 0  # worker processes for SYMBOLS shards (supervisor mode), 0 - all symbols in the main process
     POSITION_QUANTITY: float = 0.001
     POSITION_TP_PERCENT: float = 0.25
     POSITION_SL_PERCENT: float = 0.25
     POSITION_HOLD_TIME: int = 60
     POSITION_SLEEP_TIME: int = 30
+    POSITION_MAX_SLIPPAGE: float = 0.0  # percent, entry waits while the expected slippage is higher, 0 - off
+    # SL/TP distance from the entry price: POSITION_*_PERCENT, or multipliers of the ATR / realized volatility
+    POSITION_LEVELS: Literal["percent", "atr", "volatility"] = "percent"
+    POSITION_SL_MULTIPLIER: float = 2.0
+    POSITION_TP_MULTIPLIER: float = 2.0
+    INDICATOR_WINDOW: int = 1000  # trades of the rolling VWAP and realized volatility
+    INDICATOR_BAR_SECONDS: int = 1  # time bars of the ATR
+    INDICATOR_BARS: int = 14
+    FIXED_POINT: bool = False  # exact SL/TP checks and PnL in integer ticks/steps of the symbol filters
+
+    WSS_PUBLIC_URL: str = "wss://testnet.binance.vision/ws"
+    # market data stream: every trade, trades aggregated by taker order, or best bid/ask updates (SL/TP on the bid)
+    WSS_PUBLIC_STREAM: Literal["trade", "aggTrade", "bookTicker"] = "trade"
+    WSS_PUBLIC_CONNECTIONS: int = 1  # redundant trade stream connections, trades are merged by trade id
+    WSS_PUBLIC_URLS: str = ""  # comma separated endpoints of the public connections (cycled), WSS_PUBLIC_URL when empty
+    WSS_API_URL: str = "wss://testnet.binance.vision/ws-api/v3"
+    WSS_USER_STREAM_URL: str = "wss://testnet.binance.vision/ws"
+    WSS_API_TIMEOUT: float = 10.0  # seconds to wait for a ws-api response
+    WSS_RECONNECT_DELAY: float = 0.25  # seconds, reconnect backoff base (the first retry is immediate)
+    WSS_RECONNECT_MAX_DELAY: float = 30.0  # seconds, reconnect backoff cap
+    ORDER_BOOK: bool = False  # local order books from depth diffs, expected fill price of the orders
+    ORDER_BOOK_DEPTH: int = 1000  # levels of the ws-api depth snapshot
+    EXCHANGE_INFO_CACHE: str = ""  # exchangeInfo file (one per symbols set), used until the fresh response, "" - off
+
+    QUEUE_CONFLATION: bool = False  # collapse pending trades of a symbol when the trader falls behind
+    QUEUE_PRIORITY_LANES: bool = False  # orders, balances and session events are consumed before market data
+    QUEUE_REPORT_INTERVAL: int = 60  # seconds, 0 - disabled
+
+    METRICS_PORT: int = 0  # local Prometheus scrape endpoint (/metrics), workers use next ports, 0 - disabled
+
+    STATE_DB_PATH: str = ""  # SQLite file for the trader state (restored on restart), "" - disabled
+    STATE_FLUSH_INTERVAL: float = 0.5  # seconds, max staleness of the stored state
+    LEDGER_PATH: str = ""  # directory of the closed positions ledger (tools.ledger_report), "" - disabled
+
+    RECORD_FRAMES: bool = False
+    RECORD_PATH: str = "records"
 
     API_KEY: str
     PRIVATE_KEY_BASE64: str
+    OFFLINE: bool = False  # set by the offline tools (backtest, sweep), the private key isn't loaded
+
+    @property
+    def symbols(self) -> list[str]:
+        return [symbol.strip().upper() for symbol in (self.SYMBOLS or self.SYMBOL).split(",") if symbol.strip()]
+
+    @property
+    def public_urls(self) -> list[str]:
+        """Endpoint of each public connection"""
+        urls = [url.strip() for url in self.WSS_PUBLIC_URLS.split(",") if url.strip()] or [self.WSS_PUBLIC_URL]
+        return [urls[index % len(urls)] for index in range(max(self.WSS_PUBLIC_CONNECTIONS, 1))]
 
 
 settings = Settings()
@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import base64
+import math
+import os
+import platform
+import random
+import signal
+import sys
+import time
+from pathlib import Path
+
+# keys are generated for the bot process, but settings require them
+os.environ.setdefault("API_KEY", "")
+os.environ.setdefault("PRIVATE_KEY_BASE64", "")
+
+from aiohttp import web  # noqa: E402
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ed25519  # noqa: E402
+from msgspec import Struct, json  # noqa: E402
+from settings import settings  # noqa: E402
+from tools.fake_exchange import FakeExchange, OrderRecord  # noqa: E402
+
+MAIN_PATH = Path(__file__).parents[1] / "main.py"
+PRICE = 60000.0
+EXIT_PERCENT = 0.5  # bot SL/TP, probe trade moves price beyond it
+
+
+class BenchmarkRun(Struct):
+    trade_rate: float
+    log_mode: str
+    samples: int
+    timeouts: int
+    p50: float  # all latencies in microseconds
+    p99: float
+    p999: float
+    mean: float
+    max: float
+
+
+class BenchmarkReport(Struct):
+    version: str
+    python: str
+    platform: str
+    started_at: int
+    fill_latency: float
+    runs: list[BenchmarkRun]
+
+
+class ProbeExchange(FakeExchange):
+    """Fake exchange which signals order arrivals to the benchmark"""
+
+    def __init__(self, **kwargs: float) -> None:
+        super().__init__(volatility=0.0, price=PRICE, **kwargs)  # type: ignore
+        self.order_arrived = asyncio.Event()
+
+    def record_order(self, order: OrderRecord) -> None:
+        super().record_order(order)
+        self.order_arrived.set()
+
+    async def wait_order(self, side: str, timeout: float) -> OrderRecord:
+        while True:
+            self.order_arrived.clear()
+            if self.orders and self.orders[-1].side == side:
+                return self.orders[-1]
+            await asyncio.wait_for(self.order_arrived.wait(), timeout)
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values), math.ceil(percent / 100 * len(values))) - 1)
+    return values[index]
+
+
+def generate_private_key() -> str:
+    private_key = ed25519.Ed25519PrivateKey.generate()
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    return base64.b64encode(pem).decode()
+
+
+def bot_environment(url: str, log_mode: str, loglevel: str) -> dict[str, str]:
+    return {
+        **os.environ,
+        "API_KEY": os.environ.get("API_KEY") or "benchmark",
+        "PRIVATE_KEY_BASE64": os.environ.get("PRIVATE_KEY_BASE64") or generate_private_key(),
+        "SYMBOL": "BTCUSDT",
+        "WSS_PUBLIC_URL": f"{url}/ws",
+        "WSS_API_URL": f"{url}/ws-api/v3",
+        "WSS_USER_STREAM_URL": f"{url}/ws",
+        "POSITION_SL_PERCENT": str(EXIT_PERCENT),
+        "POSITION_TP_PERCENT": str(EXIT_PERCENT),
+        "POSITION_HOLD_TIME": "3600",
+        "POSITION_SLEEP_TIME": "0",
+        "JSON_LOGS": str(log_mode in ("json", "async")),
+        "LOG_ASYNC": str(log_mode == "async"),
+        "COLORED_LOGS": "False",
+        "LOGLEVEL": loglevel,
+    }
+
+
+async def run_benchmark(
+    trade_rate: float, log_mode: str, samples: int, fill_latency: float, loglevel: str, timeout: float
+) -> BenchmarkRun:
+    """Measure time from the probe trade frame sent by exchange to the arrival of SELL order.place frame"""
+    exchange = ProbeExchange(trade_rate=trade_rate, fill_latency=fill_latency)
+    runner = web.AppRunner(exchange.app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+
+    bot = await asyncio.create_subprocess_exec(
+        sys.executable,
+        str(MAIN_PATH),
+        env=bot_environment(f"ws://{host}:{port}", log_mode, loglevel),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    latencies: list[float] = []
+    timeouts = 0
+    try:
+        await exchange.wait_order("BUY", timeout=30)
+        while len(latencies) < samples:
+            try:
+                await exchange.wait_order("BUY", timeout)
+                await asyncio.sleep(fill_latency / 1000 + random.uniform(0.005, 0.02))  # noqa: S311
+                sent_at = await exchange.send_trade("BTCUSDT", PRICE * (1 + EXIT_PERCENT / 50), update_price=False)
+                order = await exchange.wait_order("SELL", timeout)
+                latencies.append((order.received_at - sent_at) / 1000)
+            except TimeoutError:
+                timeouts += 1
+                if timeouts > samples // 10 + 3:
+                    break
+    finally:
+        bot.send_signal(signal.SIGTERM)
+        await bot.wait()
+        await runner.cleanup()
+
+    latencies.sort()
+    return BenchmarkRun(
+        trade_rate=trade_rate,
+        log_mode=log_mode,
+        samples=len(latencies),
+        timeouts=timeouts,
+        p50=round(percentile(latencies, 50), 1),
+        p99=round(percentile(latencies, 99), 1),
+        p999=round(percentile(latencies, 99.9), 1),
+        mean=round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        max=round(latencies[-1], 1) if latencies else 0.0,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tick-to-order latency benchmark against the local fake exchange")
+    parser.add_argument("--rates", default="100,1000,5000", help="comma separated background trade rates (per sec)")
+    parser.add_argument(
+        "--log-modes", default="plain,json,async", help="comma separated: plain, json, async (json in a thread)"
+    )
+    parser.add_argument("--loglevel", default="INFO")
+    parser.add_argument("--samples", type=int, default=200, help="measured orders per run")
+    parser.add_argument("--fill-latency", type=float, default=1.0, help="exchange fill latency (ms)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="wait for order timeout (sec)")
+    parser.add_argument("--output", default="benchmark.json", help="path for json report")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    runs = []
+    for log_mode in args.log_modes.split(","):
+        for rate in args.rates.split(","):
+            run = await run_benchmark(
+                float(rate), log_mode, args.samples, args.fill_latency, args.loglevel, args.timeout
+            )
+            print(  # noqa: T201
+                f"rate={run.trade_rate:>8.0f}/s logs={run.log_mode:<5} samples={run.samples:<5} "
+                f"p50={run.p50:>9.1f}us p99={run.p99:>9.1f}us p99.9={run.p999:>9.1f}us timeouts={run.timeouts}"
+            )
+            runs.append(run)
+
+    report = BenchmarkReport(
+        version=settings.VERSION,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        started_at=int(time.time()),
+        fill_latency=args.fill_latency,
+        runs=runs,
+    )
+    Path(args.output).write_bytes(json.format(json.encode(report)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,432 @@
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import uuid
+from typing import Any, NamedTuple
+
+from aiohttp import WSMsgType, web
+from msgspec import json
+
+encoder = json.Encoder()
+decoder = json.Decoder()
+
+
+class OrderRecord(NamedTuple):
+    received_at: int  # perf_counter_ns
+    symbol: str
+    side: str
+    quantity: float
+    price: float
+
+
+def ms_time() -> int:
+    return int(time.time() * 1000)
+
+
+class FakeExchange:
+    def __init__(
+        self,
+        symbols: list[str] | None = None,
+        trade_rate: float = 10.0,
+        fill_latency: float = 0.0,
+        price: float = 60000.0,
+        volatility: float = 0.0001,
+        base_balance: float = 1.0,
+        quote_balance: float = 10000.0,
+        drop_interval: float = 0.0,
+    ) -> None:
+        self.symbols = [symbol.upper() for symbol in symbols or ["BTCUSDT"]]
+        self.trade_rate = trade_rate  # trades per second for each symbol, 0 - only manual trades
+        self.fill_latency = fill_latency  # ms
+        self.volatility = volatility
+        self.drop_interval = drop_interval  # seconds between closing all connections, 0 - never
+        self.prices = dict.fromkeys(self.symbols, price)
+        self.balances = {
+            "USDT": quote_balance,
+            **{symbol.removesuffix("USDT"): base_balance for symbol in self.symbols},
+        }
+
+        self.trade_ids = itertools.count(1)
+        self.depth_ids = itertools.count(1)
+        self.update_ids = dict.fromkeys(self.symbols, 0)  # last depth update id of each book
+        self.books: dict[str, tuple[dict[str, str], dict[str, str]]] = {symbol: ({}, {}) for symbol in self.symbols}
+        self.order_ids = itertools.count(1)
+        self.subscribers: dict[str, set[web.WebSocketResponse]] = {}
+        self.user_streams: dict[str, set[web.WebSocketResponse]] = {}
+        self.connections: set[web.WebSocketResponse] = set()  # all open connections, see drop_connections
+        self.orders: list[OrderRecord] = []
+        self.order_statuses: dict[str, dict[str, Any]] = {}  # newClientOrderId -> order.status result
+        self.tasks: set[asyncio.Task] = set()
+
+        self.app = web.Application()
+        self.app.router.add_get("/ws", self.public_handler)
+        self.app.router.add_get("/ws-api/v3", self.api_handler)
+        self.app.router.add_get("/ws/{listen_key}", self.user_stream_handler)
+        self.app.on_startup.append(self.on_startup)
+        self.app.on_shutdown.append(self.on_shutdown)
+
+    async def on_startup(self, app: web.Application) -> None:
+        if self.trade_rate:
+            self.spawn(self.trades_generator())
+            self.spawn(self.depth_generator())
+        if self.drop_interval:
+            self.spawn(self.connections_dropper(self.drop_interval))
+
+    async def on_shutdown(self, app: web.Application) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await self.drop_connections()
+
+    async def drop_connections(self) -> None:
+        """Close every open connection (flaky network simulation)"""
+        for wss in list(self.connections):
+            await wss.close()
+
+    async def connections_dropper(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.drop_connections()
+
+    async def accept(self, request: web.Request) -> web.WebSocketResponse:
+        wss = web.WebSocketResponse()
+        await wss.prepare(request)
+        self.connections.add(wss)
+        return wss
+
+    def spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    @staticmethod
+    async def send(wss: web.WebSocketResponse, message: dict[str, Any]) -> None:
+        if not wss.closed:
+            await wss.send_str(encoder.encode(message).decode(), compress=False)
+
+    # public stream
+
+    async def public_handler(self, request: web.Request) -> web.WebSocketResponse:
+        wss = await self.accept(request)
+        async for msg in wss:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            message = decoder.decode(msg.data)
+            if message.get("method") == "SUBSCRIBE":
+                for stream in message.get("params", []):
+                    self.subscribers.setdefault(stream, set()).add(wss)
+                await self.send(wss, {"result": None, "id": message.get("id")})
+        for subscribers in self.subscribers.values():
+            subscribers.discard(wss)
+        self.connections.discard(wss)
+        return wss
+
+    async def trades_generator(self) -> None:
+        started, sent = time.perf_counter(), 0
+        while True:
+            # emit trades in batches so rates above the loop timer resolution are possible
+            due = int((time.perf_counter() - started) * self.trade_rate) - sent
+            for _ in range(due):
+                for symbol in self.symbols:
+                    self.prices[symbol] *= 1 + random.gauss(0, self.volatility)  # noqa: S311
+                    await self.send_trade(symbol, self.prices[symbol])
+            sent += due
+            await asyncio.sleep(0.001)
+
+    async def send_trade(self, symbol: str, price: float, quantity: float = 0.001, update_price: bool = True) -> int:
+        """Broadcast trade to subscribers of the trade, aggTrade and bookTicker streams, returns send time
+        (perf_counter_ns). Book ticker is quoted around the trade price with a one tick spread."""
+        if update_price:
+            self.prices[symbol] = price
+        timestamp = ms_time()
+        trade_id = next(self.trade_ids)
+        sent_at = time.perf_counter_ns()
+        for stream in ("trade", "aggTrade", "bookTicker"):
+            subscribers = self.subscribers.get(f"{symbol.lower()}@{stream}")
+            if not subscribers:
+                continue
+            message = encoder.encode(self.stream_event(stream, symbol, price, quantity, trade_id, timestamp)).decode()
+            for wss in list(subscribers):
+                if not wss.closed:
+                    await wss.send_str(message, compress=False)
+        return sent_at
+
+    @staticmethod
+    def stream_event(
+        stream: str, symbol: str, price: float, quantity: float, trade_id: int, timestamp: int
+    ) -> dict[str, Any]:
+        if stream == "bookTicker":
+            return {
+                "u": trade_id,
+                "s": symbol,
+                "b": f"{price:.2f}",
+                "B": f"{quantity:.8f}",
+                "a": f"{price + 0.01:.2f}",
+                "A": f"{quantity:.8f}",
+            }
+        event = {
+            "e": stream,
+            "E": timestamp,
+            "s": symbol,
+            "p": f"{price:.2f}",
+            "q": f"{quantity:.8f}",
+            "T": timestamp,
+            "m": False,
+            "M": True,
+        }
+        if stream == "aggTrade":
+            event.update({"a": trade_id, "f": trade_id, "l": trade_id})
+        else:
+            event.update({"t": trade_id, "b": trade_id * 2, "a": trade_id * 2 + 1})
+        return event
+
+    async def depth_generator(self, interval: float = 0.1) -> None:
+        while True:
+            for symbol in self.symbols:
+                await self.send_depth(symbol)
+            await asyncio.sleep(interval)
+
+    async def send_depth(self, symbol: str, levels: int = 20) -> None:
+        """Requote the book around the current price and broadcast the diff to @depth@100ms subscribers"""
+        price = self.prices[symbol]
+        quotes = (
+            {f"{price - index * 0.01:.2f}": self.level_quantity() for index in range(levels)},
+            {f"{price + (index + 1) * 0.01:.2f}": self.level_quantity() for index in range(levels)},
+        )
+        diffs = []
+        for book, side_quotes in zip(self.books[symbol], quotes, strict=True):
+            removed = [[level, "0.00000000"] for level in book if level not in side_quotes]
+            diffs.append(removed + [[level, quantity] for level, quantity in side_quotes.items()])
+            book.clear()
+            book.update(side_quotes)
+        update_id = self.update_ids[symbol] = next(self.depth_ids)
+        message = {"e": "depthUpdate", "E": ms_time(), "s": symbol, "U": update_id, "u": update_id}
+        data = encoder.encode({**message, "b": diffs[0], "a": diffs[1]}).decode()
+        for wss in list(self.subscribers.get(f"{symbol.lower()}@depth@100ms", ())):
+            if not wss.closed:
+                await wss.send_str(data, compress=False)
+
+    @staticmethod
+    def level_quantity() -> str:
+        return f"{random.uniform(0.001, 1):.8f}"  # noqa: S311
+
+    def depth_snapshot(self, symbol: str, limit: int) -> dict[str, Any] | None:
+        if symbol not in self.books:
+            return None
+        bids, asks = self.books[symbol]
+        return {
+            "lastUpdateId": self.update_ids[symbol],
+            "bids": sorted(bids.items(), key=lambda level: -float(level[0]))[:limit],
+            "asks": sorted(asks.items(), key=lambda level: float(level[0]))[:limit],
+        }
+
+    # ws-api
+
+    async def api_handler(self, request: web.Request) -> web.WebSocketResponse:
+        wss = await self.accept(request)
+        async for msg in wss:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            message = decoder.decode(msg.data)
+            method, params = message.get("method", ""), message.get("params", {})
+            if method == "order.place":
+                self.record_order(
+                    OrderRecord(
+                        time.perf_counter_ns(),
+                        params.get("symbol", ""),
+                        params.get("side", ""),
+                        float(params.get("quantity", 0)),
+                        self.prices.get(params.get("symbol", ""), 0.0),
+                    )
+                )
+                self.spawn(self.order_place(wss, message.get("id"), params))
+                continue
+            if method == "order.status":
+                response = self.order_status(message.get("id"), params)
+            elif (result := self.api_result(method, params)) is None:
+                response = {"id": message.get("id"), "status": 400, "error": {"code": -1100, "msg": "Unknown method"}}
+            else:
+                response = {"id": message.get("id"), "status": 200, "result": result}
+            await self.send(wss, response)
+        self.connections.discard(wss)
+        return wss
+
+    def record_order(self, order: OrderRecord) -> None:
+        self.orders.append(order)
+
+    def order_status(self, request_id: Any, params: dict[str, Any]) -> dict[str, Any]:
+        """order.status response, orders are looked up by the newClientOrderId of order.place"""
+        if (result := self.order_statuses.get(params.get("origClientOrderId", ""))) is None:
+            return {"id": request_id, "status": 400, "error": {"code": -2013, "msg": "Order does not exist."}}
+        return {"id": request_id, "status": 200, "result": result}
+
+    def api_result(self, method: str, params: dict[str, Any]) -> Any:
+        match method:
+            case "session.logon":
+                now = ms_time()
+                return {
+                    "apiKey": params.get("apiKey"),
+                    "authorizedSince": now,
+                    "connectedSince": now,
+                    "serverTime": now,
+                }
+            case "exchangeInfo":
+                return {
+                    "timezone": "UTC",
+                    "serverTime": ms_time(),
+                    "symbols": [self.symbol_info(s) for s in params.get("symbols", [])],
+                }
+            case "account.status":
+                return {
+                    "canTrade": True,
+                    "accountType": "SPOT",
+                    "balances": [
+                        {"asset": a, "free": f"{f:.8f}", "locked": "0.00000000"} for a, f in self.balances.items()
+                    ],
+                }
+            case "trades.recent":
+                price = self.prices.get(params.get("symbol", ""), 0.0)
+                return [
+                    {"id": 0, "price": f"{price:.8f}", "qty": "0.00100000", "time": ms_time(), "isBuyerMaker": False}
+                ]
+            case "depth":
+                return self.depth_snapshot(params.get("symbol", ""), params.get("limit", 100))
+            case "userDataStream.start":
+                return {"listenKey": uuid.uuid4().hex}
+            case "userDataStream.ping":
+                return {}
+        return None
+
+    @staticmethod
+    def symbol_info(symbol: str) -> dict[str, Any]:
+        return {
+            "symbol": symbol,
+            "status": "TRADING",
+            "baseAsset": symbol.removesuffix("USDT"),
+            "quoteAsset": "USDT",
+            "filters": [
+                {
+                    "filterType": "PRICE_FILTER",
+                    "minPrice": "0.01000000",
+                    "maxPrice": "1000000.00000000",
+                    "tickSize": "0.01000000",
+                },
+                {"filterType": "LOT_SIZE", "minQty": "0.00001000", "maxQty": "9000.00000000", "stepSize": "0.00001000"},
+                {"filterType": "NOTIONAL", "minNotional": "5.00000000", "applyMinToMarket": True},
+            ],
+        }
+
+    async def order_place(self, wss: web.WebSocketResponse, request_id: Any, params: dict[str, Any]) -> None:
+        if self.fill_latency:
+            await asyncio.sleep(self.fill_latency / 1000)
+
+        symbol, side = params.get("symbol", ""), params.get("side", "")
+        quantity, price = float(params.get("quantity", 0)), round(self.prices.get(params.get("symbol", ""), 0.0), 2)
+        base_asset = symbol.removesuffix("USDT")
+        if symbol not in self.prices or side not in ("BUY", "SELL"):
+            await self.send(wss, {"id": request_id, "status": 400, "error": {"code": -1102, "msg": "Bad order"}})
+            return
+
+        sign = 1 if side == "BUY" else -1
+        self.balances[base_asset] += sign * quantity
+        self.balances["USDT"] -= sign * quantity * price
+        order_id, timestamp = next(self.order_ids), ms_time()
+        await self.send(
+            wss,
+            {
+                "id": request_id,
+                "status": 200,
+                "result": {
+                    "symbol": symbol,
+                    "orderId": order_id,
+                    "transactTime": timestamp,
+                    "origQty": f"{quantity:.8f}",
+                    "executedQty": f"{quantity:.8f}",
+                    "status": "FILLED",
+                    "type": "MARKET",
+                    "side": side,
+                    "fills": [{"price": f"{price:.8f}", "qty": f"{quantity:.8f}", "commission": "0.00000000"}],
+                },
+            },
+        )
+        client_order_id = params.get("newClientOrderId") or uuid.uuid4().hex[:22]
+        self.order_statuses[client_order_id] = {
+            "symbol": symbol,
+            "orderId": order_id,
+            "clientOrderId": client_order_id,
+            "origQty": f"{quantity:.8f}",
+            "executedQty": f"{quantity:.8f}",
+            "cummulativeQuoteQty": f"{quantity * price:.8f}",
+            "status": "FILLED",
+            "type": "MARKET",
+            "side": side,
+            "time": timestamp,
+            "updateTime": timestamp,
+        }
+        execution_report = {
+            "e": "executionReport",
+            "E": timestamp,
+            "s": symbol,
+            "c": client_order_id,
+            "S": side,
+            "o": "MARKET",
+            "q": f"{quantity:.8f}",
+            "p": "0.00000000",
+            "x": "TRADE",
+            "X": "FILLED",
+            "i": order_id,
+            "l": f"{quantity:.8f}",
+            "z": f"{quantity:.8f}",
+            "L": f"{price:.8f}",
+            "n": "0.00000000",
+            "N": "USDT",
+            "T": timestamp,
+        }
+        account_position = {
+            "e": "outboundAccountPosition",
+            "E": timestamp,
+            "u": timestamp,
+            "B": [{"a": a, "f": f"{f:.8f}", "l": "0.00000000"} for a, f in self.balances.items()],
+        }
+        for user_stream in list(itertools.chain(*self.user_streams.values())):
+            await self.send(user_stream, execution_report)
+            await self.send(user_stream, account_position)
+
+    # user data stream
+
+    async def user_stream_handler(self, request: web.Request) -> web.WebSocketResponse:
+        wss = await self.accept(request)
+        listen_key = request.match_info["listen_key"]
+        self.user_streams.setdefault(listen_key, set()).add(wss)
+        async for _ in wss:
+            pass
+        self.user_streams[listen_key].discard(wss)
+        self.connections.discard(wss)
+        return wss
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local Binance wss stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbols", default="BTCUSDT", help="comma separated symbols")
+    parser.add_argument("--trade-rate", type=float, default=10.0, help="trades per second for each symbol")
+    parser.add_argument("--fill-latency", type=float, default=0.0, help="order fill latency (ms)")
+    parser.add_argument("--price", type=float, default=60000.0, help="initial price")
+    parser.add_argument("--volatility", type=float, default=0.0001, help="price change stddev per trade")
+    parser.add_argument("--drop-interval", type=float, default=0.0, help="close all connections every N seconds")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    exchange = FakeExchange(
+        symbols=args.symbols.split(","),
+        trade_rate=args.trade_rate,
+        fill_latency=args.fill_latency,
+        price=args.price,
+        volatility=args.volatility,
+        drop_interval=args.drop_interval,
+    )
+    web.run_app(exchange.app, host=args.host, port=args.port)
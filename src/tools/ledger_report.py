@@ -0,0 +1,142 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+from msgspec import Struct, json
+
+from adapters.ledger import read_ledger
+from models.state import EXIT_REASON
+
+REPORT_COLUMNS = (
+    "symbol",
+    "entry_time",
+    "exit_time",
+    "commission",
+    "entry_commission",
+    "pnl",
+    "exit_reason",
+    "entry_latency",
+    "exit_latency",
+)
+PNL_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+LATENCY_PERCENTILES = (50, 90, 99, 100)
+
+
+class ExitReasonStats(Struct):
+    trades: int
+    win_rate: float
+    total_pnl: float
+    avg_pnl: float
+
+
+class LedgerReport(Struct):
+    trades: int
+    symbols: list[str] = []
+    first_exit_time: int = 0
+    last_exit_time: int = 0
+    wins: int = 0
+    win_rate: float = 0.0
+    total_pnl: float = 0.0
+    avg_pnl: float = 0.0
+    pnl_std: float = 0.0
+    pnl_percentiles: dict[str, float] = {}
+    gross_profit: float = 0.0
+    gross_loss: float = 0.0
+    max_drawdown: float = 0.0  # of the cumulative pnl
+    avg_hold_time: float = 0.0  # seconds
+    total_commission: float = 0.0
+    exit_reasons: dict[str, ExitReasonStats] = {}
+    entry_latency: dict[str, float] = {}  # us, orders sent by the bot process (not restored or replayed)
+    exit_latency: dict[str, float] = {}
+    elapsed: float = 0.0
+
+
+def percentiles(values: np.ndarray, percents: tuple[int, ...]) -> dict[str, float]:
+    if not len(values):
+        return {}
+    values = np.percentile(values, percents)
+    return {f"p{percent}": round(float(value), 6) for percent, value in zip(percents, values, strict=True)}
+
+
+def symbols(column: np.ndarray) -> list[str]:
+    """Unique values of the rows where the symbol changes, instead of hashing every row"""
+    words = np.ascontiguousarray(column).view(np.uint64).reshape(len(column), -1)  # S16 compared as two integers
+    changed = column[np.flatnonzero((words[1:] != words[:-1]).any(axis=1)) + 1]
+    return sorted(symbol.decode() for symbol in np.unique(np.append(changed, column[:1])))
+
+
+def max_drawdown(pnl: np.ndarray) -> float:
+    equity = np.concatenate(([0.0], np.cumsum(pnl)))
+    return float((np.maximum.accumulate(equity) - equity).max())
+
+
+def build_report(columns: dict[str, np.ndarray]) -> LedgerReport:
+    """Columns are ordered by exit time (see read_ledger), pnl is net of both fills commissions"""
+    pnl, exit_time = columns["pnl"] - columns["entry_commission"], columns["exit_time"]
+    wins = pnl > 0
+    trades = len(pnl)
+
+    reasons = {}
+    reason_trades = np.bincount(columns["exit_reason"], minlength=len(EXIT_REASON))
+    reason_wins = np.bincount(columns["exit_reason"], weights=wins, minlength=len(EXIT_REASON))
+    reason_pnl = np.bincount(columns["exit_reason"], weights=pnl, minlength=len(EXIT_REASON))
+    for reason in EXIT_REASON:
+        if count := int(reason_trades[reason.value]):
+            reasons[reason.name.lower()] = ExitReasonStats(
+                trades=count,
+                win_rate=round(float(reason_wins[reason.value]) / count, 6),
+                total_pnl=round(float(reason_pnl[reason.value]), 6),
+                avg_pnl=round(float(reason_pnl[reason.value]) / count, 6),
+            )
+
+    if not trades:
+        return LedgerReport(trades=0)
+    return LedgerReport(
+        trades=trades,
+        symbols=symbols(columns["symbol"]),
+        first_exit_time=int(exit_time[0]),
+        last_exit_time=int(exit_time[-1]),
+        wins=int(wins.sum()),
+        win_rate=round(float(wins.mean()), 6),
+        total_pnl=round(float(pnl.sum()), 6),
+        avg_pnl=round(float(pnl.mean()), 6),
+        pnl_std=round(float(pnl.std()), 6),
+        pnl_percentiles=percentiles(pnl, PNL_PERCENTILES),
+        gross_profit=round(float(pnl.clip(min=0).sum()), 6),
+        gross_loss=round(float(pnl.clip(max=0).sum()), 6),
+        max_drawdown=round(max_drawdown(pnl), 6),
+        avg_hold_time=round(float((exit_time - columns["entry_time"]).mean()) / 1000, 3),
+        total_commission=round(float(columns["commission"].sum() + columns["entry_commission"].sum()), 6),
+        exit_reasons=reasons,
+        entry_latency=percentiles(columns["entry_latency"][columns["entry_latency"] > 0], LATENCY_PERCENTILES),
+        exit_latency=percentiles(columns["exit_latency"][columns["exit_latency"] > 0], LATENCY_PERCENTILES),
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Performance report of the closed positions ledger")
+    parser.add_argument("path", help="ledger directory (env LEDGER_PATH or backtest --ledger)")
+    parser.add_argument("--symbol", help="only positions of the symbol")
+    parser.add_argument("--since", type=int, default=0, help="exit time from (ms)")
+    parser.add_argument("--until", type=int, default=0, help="exit time to (ms), 0 - no limit")
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    columns = read_ledger(args.path, REPORT_COLUMNS)
+    if args.symbol or args.since or args.until:
+        selected = columns["exit_time"] >= args.since
+        if args.until:
+            selected &= columns["exit_time"] <= args.until
+        if args.symbol:
+            selected &= columns["symbol"] == args.symbol.encode()
+        columns = {name: values[selected] for name, values in columns.items()}
+    report = build_report(columns)
+    report.elapsed = round(time.perf_counter() - started, 3)
+    sys.stdout.buffer.write(json.format(json.encode(report)) + b"\n")
+
+
+if __name__ == "__main__":
+    main(parse_args())
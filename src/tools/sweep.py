@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Any
+
+# keys are not needed for offline replay, but settings require them
+os.environ.setdefault("API_KEY", "")
+os.environ.setdefault("PRIVATE_KEY_BASE64", "")
+os.environ["OFFLINE"] = "True"
+
+import numpy as np  # noqa: E402
+import uvloop  # noqa: E402
+from msgspec import Struct, json  # noqa: E402
+
+from core.backtester import Backtester, load_trades  # noqa: E402
+from core.logging import setup_logging  # noqa: E402
+from models import Trade  # noqa: E402
+from settings import settings  # noqa: E402
+
+TRADE_DTYPE: np.dtype = np.dtype([("trade_time", "<i8"), ("price", "<f8"), ("quantity", "<f8"), ("trade_id", "<i8")])
+REPLAY_CHUNK = 65536  # rows converted to python values at once
+SCAN_CHUNK = 1024  # prices compared with the SL/TP levels at once, doubled while the position stays open
+SORT_KEYS = ("total_pnl", "win_rate", "round_trips")
+MIN_NOTIONAL = 5.0
+
+worker: dict[str, Any] = {}  # dataset and options of the worker process, see init_worker
+
+
+class SweepPoint(Struct, frozen=True):
+    sl: float
+    tp: float
+    hold: int
+    sleep: int
+
+
+class SweepResult(Struct):
+    sl: float
+    tp: float
+    hold: int
+    sleep: int
+    round_trips: int
+    total_tp_trades: int
+    total_sl_trades: int
+    win_rate: float
+    total_pnl: float
+    quote_balance: float
+    elapsed: float
+
+
+def parse_values(spec: str, kind: type) -> list[Any]:
+    """Comma separated values or a start:stop:step range (stop included)"""
+    if ":" in spec:
+        start, stop, step = (float(value) for value in spec.split(":"))
+        count = int(round((stop - start) / step)) + 1
+        return [kind(round(start + index * step, 10)) for index in range(max(count, 0))]
+    return [kind(float(value)) for value in spec.split(",") if value.strip()]
+
+
+def grid_points(args: argparse.Namespace) -> list[SweepPoint]:
+    """Grid of the settings, or a reproducible random sample of it"""
+    points = [
+        SweepPoint(sl=sl, tp=tp, hold=hold, sleep=sleep)
+        for sl, tp, hold, sleep in itertools.product(
+            parse_values(args.sl, float),
+            parse_values(args.tp, float),
+            parse_values(args.hold, int),
+            parse_values(args.sleep, int),
+        )
+    ]
+    if 0 < args.samples < len(points):
+        return random.Random(args.seed).sample(points, args.samples)  # noqa: S311
+    return points
+
+
+def share_trades(trades: Iterable[Trade]) -> tuple[Any, int]:
+    """Columns of the dataset in shared memory: workers map them instead of receiving pickled trades"""
+    rows = np.fromiter(
+        ((trade.trade_time, trade.price, trade.quantity, trade.trade_id) for trade in trades), dtype=TRADE_DTYPE
+    )
+    buffer = get_context("spawn").RawArray("B", max(rows.nbytes, 1))
+    np.frombuffer(buffer, dtype=np.uint8, count=rows.nbytes)[:] = rows.view(np.uint8)
+    return buffer, len(rows)
+
+
+def replay(rows: np.ndarray, symbol: str) -> Iterator[Trade]:
+    """Trades of the shared dataset, built per run (the trader and the simulated exchange keep references)"""
+    for start in range(0, len(rows), REPLAY_CHUNK):
+        chunk = rows[start : start + REPLAY_CHUNK]
+        columns = (chunk["trade_time"].tolist(), chunk["price"].tolist(), chunk["quantity"].tolist())
+        for trade_time, price, quantity, trade_id in zip(*columns, chunk["trade_id"].tolist(), strict=True):
+            yield Trade(
+                event_time=trade_time,
+                symbol=symbol,
+                price=price,
+                trade_time=trade_time,
+                quantity=quantity,
+                trade_id=trade_id,
+            )
+
+
+def init_worker(buffer: Any, count: int, args: argparse.Namespace) -> None:
+    worker["rows"] = rows = np.frombuffer(buffer, dtype=TRADE_DTYPE, count=count)
+    worker["times"] = np.ascontiguousarray(rows["trade_time"])
+    worker["prices"] = np.ascontiguousarray(rows["price"])
+    worker["ordered"] = bool(np.all(np.diff(worker["times"]) >= 0))  # stale trades are skipped by the trader
+    worker["args"] = args
+    settings.SYMBOL = args.symbol
+    settings.POSITION_QUANTITY = args.quantity
+    settings.LOGLEVEL = args.loglevel
+    setup_logging()
+
+
+def run_point(point: SweepPoint, exact: bool = False) -> SweepResult:
+    """Backtest of one point in the worker process: the array scan when the settings allow it, else (or when exact)
+    the per-event replay through the trader"""
+    args = worker["args"]
+    if not exact and not args.exact and scan_supported():
+        started = time.perf_counter()
+        if (result := scan_point(worker["times"], worker["prices"], point, args)) is not None:
+            result.elapsed = round(time.perf_counter() - started, 3)
+            return result
+    return replay_point(point)
+
+
+def scan_supported() -> bool:
+    """Percent levels on floats, the indicators and the fixed point levels need every trade"""
+    return worker["ordered"] and settings.POSITION_LEVELS == "percent" and not settings.FIXED_POINT
+
+
+def fill_index(times: np.ndarray, placed: int, latency: int) -> int:
+    """Trade which fills the order placed while processing the trade `placed` (see SimulatedExchange.match)"""
+    return max(placed + 1, int(times.searchsorted(times[placed] + latency)))
+
+
+def first_crossing(prices: np.ndarray, start: int, stop: int, sl: float, tp: float) -> int:
+    """First trade in [start, stop) at or beyond a level, stop if there is none"""
+    size = SCAN_CHUNK
+    while start < stop:
+        chunk = prices[start : min(start + size, stop)]
+        crossed = (chunk >= tp) | (chunk <= sl)
+        if crossed[index := int(crossed.argmax())]:
+            return start + index
+        start += len(chunk)
+        size *= 2
+    return stop
+
+
+def scan_point(
+    times: np.ndarray, prices: np.ndarray, point: SweepPoint, args: argparse.Namespace
+) -> SweepResult | None:
+    """Round trips of the per-event path found on the arrays: the fill of an order is the next trade after the
+    latency, the exit is the first SL/TP crossing or the hold deadline, the sleep window is skipped by its deadline.
+    Float operations repeat the trader and the simulated exchange, so the results are equal. None if the trader
+    would stop on the balance or min notional check (the per-event path handles it)."""
+    count, quantity, commission, latency = len(times), args.quantity, args.commission, args.latency
+    quote, total_pnl, tp_trades, sl_trades = args.balance, 0.0, 0, 0
+    entry, last_price = 1, float(prices[1]) if count > 1 else 0.0  # the trader is READY on the second trade
+    while entry < count:
+        requested = quantity * last_price
+        if quote < requested or requested < MIN_NOTIONAL:
+            return None
+        if (fill := fill_index(times, entry, latency)) >= count:
+            break
+        price, fill_time = float(prices[fill]), int(times[fill])
+        notional = price * quantity
+        quote -= notional + notional * commission
+        sl, tp = price - (price * (point.sl / 100)), price + (price * (point.tp / 100))
+
+        # the fill event checks the levels against the previous trade of the same millisecond
+        if fill and times[fill - 1] == fill_time and not sl < prices[fill - 1] < tp:
+            close = fill
+        else:
+            hold_end = max(fill, int(times.searchsorted(fill_time + point.hold * 1000)))
+            close = first_crossing(prices, fill, hold_end, sl, tp)
+        if close >= count or (exit_ := fill_index(times, close, latency)) >= count:
+            break
+
+        exit_price = float(prices[exit_])
+        notional = exit_price * quantity
+        fee = notional * commission
+        quote += notional - fee
+        pnl = exit_price * quantity - price * quantity - fee
+        total_pnl += pnl
+        if pnl > 0:
+            tp_trades += 1
+        else:
+            sl_trades += 1
+
+        # the sleep timer places the next BUY before the trade of its deadline is processed
+        entry = max(exit_, int(times.searchsorted(int(times[exit_]) + point.sleep * 1000)))
+        last_price = float(prices[entry - 1])
+
+    round_trips = tp_trades + sl_trades
+    return SweepResult(
+        sl=point.sl,
+        tp=point.tp,
+        hold=point.hold,
+        sleep=point.sleep,
+        round_trips=round_trips,
+        total_tp_trades=tp_trades,
+        total_sl_trades=sl_trades,
+        win_rate=round(tp_trades / round_trips, 4) if round_trips else 0.0,
+        total_pnl=round(total_pnl, 8),
+        quote_balance=round(quote, 8),
+        elapsed=0.0,
+    )
+
+
+def replay_point(point: SweepPoint) -> SweepResult:
+    """Backtest of one point through the trader, the settings are process globals"""
+    args = worker["args"]
+    settings.POSITION_SL_PERCENT, settings.POSITION_TP_PERCENT = point.sl, point.tp
+    settings.POSITION_HOLD_TIME, settings.POSITION_SLEEP_TIME = point.hold, point.sleep
+    backtester = Backtester(
+        replay(worker["rows"], args.symbol),
+        quote_balance=args.balance,
+        commission=args.commission,
+        latency=args.latency,
+        min_notional=MIN_NOTIONAL,
+    )
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        result = runner.run(backtester.run())
+    return SweepResult(
+        sl=point.sl,
+        tp=point.tp,
+        hold=point.hold,
+        sleep=point.sleep,
+        round_trips=result.round_trips,
+        total_tp_trades=result.total_tp_trades,
+        total_sl_trades=result.total_sl_trades,
+        win_rate=round(result.total_tp_trades / result.round_trips, 4) if result.round_trips else 0.0,
+        total_pnl=result.total_pnl,
+        quote_balance=result.quote_balance,
+        elapsed=result.elapsed,
+    )
+
+
+def sweep(buffer: Any, count: int, points: list[SweepPoint], args: argparse.Namespace) -> list[SweepResult]:
+    results = []
+    with ProcessPoolExecutor(
+        args.workers or os.cpu_count(),
+        mp_context=get_context("spawn"),
+        initializer=init_worker,
+        initargs=(buffer, count, args),
+    ) as pool:
+        futures = [pool.submit(run_point, point) for point in points]
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            sys.stderr.write(f"\r{done}/{len(points)} points")
+        sys.stderr.write("\n")
+        results.sort(key=lambda result: getattr(result, args.sort), reverse=True)
+        if args.check and not args.exact:
+            check_results(pool, results[: args.check])
+    return results
+
+
+def check_results(pool: ProcessPoolExecutor, results: list[SweepResult]) -> None:
+    """Best points again through the per-event path, the scan must give the same round trips"""
+    points = [SweepPoint(sl=result.sl, tp=result.tp, hold=result.hold, sleep=result.sleep) for result in results]
+    for result, future in zip(results, [pool.submit(run_point, point, True) for point in points], strict=True):
+        expected = future.result()
+        if (result.round_trips, result.total_pnl) != (expected.round_trips, expected.total_pnl):
+            sys.stderr.write(
+                f"check failed: sl={result.sl:g} tp={result.tp:g} hold={result.hold} sleep={result.sleep}: "
+                f"{result.round_trips} trips, pnl {result.total_pnl}, per-event path: "
+                f"{expected.round_trips} trips, pnl {expected.total_pnl}\n"
+            )
+    sys.stderr.write(f"checked {len(points)} points with the per-event path\n")
+
+
+def format_table(results: list[SweepResult]) -> str:
+    lines = [f"{'rank':>4} {'sl':>6} {'tp':>6} {'hold':>6} {'sleep':>6} {'trips':>7} {'win_rate':>8} {'total_pnl':>14}"]
+    for rank, result in enumerate(results, 1):
+        lines.append(
+            f"{rank:>4} {result.sl:>6g} {result.tp:>6g} {result.hold:>6} {result.sleep:>6} {result.round_trips:>7} "
+            f"{result.win_rate:>8.4f} {result.total_pnl:>14.8f}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backtest a grid of SL/TP/hold/sleep settings on all cores")
+    parser.add_argument("path", help="trades csv (or zip) from data.binance.vision, or recorded frames")
+    parser.add_argument("--symbol", default=settings.SYMBOL)
+    parser.add_argument("--quantity", type=float, default=settings.POSITION_QUANTITY)
+    parser.add_argument(
+        "--sl", default=str(settings.POSITION_SL_PERCENT), help="stop loss (percent): a,b,c or start:stop:step"
+    )
+    parser.add_argument("--tp", default=str(settings.POSITION_TP_PERCENT), help="take profit (percent)")
+    parser.add_argument("--hold", default=str(settings.POSITION_HOLD_TIME), help="hold time (seconds)")
+    parser.add_argument("--sleep", default=str(settings.POSITION_SLEEP_TIME), help="sleep time (seconds)")
+    parser.add_argument("--samples", type=int, default=0, help="random points of the grid, 0 - the whole grid")
+    parser.add_argument("--seed", type=int, default=0, help="random sample seed")
+    parser.add_argument("--balance", type=float, default=10000.0, help="initial quote balance")
+    parser.add_argument("--commission", type=float, default=0.0, help="commission rate, 0.001 = 0.1%%")
+    parser.add_argument("--latency", type=int, default=0, help="order fill latency (ms)")
+    parser.add_argument("--exact", action="store_true", help="every point through the per-event path")
+    parser.add_argument("--check", type=int, default=1, help="best points rerun through the per-event path")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes, 0 - all cores")
+    parser.add_argument("--sort", default="total_pnl", choices=SORT_KEYS, help="ranking key (descending)")
+    parser.add_argument("--top", type=int, default=20, help="rows of the table, 0 - all")
+    parser.add_argument("--output", help="write all results to a json file")
+    parser.add_argument("--loglevel", default="WARNING")
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    points = grid_points(args)
+    buffer, count = share_trades(load_trades(args.path, args.symbol))
+    sys.stderr.write(f"{count} trades, {len(points)} points\n")
+    results = sweep(buffer, count, points, args)
+    if args.output:
+        with open(args.output, "wb") as file:
+            file.write(json.format(json.encode(results)))
+    sys.stdout.write(format_table(results[: args.top] if args.top else results))
+    sys.stdout.write(f"elapsed: {time.perf_counter() - started:.1f}s\n")
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -1,8 +1,26 @@
+import asyncio
+import json
 from unittest.mock import patch, AsyncMock, MagicMock
 
 import pytest
-from adapters.binance_wss import public_wss_client, private_wss_client
+import pytest_asyncio
+from adapters.binance_wss import (
+    Backoff,
+    BinanceWSS,
+    MarketDataFeed,
+    RequestError,
+    TradeArbiter,
+    TradeWindow,
+    public_wss_client,
+    private_wss_client,
+)
+from aiohttp import WSMsgType
+from aiohttp.test_utils import TestServer
+from core.metrics import metrics
 from freezegun import freeze_time
+from models import AccountPosition, Trade
+from settings import settings
+from tools.fake_exchange import FakeExchange
 
 
 @pytest.fixture
@@ -14,7 +32,7 @@ def mock_private_order_place():
 @pytest.fixture
 def mock_private_wss_client():
     wss_client = MagicMock()
-    async_methods = ['send_json']
+    async_methods = ['send_json', 'send_str']
     for method_name in async_methods:
         setattr(wss_client, method_name, AsyncMock())
     with patch('adapters.binance_wss.private_wss_client.wss_client', new_callable=lambda: wss_client):
@@ -24,7 +42,7 @@ def mock_private_wss_client():
 @pytest.fixture
 def mock_async_logger():
     logger = MagicMock()
-    async_methods = ['info', 'warning', 'error', 'debug', 'ainfo', 'asuccess']
+    async_methods = ['info', 'warning', 'error', 'debug', 'adebug', 'ainfo', 'awarning', 'asuccess']
     for method_name in async_methods:
         setattr(logger, method_name, AsyncMock())
 
@@ -40,11 +58,18 @@ def test_create_ws_message():
                        "id": f"subscribe_{symbol.lower()}_1713804421000", }
 
 
+@freeze_time("2024-04-22T16:47:01Z")
+def test_create_ws_message_book_ticker():
+    with patch.object(public_wss_client, 'stream', 'bookTicker'):
+        message = public_wss_client.create_ws_message("SUBSCRIBE")
+    assert message["params"] == ["btcusdt@bookTicker"]
+
+
 @freeze_time("2024-04-22T16:47:01Z")
 def test_create_ws_message_logon():
     symbol = "BTCUSDT"
     message = private_wss_client.create_ws_message("session.logon")
-    assert message['id'] == "session_logon_1713804421000"
+    assert isinstance(message['id'], int)
     assert message['method'] == "session.logon"
     assert message['params']['timestamp'] == 1713804421000
     assert message['params']['apiKey'] == 'test_key'
@@ -56,7 +81,7 @@ def test_create_ws_message_exchange_info():
     symbol = "BTCUSDT"
     method = "exchangeInfo"
     message = private_wss_client.create_ws_message(method)
-    assert message['id'] == f"{method.replace('.', '_').lower()}_1713804421000"
+    assert isinstance(message['id'], int)
     assert message['method'] == method
     assert message['params']['symbols'] == [symbol]
 
@@ -66,7 +91,7 @@ def test_create_ws_message_userdatastream_start():
     symbol = "BTCUSDT"
     method = "userDataStream.start"
     message = private_wss_client.create_ws_message(method)
-    assert message['id'] == f"{method.replace('.', '_').lower()}_1713804421000"
+    assert isinstance(message['id'], int)
     assert message['method'] == method
     assert message['params']['apiKey'] == 'test_key'
 
@@ -78,7 +103,353 @@ def test_create_ws_message_userdatastream_ping():
     private_wss_client.listen_key = 'test_listenkey'
     message = private_wss_client.create_ws_message(method)
 
-    assert message['id'] == f"{method.replace('.', '_').lower()}_1713804421000"
+    assert isinstance(message['id'], int)
     assert message['method'] == method
     assert message['params']['apiKey'] == 'test_key'
     assert message['params']['listenKey'] == 'test_listenkey'
+
+
+def test_decode_message_trade():
+    data = ('{"e":"trade","E":1713797829314,"s":"BTCUSDT","t":1415300,"p":"66197.57000000","q":"0.00100000",'
+            '"b":4247688,"a":4247669,"T":1713797829314,"m":false,"M":true}')
+    message = public_wss_client.decode_message(data)
+    assert isinstance(message, Trade)
+    assert message.price == 66197.57
+    assert message.quantity == 0.001
+
+
+def test_decode_message_agg_trade():
+    data = ('{"e":"aggTrade","E":1713797829314,"s":"BTCUSDT","a":26129,"p":"66197.57000000","q":"0.00100000",'
+            '"f":100,"l":105,"T":1713797829314,"m":true,"M":true}')
+    message = public_wss_client.decode_message(data)
+    assert isinstance(message, Trade)
+    assert (message.trade_id, message.price, message.trade_time) == (26129, 66197.57, 1713797829314)
+
+
+@freeze_time("2024-04-22T16:47:01Z")
+def test_decode_message_book_ticker():
+    data = ('{"u":400900217,"s":"BTCUSDT","b":"66197.57000000","B":"31.21000000","a":"66197.58000000",'
+            '"A":"40.66000000"}')
+    message = public_wss_client.decode_message(memoryview(data.encode()))
+    assert isinstance(message, Trade)
+    assert (message.trade_id, message.price, message.quantity) == (400900217, 66197.57, 31.21)
+    assert message.trade_time == 1713804421000 and message.event_time == 0  # receive time, no exchange time
+    assert public_wss_client.decode_message(data, received_ms=1713797829314).trade_time == 1713797829314
+
+
+def test_decode_message_account_position():
+    data = ('{"e":"outboundAccountPosition","E":1713930281749,"u":1713930281749,'
+            '"B":[{"a":"BTC","f":"1.00010000","l":"0.00000000"}]}')
+    message = public_wss_client.decode_message(data)
+    assert isinstance(message, AccountPosition)
+    assert message.balances[0].free == 1.0001
+
+
+@pytest.mark.parametrize("data", ['{"result":null,"id":"subscribe_btcusdt_1713804421000"}', '{"e":"unknown","E":1}'])
+def test_decode_message_fallback_to_dict(data):
+    assert isinstance(public_wss_client.decode_message(data), dict)
+
+
+@pytest.mark.asyncio
+async def test_malformed_frame_does_not_close_connection(mock_async_logger):
+    async def frames():
+        for data in ('{"u":400900217,"s":"BTCUSDT","b":"66197.5', '{"e":"trade","E":1,"s":"BTCUSDT","t":1,'
+                     '"p":"66197.57","q":"0.001","T":1}'):
+            yield MagicMock(type=WSMsgType.TEXT, data=data)
+
+    queue = asyncio.Queue()
+    with patch.object(public_wss_client, 'wss_client', frames()):
+        await public_wss_client.receive_messages(queue)
+    assert queue.get_nowait().price == 66197.57
+    assert mock_async_logger.awarning.await_args.args == ("Failed decode message",)
+
+
+@pytest.mark.asyncio
+async def test_depth_update_applied_to_book_not_queued(mock_async_logger):
+    queue, books = asyncio.Queue(), MagicMock()
+    message = public_wss_client.decode_message(
+        '{"e":"depthUpdate","E":1713797829314,"s":"BTCUSDT","U":157,"u":160,"b":[["66197.57","0.5"]],"a":[]}'
+    )
+    with patch.object(BinanceWSS, 'books', books):
+        await public_wss_client.process_message(message, queue)
+    assert books.apply.call_args.args[0].bids == [(66197.57, 0.5)]
+    assert queue.empty()
+
+
+@freeze_time("2024-04-22T16:47:01Z")
+def test_create_ws_message_depth():
+    message = private_wss_client.create_ws_message("depth", symbol="ETHUSDT")
+    assert message["params"] == {"symbol": "ETHUSDT", "limit": settings.ORDER_BOOK_DEPTH}
+
+
+@pytest.mark.asyncio
+async def test_process_message_typed_event(mock_async_logger):
+    queue = asyncio.Queue()
+    message = public_wss_client.decode_message(
+        '{"e":"trade","E":1713797829314,"s":"BTCUSDT","p":"66197.57","T":1713797829314,"q":"0.001"}'
+    )
+    await public_wss_client.process_message(message, queue)
+    assert queue.get_nowait() is message
+
+
+@freeze_time("2024-04-22T16:47:01Z")
+def test_create_ws_message_trades_recent_for_symbol():
+    message = private_wss_client.create_ws_message("trades.recent", symbol="ETHUSDT")
+    assert message['params'] == {"symbol": "ETHUSDT", "limit": 1}
+    assert private_wss_client.create_ws_message("trades.recent")['id'] == message['id'] + 1
+
+
+@pytest.mark.asyncio
+async def test_process_message_trades_recent_symbol(mock_async_logger, mock_private_wss_client):
+    queue = asyncio.Queue()
+    request = private_wss_client.create_ws_message("trades.recent", symbol="ETHUSDT")
+    future = await private_wss_client.request(request, symbol="ETHUSDT")
+    message = {"id": request["id"], "status": 200, "result": []}
+    await private_wss_client.process_message(message, queue)
+    queued = queue.get_nowait()
+    assert queued["channel"] == "private_trades_recent"
+    assert queued["symbol"] == "ETHUSDT"
+    assert await future is message
+    assert request["id"] not in private_wss_client.pending
+
+
+@pytest.mark.asyncio
+async def test_request_error_response(mock_async_logger, mock_private_wss_client):
+    queue = asyncio.Queue()
+    request = private_wss_client.create_ws_message("account.status")
+    future = await private_wss_client.request(request)
+    await private_wss_client.process_message(
+        {"id": request["id"], "status": 400, "error": {"code": -1021, "msg": "Timestamp outside of recvWindow"}}, queue
+    )
+    with pytest.raises(RequestError) as error:
+        await future
+    assert (error.value.status, error.value.code) == (400, -1021)
+    assert queue.empty()  # error responses are not forwarded to the trader
+
+
+@pytest.mark.asyncio
+async def test_request_timeout(mock_async_logger, mock_private_wss_client):
+    request = private_wss_client.create_ws_message("exchangeInfo")
+    future = await private_wss_client.request(request, timeout=0.01)
+    with pytest.raises(TimeoutError):
+        await future
+    assert request["id"] not in private_wss_client.pending
+
+
+@pytest.mark.asyncio
+async def test_pending_requests_failed_on_reconnect(mock_async_logger, mock_private_wss_client):
+    future = await private_wss_client.request(private_wss_client.create_ws_message("exchangeInfo"))
+    with patch.object(private_wss_client, 'auth_complete', True):
+        await private_wss_client.after_disconnect()
+        assert not private_wss_client.auth_complete
+    with pytest.raises(ConnectionError):
+        await future
+    assert not private_wss_client.pending
+
+
+@pytest.mark.asyncio
+async def test_order_place_not_authenticated(mock_async_logger):
+    with patch.object(private_wss_client, 'auth_complete', False):
+        future = await private_wss_client.order_place("BUY", 0.001)
+    with pytest.raises(RequestError) as error:
+        await future
+    assert error.value.status == 0
+
+
+def make_trade_frame(price):
+    return public_wss_client.decode_message(
+        f'{{"e":"trade","E":1713797829314,"s":"BTCUSDT","p":"{price}","T":1713797829314,"q":"0.001"}}'
+    )
+
+
+@pytest.mark.asyncio
+async def test_process_message_no_logs_without_debug(mock_async_logger):
+    queue = asyncio.Queue()
+    with patch('adapters.binance_wss.DEBUG_LOGS', False):
+        await public_wss_client.process_message(make_trade_frame(1.0), queue)
+        await private_wss_client.process_message({"id": "exchangeinfo_1713804421000", "result": {}}, queue)
+    mock_async_logger.adebug.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_process_message_sampled_debug_logs(mock_async_logger):
+    queue = asyncio.Queue()
+    with patch('adapters.binance_wss.DEBUG_LOGS', True), patch.object(public_wss_client, 'log_sample', 3):
+        for price in range(6):
+            await public_wss_client.process_message(make_trade_frame(price), queue)
+        assert mock_async_logger.adebug.await_count == 2
+
+        await private_wss_client.process_message({"id": "exchangeinfo_1713804421000", "result": {}}, queue)
+        await private_wss_client.process_message({"id": "exchangeinfo_1713804421001", "result": {}}, queue)
+        assert mock_async_logger.adebug.await_count == 4
+
+
+@pytest.mark.parametrize("quantity, step_size, expected", [
+    (0.001, "0.00001000", "0.00100"),
+    (0.0012345, "0.00100000", "0.001"),
+    (1.5, "1.00000000", "1"),
+    (0.001, "", "0.0010"),
+])
+def test_format_quantity(quantity, step_size, expected):
+    with patch.object(private_wss_client, 'step_sizes', {"BTCUSDT": step_size} if step_size else {}):
+        assert private_wss_client.format_quantity("BTCUSDT", quantity) == expected
+
+
+@pytest.mark.asyncio
+async def test_exchange_info_prepares_order_templates(mock_async_logger, mock_private_wss_client):
+    queue = asyncio.Queue()
+    request = private_wss_client.create_ws_message("exchangeInfo")
+    await private_wss_client.request(request)
+    symbols = [{"symbol": "BTCUSDT", "filters": [{"filterType": "LOT_SIZE", "stepSize": "0.00001000"}]}]
+    with patch.object(private_wss_client, 'order_templates', {}) as templates:
+        await private_wss_client.process_message({"id": request["id"], "status": 200, "result": {"symbols": symbols}},
+                                                 queue)
+        assert set(templates) == {("BTCUSDT", side, settings.POSITION_QUANTITY) for side in ("BUY", "SELL")}
+
+        with patch.object(private_wss_client, 'auth_complete', True):
+            future = await private_wss_client.order_place("SELL", settings.POSITION_QUANTITY)
+
+    data = mock_private_wss_client.send_str.await_args.args[0]
+    message = json.loads(data)
+    assert message["id"] in private_wss_client.pending and not future.done()
+    assert message["method"] == "order.place" and message["params"]["timestamp"] > 0
+    assert message["params"] == {**message["params"], "symbol": "BTCUSDT", "side": "SELL", "type": "MARKET"}
+    assert message["params"]["quantity"] == f"{settings.POSITION_QUANTITY:.5f}"
+    private_wss_client.request_failed(message["id"], ConnectionError())
+
+
+@pytest.mark.asyncio
+async def test_exchange_info_cache(tmp_path, mock_async_logger):
+    queue = asyncio.Queue()
+    exchange_info = {"symbols": [{"symbol": "BTCUSDT", "status": "TRADING",
+                                  "filters": [{"filterType": "LOT_SIZE", "stepSize": "0.00001000"}]}]}
+    with patch.object(settings, 'EXCHANGE_INFO_CACHE', str(tmp_path / "cache" / "exchange_info.json")):
+        private_wss_client.load_exchange_info_cache(queue)
+        assert queue.empty()  # no cache yet
+
+        private_wss_client.save_exchange_info_cache(exchange_info)
+        private_wss_client.load_exchange_info_cache(queue)
+
+    cached = queue.get_nowait()
+    assert cached["channel"] == "private_exchangeinfo"
+    assert cached["result"] == exchange_info
+    assert private_wss_client.step_sizes["BTCUSDT"] == "0.00001000"
+    assert [path.name for path in (tmp_path / "cache").iterdir()] == ["exchange_info.BTCUSDT.json"]
+
+
+@pytest.mark.asyncio
+async def test_exchange_info_cache_per_worker_shard(tmp_path, mock_async_logger):
+    queue = asyncio.Queue()
+    exchange_info = {"symbols": [{"symbol": "BTCUSDT", "filters": []}, {"symbol": "ETHUSDT", "filters": []}]}
+    with patch.object(settings, 'EXCHANGE_INFO_CACHE', str(tmp_path / "exchange_info.json")):
+        for shard in (["BTCUSDT"], ["ETHUSDT"]):
+            with patch.object(private_wss_client, 'symbols', shard):
+                private_wss_client.save_exchange_info_cache({"symbols": [
+                    details for details in exchange_info["symbols"] if details["symbol"] in shard
+                ]})
+        with patch.object(private_wss_client, 'symbols', ["BTCUSDT"]):
+            private_wss_client.load_exchange_info_cache(queue)  # not overwritten by the other worker
+
+    assert queue.get_nowait()["result"]["symbols"][0]["symbol"] == "BTCUSDT"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["exchange_info.BTCUSDT.json",
+                                                               "exchange_info.ETHUSDT.json"]
+
+
+def test_backoff():
+    backoff = Backoff(base=0.25, cap=1.0, reset_after=60)
+    delays = [backoff.next_delay() for _ in range(6)]
+    assert delays[0] == 0  # fast first retry
+    for delay, ceiling in zip(delays[1:], (0.25, 0.5, 1.0, 1.0, 1.0)):
+        assert ceiling / 2 <= delay <= ceiling
+    assert backoff.next_delay(uptime=60) == 0  # long-lived connection resets the attempts
+
+
+class ProbeWSS(BinanceWSS):
+    """Spawns a long child task on every connection"""
+
+    async def after_connect(self):
+        await super().after_connect()
+        self.spawn(asyncio.sleep(3600))
+
+
+@pytest_asyncio.fixture
+async def exchange_server():
+    exchange = FakeExchange(trade_rate=0)
+    server = TestServer(exchange.app)
+    await server.start_server()
+    yield exchange, server
+    await server.close()
+    await BinanceWSS.close_session()
+
+
+async def wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+@pytest.mark.asyncio
+async def test_reconnect_cancels_child_tasks(exchange_server, mock_async_logger):
+    exchange, server = exchange_server
+    client = ProbeWSS(symbols=["BTCUSDT"], channel="probe", url=str(server.make_url("/ws")))
+    task = asyncio.create_task(client.wss_connect(asyncio.Queue()))
+    await wait_for(lambda: client.connected_at and exchange.subscribers)
+    first_child, session = next(iter(client.tasks)), BinanceWSS.session
+
+    await exchange.drop_connections()
+    await wait_for(lambda: client.wss_client and first_child not in client.tasks and len(client.tasks) == 1)
+    assert first_child.cancelled()
+    assert BinanceWSS.session is session  # connections share one session
+    assert metrics.counters[("reconnects_total", (("channel", "probe"),))] == 1
+    assert metrics.histograms["probe_reconnect"].count == 1
+
+    task.cancel()
+    await task
+    assert not client.tasks
+
+
+def test_trade_window():
+    window = TradeWindow(size=8)
+    assert [window.add(trade_id, trade_id * 10) for trade_id in (1, 3, 2, 3, 1)] == [True, True, True, False, False]
+    assert window.arrived(2) == 20
+    assert window.add(20, 200)  # jump beyond the window
+    assert not window.add(12, 120)  # older than the window
+    assert window.add(13, 130)
+    assert window.arrived(3) == 0
+
+
+def test_arbiter_first_arrival(mock_async_logger):
+    arbiter = TradeArbiter(window=16)
+    for channel in ("feed_a", "feed_b"):
+        arbiter.register(channel)
+    trade = dict(event_time=1, symbol="BTCUSDT", price=1.0, trade_time=1, quantity=0.001)
+
+    assert arbiter.first_arrival("feed_a", Trade(**trade, trade_id=1, received_at=1_000_000))
+    assert not arbiter.first_arrival("feed_b", Trade(**trade, trade_id=1, received_at=3_000_000))
+    assert arbiter.first_arrival("feed_b", Trade(**trade, trade_id=2, received_at=4_000_000))
+    assert arbiter.first_arrival("feed_a", Trade(**{**trade, "symbol": "ETHUSDT"}, trade_id=1))  # ids are per symbol
+    assert arbiter.first_arrival("feed_a", Trade(**trade))  # no id
+    assert metrics.histograms["feed_b_feed_lag"].count == 1
+    assert metrics.gauges[("feed_win_rate", (("channel", "feed_b"),))]() == 0.5
+
+
+@pytest.mark.asyncio
+async def test_market_data_feed_delivers_trade_once(exchange_server, mock_async_logger):
+    exchange, server = exchange_server
+    url = str(server.make_url("/ws"))
+    primary = BinanceWSS.new_instance(["BTCUSDT"], "feed", url)
+    feed = MarketDataFeed(primary, [url])
+    queue = asyncio.Queue()
+    task = asyncio.create_task(feed.wss_connect(queue))
+    await wait_for(lambda: len(exchange.subscribers.get("btcusdt@trade", ())) == 2)
+
+    for _ in range(3):
+        await exchange.send_trade("BTCUSDT", 100.0)
+    await wait_for(lambda: sum(feed.arbiter.trades.values()) == 6)
+    assert [trade.trade_id for trade in (queue.get_nowait() for _ in range(queue.qsize()))] == [1, 2, 3]
+    assert sum(feed.arbiter.wins.values()) == 3
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,100 @@
+import io
+import json
+import logging
+import time
+
+import pytest
+import structlog
+
+from core.async_logging import LogRingBuffer, RingBufferLogger, RotatingFile, SinkLogger
+
+
+def json_buffer(stream, capacity=100, file=None):
+    return LogRingBuffer(
+        capacity=capacity,
+        processors=[structlog.processors.EventRenamer("message"), structlog.processors.JSONRenderer()],
+        stream=stream,
+        file=file,
+    )
+
+
+def make_logger(buffer, level=logging.INFO, **context):
+    return RingBufferLogger(SinkLogger("test", buffer, level), processors=[], context=context)
+
+
+@pytest.mark.asyncio
+async def test_records_rendered_in_writer_thread():
+    stream = io.StringIO()
+    buffer = json_buffer(stream)
+    logger = make_logger(buffer, worker=1).bind(channel="trader")
+    buffer.start()
+
+    await logger.ainfo("Position entered at: %s", 100.5, pnl=1.5)
+    await logger.adebug("skipped by level")
+    logger.warning("sync call")
+    buffer.close()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["message"] for record in records] == ["Position entered at: 100.5", "sync call"]
+    assert records[0]["worker"] == 1 and records[0]["channel"] == "trader" and records[0]["pnl"] == 1.5
+    assert records[0]["level"] == "info" and records[0]["logger"] == "test"
+
+
+def test_overflow_is_dropped_and_reported():
+    stream = io.StringIO()
+    buffer = json_buffer(stream, capacity=3)
+    logger = make_logger(buffer)
+    for index in range(5):
+        logger.info(f"record {index}")
+    assert buffer.dropped == 2
+
+    buffer.start()
+    buffer.close()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["message"] for record in records][:3] == ["record 0", "record 1", "record 2"]
+    assert records[-1]["message"] == "Log records dropped" and records[-1]["dropped"] == 2
+
+
+def test_exception_info_captured_on_call():
+    stream = io.StringIO()
+    buffer = LogRingBuffer(
+        capacity=10,
+        processors=[structlog.processors.format_exc_info, structlog.processors.JSONRenderer()],
+        stream=stream,
+    )
+    logger = make_logger(buffer)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.error("failed", exc_info=True)
+
+    buffer.start()
+    buffer.close()
+    assert "ValueError: boom" in json.loads(stream.getvalue())["exception"]
+
+
+def test_rotating_file(tmp_path):
+    path = tmp_path / "bot.log"
+    file = RotatingFile(path, max_bytes=10, backup_count=2)
+    for index in range(4):
+        file.write(f"line {index} ....\n")
+    file.close()
+
+    assert path.read_text() == ""
+    assert (tmp_path / "bot.log.1").read_text() == "line 3 ....\n"
+    assert (tmp_path / "bot.log.2").read_text() == "line 2 ....\n"
+    assert not (tmp_path / "bot.log.3").exists()
+
+
+def test_writer_flushes_without_close():
+    stream = io.StringIO()
+    buffer = json_buffer(stream)
+    buffer.start()
+    for message in ("flushed", "woken again"):  # the writer sleeps on the wakeup event between the records
+        make_logger(buffer).info(message)
+        for _ in range(100):
+            if message in stream.getvalue():
+                break
+            time.sleep(0.01)
+    assert [json.loads(line)["message"] for line in stream.getvalue().splitlines()] == ["flushed", "woken again"]
+    buffer.close()
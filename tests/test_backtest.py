@@ -0,0 +1,92 @@
+import pytest
+
+from core.backtester import Backtester, SimulatedClock, SimulatedExchange, load_trades, split_symbol
+from models import STATUS, Order, Trade
+from settings import settings
+
+
+def make_trade(price, trade_time):
+    return Trade(event_time=trade_time, symbol="BTCUSDT", price=price, trade_time=trade_time, quantity=0.001)
+
+
+@pytest.fixture
+def trades_csv(tmp_path):
+    path = tmp_path / "BTCUSDT-trades.csv"
+    path.write_text("id,price,qty,quote_qty,time,is_buyer_maker,is_best_match\n"
+                    "1,60000.00,0.001,60.0,1713744000000,True,True\n"
+                    "2,60001.00,0.002,120.002,1713744000100000,False,True\n")
+    return path
+
+
+def test_split_symbol():
+    assert split_symbol("BTCUSDT") == ("BTC", "USDT")
+    assert split_symbol("ETHBTC") == ("ETH", "BTC")
+    with pytest.raises(ValueError):
+        split_symbol("UNKNOWN")
+
+
+def test_load_trades(trades_csv):
+    trades = list(load_trades(trades_csv, "BTCUSDT"))
+    assert len(trades) == 2
+    assert trades[0].price == 60000.0
+    assert trades[1].trade_time == 1713744000100  # microseconds converted to ms
+
+
+@pytest.mark.asyncio
+async def test_simulated_exchange_fill_after_latency():
+    clock = SimulatedClock()
+    exchange = SimulatedExchange("BTCUSDT", "BTC", "USDT", clock, commission=0.001, latency=100)
+    exchange.balances["USDT"] = 1000.0
+    clock.timestamp = 1000
+    await exchange.order_place(side="BUY", quantity=0.01)
+
+    assert exchange.match(make_trade(60000.0, 1050)) == []
+    order, account_position = exchange.match(make_trade(60010.0, 1100))
+    assert isinstance(order, Order)
+    assert order.current_order_status == "FILLED"
+    assert order.last_executed_price == 60010.0
+    assert order.transaction_time == 1100
+    assert exchange.balances["BTC"] == 0.01
+    assert exchange.balances["USDT"] == pytest.approx(1000.0 - 600.1 - 0.6001)
+    assert not exchange.pending
+
+
+@pytest.mark.asyncio
+async def test_backtester_take_profit_and_sleep():
+    start = 1713744000000
+    trades = [
+        make_trade(60000.0, start - 100),  # last price known -> ready
+        make_trade(60000.0, start),  # buy
+        make_trade(60000.0, start + 100),  # buy filled
+        make_trade(61000.0, start + 200),  # take profit -> sell
+        make_trade(61000.0, start + 300),  # sell filled -> sleeping
+        make_trade(61000.0, start + 400 + settings.POSITION_SLEEP_TIME * 1000),  # wake up -> buy
+    ]
+    backtester = Backtester(trades)
+    result = await backtester.run()
+
+    assert result.trades == 6
+    assert result.orders == 2
+    assert result.total_tp_trades == 1
+    assert result.total_pnl == pytest.approx(1.0)
+    assert backtester.trader.state.status == STATUS.ENTERING_POSITION
+
+
+@pytest.mark.asyncio
+async def test_backtester_hold_time_uses_event_time():
+    start = 1713744000000
+    hold = settings.POSITION_HOLD_TIME * 1000
+    trades = [
+        make_trade(60000.0, start - 100),
+        make_trade(60000.0, start),
+        make_trade(60000.0, start + 100),  # buy filled, position_time = start + 100
+        make_trade(60000.0, start + 99 + hold),  # hold time not elapsed yet
+        make_trade(60000.0, start + 100 + hold),  # hold time elapsed -> sell
+        make_trade(60000.0, start + 200 + hold),  # sell filled
+    ]
+    backtester = Backtester(trades)
+    result = await backtester.run()
+
+    assert result.orders == 2
+    assert result.round_trips == 1
+    assert backtester.trader.state.status == STATUS.SLEEPING
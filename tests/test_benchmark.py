@@ -0,0 +1,16 @@
+import pytest
+
+from tools.benchmark import percentile
+
+
+@pytest.mark.parametrize(
+    "percent,expected",
+    [(50, 50.0), (99, 99.0), (99.9, 100.0), (100, 100.0)],
+)
+def test_percentile(percent, expected):
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, percent) == expected
+
+
+def test_percentile_empty():
+    assert percentile([], 99) == 0.0
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+from msgspec import json
+
+from tools.fake_exchange import FakeExchange
+
+
+@pytest_asyncio.fixture
+async def exchange_server():
+    exchange = FakeExchange(trade_rate=0)
+    server = TestServer(exchange.app)
+    await server.start_server()
+    yield exchange, server
+    await server.close()
+
+
+async def request(wss, method, params=None):
+    await wss.send_str(json.encode({"id": method, "method": method, "params": params or {}}).decode())
+    return json.decode((await wss.receive()).data)
+
+
+@pytest.mark.asyncio
+async def test_public_trades(exchange_server):
+    exchange, server = exchange_server
+    async with ClientSession() as session, session.ws_connect(server.make_url("/ws")) as wss:
+        await wss.send_str('{"method":"SUBSCRIBE","params":["btcusdt@trade"],"id":"subscribe"}')
+        assert json.decode((await wss.receive()).data) == {"result": None, "id": "subscribe"}
+
+        await exchange.send_trade("BTCUSDT", 61000.5)
+        trade = json.decode((await wss.receive()).data)
+        assert trade["e"] == "trade"
+        assert trade["p"] == "61000.50"
+
+
+@pytest.mark.asyncio
+async def test_api_requests(exchange_server):
+    _, server = exchange_server
+    async with ClientSession() as session, session.ws_connect(server.make_url("/ws-api/v3")) as wss:
+        assert (await request(wss, "session.logon", {"apiKey": "key"}))["status"] == 200
+        exchange_info = await request(wss, "exchangeInfo", {"symbols": ["BTCUSDT"]})
+        assert exchange_info["result"]["symbols"][0]["status"] == "TRADING"
+        account = await request(wss, "account.status")
+        assert {b["asset"] for b in account["result"]["balances"]} == {"BTC", "USDT"}
+        assert (await request(wss, "userDataStream.start"))["result"]["listenKey"]
+        assert (await request(wss, "unknown.method"))["status"] == 400
+
+
+@pytest.mark.asyncio
+async def test_order_place_emits_user_stream_events(exchange_server):
+    exchange, server = exchange_server
+    async with ClientSession() as session:
+        async with session.ws_connect(server.make_url("/ws-api/v3")) as api, \
+                session.ws_connect(server.make_url("/ws/listen_key")) as user_stream:
+            await asyncio.sleep(0.01)
+            params = {"symbol": "BTCUSDT", "side": "BUY", "type": "MARKET", "quantity": "0.001"}
+            params["newClientOrderId"] = "c1"
+            response = await request(api, "order.place", params)
+            assert response["result"]["status"] == "FILLED"
+
+            execution_report = json.decode((await user_stream.receive()).data)
+            account_position = json.decode((await user_stream.receive()).data)
+            assert execution_report["e"] == "executionReport"
+            assert execution_report["X"] == "FILLED"
+            assert account_position["e"] == "outboundAccountPosition"
+            assert exchange.balances["BTC"] == pytest.approx(1.001)
+            assert len(exchange.orders) == 1
+            assert execution_report["c"] == "c1"
+
+            status = await request(api, "order.status", {"symbol": "BTCUSDT", "origClientOrderId": "c1"})
+            assert (status["result"]["status"], status["result"]["executedQty"]) == ("FILLED", "0.00100000")
+            missing = await request(api, "order.status", {"symbol": "BTCUSDT", "origClientOrderId": "c2"})
+            assert missing["error"]["code"] == -2013
@@ -0,0 +1,36 @@
+import pytest
+
+from models.fixed import FixedPoint, format_fixed, fraction_digits, parse_fixed
+
+
+@pytest.mark.parametrize(
+    "text, decimals, expected",
+    [("66250.98000000", 2, 6625098), ("0.00123000", 5, 123), ("0.00123999", 5, 123), ("-0.5", 2, -50), ("7", 3, 7000)],
+)
+def test_parse_fixed(text, decimals, expected):
+    assert parse_fixed(text, decimals) == expected
+
+
+def test_format_fixed():
+    assert format_fixed(6625098, 2) == "66250.98"
+    assert format_fixed(100, 5) == "0.00100"
+    assert format_fixed(-5, 2) == "-0.05"
+    assert format_fixed(42, 0) == "42"
+    assert fraction_digits("0.01000000") == 2
+    assert fraction_digits("1.00000000") == 0
+
+
+def test_fixed_point():
+    filters = [{"filterType": "PRICE_FILTER", "tickSize": "0.01000000"}, {"filterType": "LOT_SIZE",
+                                                                         "stepSize": "0.00001000"}]
+    fixed = FixedPoint.from_filters(filters)
+    assert fixed and (fixed.price(66250.98), fixed.quantity(0.001)) == (6625098, 100)
+    assert (fixed.floor_price(1000.0 * (1 - 0.0025)), fixed.ceil_price(1000.0 * (1 + 0.0025))) == (99750, 100250)
+    assert (fixed.floor_price(100.005), fixed.ceil_price(100.005)) == (10000, 10001)
+    # 0.1 + 0.2 quote is exact in notional units (price decimals + 8)
+    assert fixed.notional(10, 1000) + fixed.notional(20, 1000) == fixed.notional(30, 1000)
+    assert fixed.to_quote(fixed.notional(6625098, 100)) == 66.25098
+    assert fixed.commission(0.00000066, 6625098, base_asset=True) == 66 * 6625098
+    assert fixed.commission(0.06625098, 6625098, base_asset=False) == 662509800
+    assert FixedPoint.from_filters([{"filterType": "LOT_SIZE", "stepSize": "0.00001000"}]) is None
+    assert FixedPoint.from_filters(filters[:1] + [{"filterType": "LOT_SIZE", "stepSize": "0.00000000"}]) is None
@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+import pytest
+
+from core.indicators import RollingIndicators
+
+
+def test_running_sums_match_recompute():
+    indicators = RollingIndicators(window=50, bar_ms=1000, bars=3)
+    rng = np.random.default_rng(1)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, 120)))
+    quantities = rng.uniform(0.1, 2.0, 120)
+    for index, (price, quantity) in enumerate(zip(prices, quantities, strict=True)):
+        indicators.update(float(price), float(quantity), 0)
+        if index == 99:  # two recomputes passed, running sums since then
+            break
+
+    window_prices, window_quantities = prices[50:100], quantities[50:100]
+    returns = np.diff(np.log(prices[49:100]))
+    assert indicators.vwap == pytest.approx(np.dot(window_prices, window_quantities) / window_quantities.sum())
+    assert indicators.volatility == pytest.approx(math.sqrt(np.dot(returns, returns)))
+    running = (indicators.notional, indicators.volume, indicators.variance)
+    indicators.recompute()
+    assert (indicators.notional, indicators.volume, indicators.variance) == pytest.approx(running)
+
+
+def test_atr_of_closed_bars():
+    indicators = RollingIndicators(window=10, bar_ms=1000, bars=2)
+    indicators.update(100.0, 1.0, 1000)
+    indicators.update(102.0, 1.0, 1500)
+    assert indicators.atr == 0.0  # bar is not closed
+    indicators.update(99.0, 1.0, 2000, high=103.0, low=98.0)  # conflated trade keeps its range
+    indicators.update(101.0, 1.0, 3100)
+    assert indicators.atr == pytest.approx((2.0 + 5.0) / 2)  # 102 - 100, 103 - 98
+    assert indicators.level_unit("atr", 101.0) == pytest.approx(3.5)
+    indicators.update(101.0, 1.0, 4000)
+    assert indicators.atr == pytest.approx((5.0 + 2.0) / 2)  # 101 - 99 (previous close)
+    indicators.update(101.0, 1.0, 0)  # no trade time (bookTicker), bars are not touched
+    assert indicators.bar_id == 4
+
+
+def test_level_unit_until_warmed_up():
+    indicators = RollingIndicators(window=3, bar_ms=1000, bars=14)
+    indicators.update(100.0, 1.0, 1000)
+    indicators.update(101.0, 1.0, 1100)
+    assert indicators.level_unit("volatility", 101.0) == 0.0
+    indicators.update(100.0, 1.0, 1200)
+    expected = 100.0 * math.sqrt(math.log(101 / 100) ** 2 + math.log(100 / 101) ** 2)
+    assert indicators.level_unit("volatility", 100.0) == pytest.approx(expected)
+    assert indicators.level_unit("atr", 100.0) == 0.0
+    assert indicators.level_unit("percent", 100.0) == 0.0
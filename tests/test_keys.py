@@ -17,3 +17,13 @@ async def test_valid_private_key_loading(pkey):
     client = BinancePrivateWSS("BTCUSD", "api_key", pkey)
     client.load_private_key(pkey)
     assert client.private_key
+
+
+def test_missing_private_key_fails_at_startup():
+    with pytest.raises(Exception):
+        BinancePrivateWSS.new_instance(["BTCUSDT"], "private", "wss://test", "api_key", "")
+
+
+def test_offline_client_without_private_key():
+    client = BinancePrivateWSS.new_instance(["BTCUSDT"], "private", "wss://test", "api_key", "", offline=True)
+    assert client.private_key is None
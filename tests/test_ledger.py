@@ -0,0 +1,117 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from adapters.ledger import LEDGER_DTYPE, RoundTrip, TradeLedger, read_ledger
+from core.timers import TimerQueue
+from core.trader import Trader
+from models import EXIT_REASON, STATUS, Order, Position
+from tools.ledger_report import build_report
+
+
+def round_trip(exit_time, pnl, exit_reason=EXIT_REASON.HOLD_TIME, symbol="BTCUSDT", entry_commission=0.0):
+    return RoundTrip(symbol=symbol, entry_time=exit_time - 60000, exit_time=exit_time, entry_price=100.0,
+                     exit_price=100.0 + pnl, quantity=1.0, commission=0.1, entry_commission=entry_commission,
+                     commission_asset="USDT", pnl=pnl, exit_reason=exit_reason.value, entry_latency=0,
+                     exit_latency=500)
+
+
+def test_rows_sealed_to_columnar_chunks(tmp_path):
+    ledger = TradeLedger(tmp_path, chunk_rows=2)
+    ledger.start()
+    for index in range(5):
+        ledger.append(round_trip(index * 1000, float(index)))
+    ledger.close()
+
+    assert len(list(tmp_path.glob("*.npz"))) == 2
+    assert len(list(tmp_path.glob("*.rows"))) == 1
+    columns = read_ledger(tmp_path, ("exit_time", "pnl"))
+    assert list(columns) == ["exit_time", "pnl"]
+    assert columns["pnl"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_read_ledger_merges_workers_and_skips_torn_record(tmp_path):
+    for worker, exit_times in enumerate(([1000, 3000], [2000])):
+        rows = np.array([round_trip(exit_time, 1.0) for exit_time in exit_times], dtype=LEDGER_DTYPE)
+        (tmp_path / f"worker_{worker}").mkdir()
+        (tmp_path / f"worker_{worker}" / "1.rows").write_bytes(rows.tobytes() + b"\0" * 10)
+
+    assert read_ledger(tmp_path)["exit_time"].tolist() == [1000, 2000, 3000]
+    assert len(read_ledger(tmp_path / "missing")["pnl"]) == 0
+
+
+def test_write_error_not_masked_by_close(tmp_path):
+    file = MagicMock()
+    file.write.side_effect = file.close.side_effect = OSError("No space left on device")
+    ledger = TradeLedger(tmp_path)
+    with patch("adapters.ledger.logger") as logger, patch("pathlib.Path.open", return_value=file), patch(
+        "threading.excepthook"
+    ) as excepthook:
+        ledger.start()
+        ledger.append(round_trip(1000, 1.0))
+        ledger.close()
+
+    file.close.assert_called_once()
+    logger.error.assert_called_once()
+    excepthook.assert_not_called()
+
+
+def test_report():
+    trips = [
+        round_trip(1000, 2.0, EXIT_REASON.TAKE_PROFIT),
+        round_trip(2000, -3.0, EXIT_REASON.STOP_LOSS, symbol="ETHUSDT"),
+        round_trip(3000, -1.0),
+        round_trip(4000, 1.0),
+    ]
+    rows = np.array(trips, dtype=LEDGER_DTYPE)
+    report = build_report({name: rows[name] for name in LEDGER_DTYPE.names})
+
+    assert (report.trades, report.wins, report.win_rate, report.total_pnl) == (4, 2, 0.5, -1.0)
+    assert report.symbols == ["BTCUSDT", "ETHUSDT"]
+    assert (report.gross_profit, report.gross_loss) == (3.0, -4.0)
+    assert report.max_drawdown == 4.0  # 2.0 -> -2.0
+    assert report.avg_hold_time == 60.0
+    assert report.exit_latency["p50"] == 500
+    assert report.entry_latency == {}
+    assert report.exit_reasons["hold_time"].trades == 2
+    assert report.exit_reasons["hold_time"].win_rate == 0.5
+    assert report.exit_reasons["stop_loss"].total_pnl == -3.0
+    assert build_report({name: rows[name][:0] for name in LEDGER_DTYPE.names}).trades == 0
+
+
+def test_report_pnl_net_of_entry_commission():
+    rows = np.array([round_trip(1000, 0.05, entry_commission=0.1), round_trip(2000, 1.0, entry_commission=0.1)],
+                    dtype=LEDGER_DTYPE)
+    report = build_report({name: rows[name] for name in LEDGER_DTYPE.names})
+
+    assert (report.wins, report.total_pnl, report.total_commission) == (1, 0.85, 0.4)
+
+
+@pytest.mark.asyncio
+async def test_trader_records_round_trip():
+    ledger = MagicMock()
+    with patch('core.trader.logger', new_callable=MagicMock) as logger, patch.object(Trader, 'ledger', ledger):
+        logger.ainfo = AsyncMock()
+        trader = Trader(order_client=AsyncMock(), timers=TimerQueue(clock=lambda: 0))
+        trader.state.status, trader.state.base_asset = STATUS.ENTERING_POSITION, "BTC"
+        trader.state.position = Position(amount=0.001)
+        await trader.process_order(
+            Order(event_time=1000, symbol="BTCUSDT", side="BUY", order_type="MARKET", quantity=0.001, price=0.0,
+                  current_order_status="FILLED", last_executed_quantity=0.001, last_executed_price=100.0,
+                  commission_amount=0.000001, commission_asset="BTC", transaction_time=1000)
+        )
+        trader.state.last_price = 111.0
+        await trader.check_position_actions()
+        await trader.process_order(
+            Order(event_time=5000, symbol="BTCUSDT", side="SELL", order_type="MARKET", quantity=0.001, price=0.0,
+                  current_order_status="FILLED", last_executed_quantity=0.001, last_executed_price=111.0,
+                  commission_amount=0.01, commission_asset="USDT", transaction_time=5000)
+        )
+
+    trip = ledger.append.call_args.args[0]
+    assert (trip.entry_time, trip.exit_time, trip.entry_price, trip.exit_price) == (1000, 5000, 100.0, 111.0)
+    assert trip.exit_reason == EXIT_REASON.TAKE_PROFIT.value
+    assert trip.pnl == pytest.approx(0.001)
+    assert trip.entry_commission == pytest.approx(0.0001)  # base asset commission at the fill price
+    assert trader.state.exit_reason == EXIT_REASON.UNKNOWN
@@ -5,12 +5,12 @@ import pytest
 
 
 @pytest.fixture
-def mock_trader_class():
-    with patch('core.trader.Trader', autospec=True) as mock_trader_class:
-        mock_trader_class_instance = mock_trader_class.return_value
-        mock_trader_class_instance.events_processing.return_value = asyncio.Future()
-        mock_trader_class_instance.time_watcher.return_value = asyncio.Future()
-        yield mock_trader_class_instance
+def mock_portfolio_class():
+    with patch('core.portfolio.Portfolio', autospec=True) as mock_portfolio_class:
+        mock_portfolio_instance = mock_portfolio_class.return_value
+        mock_portfolio_instance.events_processing.return_value = asyncio.Future()
+        mock_portfolio_instance.time_watcher.return_value = asyncio.Future()
+        yield mock_portfolio_instance
 
 
 @pytest.fixture
@@ -26,7 +26,7 @@ def mock_private_wss_client():
 
 
 @pytest.mark.asyncio
-async def test_main_creates_tasks(mock_public_wss_client, mock_private_wss_client, mock_trader_class):
+async def test_main_creates_tasks(mock_public_wss_client, mock_private_wss_client, mock_portfolio_class):
     with patch('asyncio.Queue') as mock_queue_class:
         mock_queue = mock_queue_class.return_value
 
@@ -37,5 +37,5 @@ async def test_main_creates_tasks(mock_public_wss_client, mock_private_wss_clien
 
         mock_public_wss_client.assert_called_with(mock_queue)
         mock_private_wss_client.assert_called_with(mock_queue)
-        mock_trader_class.events_processing.assert_called_with(mock_queue)
-        mock_trader_class.time_watcher.assert_called_with()
+        mock_portfolio_class.events_processing.assert_called_with(mock_queue)
+        mock_portfolio_class.time_watcher.assert_called_with()
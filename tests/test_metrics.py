@@ -0,0 +1,73 @@
+import time
+import urllib.request
+
+import pytest
+
+from core.metrics import Histogram, Metrics, metrics, start_metrics_server
+from models import Trade
+
+
+@pytest.mark.parametrize("value", [0, 1, 31, 32, 33, 63, 64, 65, 1000, 123456, 2 ** 39 + 12345])
+def test_histogram_bucket_bounds(value):
+    index = Histogram.bucket(value)
+    assert Histogram.bucket_upper(index) >= value
+    assert Histogram.bucket_upper(index) - value <= value / 32
+    assert index == 0 or Histogram.bucket_upper(index - 1) < value
+
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for value in range(1, 1001):
+        histogram.record(value)
+
+    p50, p90, p99, p999 = histogram.quantiles()
+    assert 500 <= p50 <= 500 * 1.04
+    assert 990 <= p99 <= 1000
+    assert p999 == 1000
+    assert histogram.count == 1000 and histogram.max == 1000
+
+
+def test_pipeline_stages():
+    registry = Metrics()
+    trade = Trade(event_time=int(time.time() * 1000), symbol="BTCUSDT", price=1.0, trade_time=1, quantity=1.0)
+    registry.received("public", trade, time.perf_counter_ns())
+    registry.dequeued(trade)
+    registry.order_sent("BTCUSDT", "BUY")
+    registry.handled()
+    registry.order_filled("BTCUSDT", time.perf_counter_ns())
+    registry.order_sent("BTCUSDT", "SELL")  # time watcher order, no decision latency
+
+    assert trade.received_at
+    assert {stage: histogram.count for stage, histogram in registry.histograms.items()} == {
+        "event_to_receive": 1, "receive_to_dequeue": 1, "dequeue_to_order": 1, "order_to_fill": 1,
+    }
+    assert registry.counters[("orders_total", (("side", "BUY"), ("symbol", "BTCUSDT")))] == 1
+
+
+def test_render_prometheus_text():
+    registry = Metrics()
+    registry.observe("order_to_response", 0, 2_000_000)
+    registry.inc("messages_total", channel="public")
+    registry.inc("messages_total", channel="public")
+    registry.gauge("events_queue_size", lambda: 3)
+    assert registry.mark("ready") and not registry.mark("ready")
+
+    text = registry.render()
+    assert 'btb_stage_latency_microseconds{stage="order_to_response",quantile="0.99"} 2000' in text
+    assert 'btb_stage_latency_microseconds_count{stage="order_to_response"} 1' in text
+    assert text.count("# TYPE btb_messages_total counter") == 1
+    assert 'btb_messages_total{channel="public"} 2' in text
+    assert "btb_events_queue_size 3" in text
+    assert f'btb_startup_milliseconds{{stage="ready"}} {registry.startup["ready"]}' in text
+
+
+def test_metrics_server():
+    server = start_metrics_server(0)
+    try:
+        metrics.inc("test_scrapes_total")
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert "btb_test_scrapes_total 1" in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
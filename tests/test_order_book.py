@@ -0,0 +1,79 @@
+import asyncio
+import math
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.order_book import BookSide, OrderBook, OrderBooks
+from models import DepthUpdate
+
+SNAPSHOT = {
+    "lastUpdateId": 10,
+    "bids": [["99.00", "1.0"], ["100.00", "0.5"]],
+    "asks": [["101.00", "0.5"], ["102.00", "2.0"]],
+}
+
+
+def depth_update(first, final, bids=(), asks=()):
+    return DepthUpdate(event_time=0, symbol="BTCUSDT", first_update_id=first, final_update_id=final, bids=list(bids),
+                       asks=list(asks))
+
+
+def test_book_side_levels_sorted_from_best():
+    bids = BookSide(-1)
+    for price, quantity in ((100.0, 1.0), (102.0, 1.0), (101.0, 2.0), (102.0, 0.0), (99.0, 0.0)):
+        bids.update(price, quantity)
+    assert bids.best() == 101.0
+    assert bids.quantities == [2.0, 1.0]
+    assert bids.fill_price(3.0) == pytest.approx((101.0 * 2 + 100.0) / 3)
+    assert bids.fill_price(3.5) == 0.0  # too thin
+
+
+def test_snapshot_continued_by_buffered_diffs():
+    book = OrderBook("BTCUSDT")
+    assert not book.apply(depth_update(5, 9, asks=[(101.0, 9.0)]))  # older than the snapshot
+    assert not book.apply(depth_update(10, 12, asks=[(101.0, 1.0)]))
+    assert book.load_snapshot(SNAPSHOT)
+    assert (book.update_id, book.asks.quantities[0], book.bids.best()) == (12, 1.0, 100.0)
+
+    assert book.apply(depth_update(11, 12, asks=[(101.0, 5.0)]))  # already applied (redundant connection)
+    assert book.asks.quantities[0] == 1.0
+    assert book.fill_price("BUY", 2.0) == pytest.approx((101.0 + 102.0) / 2)
+    assert book.slippage("BUY", 2.0) == pytest.approx(0.5 / 101.0 * 100)
+    assert book.slippage("SELL", 2.0) == math.inf
+
+
+def test_gap_drops_book_until_snapshot():
+    book = OrderBook("BTCUSDT")
+    book.load_snapshot(SNAPSHOT)
+    assert not book.apply(depth_update(12, 13))
+    assert not book.synced
+    assert book.fill_price("BUY", 0.1) == 0.0
+    assert not book.load_snapshot(SNAPSHOT)  # still behind the buffered diff
+    assert list(book.pending) == [depth_update(12, 13)]
+
+
+@pytest.mark.asyncio
+async def test_books_request_snapshot_once():
+    responses = [ConnectionError("WebSocket connection lost"), SNAPSHOT]
+
+    async def snapshot(symbol):
+        await asyncio.sleep(0)
+        if isinstance(response := responses.pop(0), Exception):
+            raise response
+        return response
+
+    books = OrderBooks(["BTCUSDT"], snapshot)
+    with patch("core.order_book.logger", new_callable=MagicMock) as logger:
+        logger.awarning = AsyncMock()
+        books.apply(depth_update(9, 11))
+        books.apply(depth_update(12, 12))
+        await books.syncing["BTCUSDT"]
+        assert logger.awarning.await_count == 1
+        assert books.synced("BTCUSDT") == 0
+
+        books.apply(depth_update(13, 13))  # the failed sync is retried on the next diff
+        await books.syncing["BTCUSDT"]
+    assert not responses
+    assert books.get("BTCUSDT").update_id == 13
+    assert books.synced("BTCUSDT") == 1
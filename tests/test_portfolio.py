@@ -0,0 +1,75 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.portfolio import Portfolio
+from models import Trade
+
+
+@pytest.fixture
+def mock_async_logger():
+    logger = MagicMock()
+    for method_name in ['debug', 'info', 'warning', 'error', 'adebug', 'ainfo', 'awarning', 'aerror']:
+        setattr(logger, method_name, AsyncMock())
+    with patch('core.trader.logger', new_callable=lambda: logger):
+        yield logger
+
+
+@pytest.fixture
+def portfolio(mock_async_logger):
+    return Portfolio(["BTCUSDT", "ETHUSDT"], order_client=AsyncMock())
+
+
+def make_trade(symbol, price):
+    return Trade(event_time=1713797829314, symbol=symbol, price=price, trade_time=1713797829314, quantity=0.001)
+
+
+@pytest.mark.asyncio
+async def test_trade_routed_by_symbol(portfolio):
+    await portfolio.handle_message(make_trade("ETHUSDT", 3000.0))
+    assert portfolio.traders["ETHUSDT"].state.last_price == 3000.0
+    assert portfolio.traders["BTCUSDT"].state.last_price == 0.0
+
+
+@pytest.mark.asyncio
+async def test_unknown_symbol_ignored(portfolio):
+    await portfolio.handle_message(make_trade("BNBUSDT", 500.0))
+    assert all(trader.state.last_price == 0.0 for trader in portfolio.traders.values())
+
+
+@pytest.mark.asyncio
+async def test_recent_trades_routed_by_symbol(portfolio):
+    message = {"id": "trades_recent_ethusdt_1", "status": 200, "result": [{"price": "3000.5"}],
+               "channel": "private_trades_recent", "symbol": "ETHUSDT"}
+    await portfolio.handle_message(message)
+    assert portfolio.traders["ETHUSDT"].state.last_price == 3000.5
+    assert portfolio.traders["BTCUSDT"].state.last_price == 0.0
+
+
+@pytest.mark.asyncio
+async def test_account_messages_broadcast_with_shared_balances(portfolio):
+    symbols = [
+        {"symbol": symbol, "status": "TRADING", "baseAsset": symbol[:3], "quoteAsset": "USDT",
+         "filters": [{"filterType": "LOT_SIZE", "minQty": "0.00001"}]}
+        for symbol in ("BTCUSDT", "ETHUSDT")
+    ]
+    await portfolio.handle_message({"id": "exchangeinfo_1", "channel": "private_exchangeinfo",
+                                    "result": {"symbols": symbols}})
+    await portfolio.handle_message({"channel": "user_stream", "event": "connected"})
+    await portfolio.handle_message({
+        "id": "account_status_1", "status": 200, "channel": "private_account_status",
+        "result": {"balances": [{"asset": asset, "free": "100.0", "locked": "0.0"} for asset in ("BTC", "ETH", "USDT")]},
+    })
+    for trader in portfolio.traders.values():
+        assert trader.state.symbols_ready
+        assert trader.state.stream_ready
+        assert trader.state.balance_ready
+        assert trader.state.balances is portfolio.balances
+    assert portfolio.balances.USDT.free == 100.0
+
+
+@pytest.mark.asyncio
+async def test_account_message_logged_with_trader_symbol(portfolio, mock_async_logger):
+    await portfolio.handle_message({"e": "outboundAccountPosition", "E": 1, "u": 1, "B": []})
+    symbols = [call.kwargs["symbol"] for call in mock_async_logger.info.call_args_list]
+    assert symbols == ["BTCUSDT", "ETHUSDT"]
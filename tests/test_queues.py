@@ -0,0 +1,149 @@
+import math
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.queues import ConflatingQueue, PriorityLanesQueue
+from core.trader import Trader
+from models import STATUS, Position, Trade
+
+
+def make_trade(price, symbol="BTCUSDT", event_time=1):
+    return Trade(event_time=event_time, symbol=symbol, price=price, trade_time=event_time, quantity=0.001)
+
+
+@pytest.mark.asyncio
+async def test_pending_trades_collapse_to_newest():
+    queue = ConflatingQueue()
+    for index, price in enumerate((100.0, 105.0, 95.0, 101.0)):
+        queue.put_nowait(make_trade(price, event_time=index))
+
+    assert queue.qsize() == 1
+    assert queue.conflated == 3
+    trade = await queue.get()
+    assert (trade.price, trade.event_time, trade.high_price, trade.low_price) == (101.0, 3, 105.0, 95.0)
+
+
+@pytest.mark.asyncio
+async def test_symbols_are_conflated_separately():
+    queue = ConflatingQueue()
+    queue.put_nowait(make_trade(100.0))
+    queue.put_nowait(make_trade(10.0, symbol="ETHUSDT"))
+    queue.put_nowait(make_trade(101.0))
+
+    assert [(await queue.get()).price for _ in range(queue.qsize())] == [101.0, 10.0]
+
+
+@pytest.mark.asyncio
+async def test_other_events_are_barriers():
+    queue = ConflatingQueue()
+    order = {"e": "executionReport", "s": "BTCUSDT"}
+    queue.put_nowait(make_trade(100.0))
+    queue.put_nowait(order)
+    queue.put_nowait(make_trade(101.0))
+    queue.put_nowait(make_trade(102.0))
+
+    assert (await queue.get()).price == 100.0
+    assert await queue.get() is order
+    assert (await queue.get()).price == 102.0
+    assert queue.conflated == 1
+
+
+@pytest.mark.asyncio
+async def test_consumed_trade_is_not_updated():
+    queue = ConflatingQueue()
+    queue.put_nowait(make_trade(100.0))
+    trade = await queue.get()
+    queue.put_nowait(make_trade(90.0))
+
+    assert trade.price == 100.0 and trade.low_price == math.inf
+    assert queue.qsize() == 1
+
+
+@pytest.mark.asyncio
+async def test_trader_stop_loss_on_conflated_low():
+    with patch('core.trader.logger', new_callable=MagicMock) as logger:
+        logger.ainfo = AsyncMock()
+        order_client = AsyncMock()
+        trader = Trader(order_client=order_client)
+        trader.state.status = STATUS.IN_POSITION
+        trader.state.position = Position(price=100.0, amount=0.001, sl_price=99.0, tp_price=101.0)
+
+        queue = ConflatingQueue()
+        for price in (100.0, 98.5, 100.2):
+            queue.put_nowait(make_trade(price))
+        await trader.handle_message(await queue.get())
+
+    assert trader.state.last_price == 100.2
+    assert trader.state.status == STATUS.CLOSING_POSITION
+    order_client.order_place.assert_awaited_once_with(
+        side="SELL", quantity=0.001, symbol="BTCUSDT", client_order_id=ANY
+    )
+
+
+@pytest.mark.asyncio
+async def test_priority_lanes_drain_high_lane_first():
+    queue = PriorityLanesQueue()
+    order = {"e": "executionReport", "s": "BTCUSDT"}
+    balances = {"e": "outboundAccountPosition"}
+    queue.put_nowait(make_trade(100.0))
+    queue.put_nowait(order)
+    queue.put_nowait(make_trade(101.0))
+    queue.put_nowait(balances)
+
+    assert queue.qsize() == 4
+    assert [await queue.get() for _ in range(2)] == [order, balances]
+    assert [(await queue.get()).price for _ in range(2)] == [100.0, 101.0]
+    assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_priority_lanes_conflation():
+    queue = PriorityLanesQueue(conflation=True)
+    queue.put_nowait(make_trade(100.0))
+    queue.put_nowait(make_trade(101.0))
+    queue.put_nowait({"e": "executionReport", "s": "BTCUSDT"})
+    queue.put_nowait(make_trade(99.0))
+    queue.put_nowait(make_trade(98.0))
+
+    assert queue.qsize() == 3
+    assert "e" in await queue.get()
+    before, after = await queue.get(), await queue.get()
+    assert (before.price, before.high_price) == (101.0, 101.0)
+    assert (after.price, after.high_price, after.low_price, queue.conflated) == (98.0, 99.0, 98.0, 2)
+
+
+@pytest.mark.asyncio
+async def test_trader_no_false_take_profit_after_fill():
+    """Trades before the fill are not merged with the trades after it, their high price can't reach the TP"""
+    queue = PriorityLanesQueue(conflation=True)
+    queue.put_nowait(make_trade(102.0, event_time=9))
+    queue.put_nowait({"e": "executionReport", "s": "BTCUSDT"})
+    queue.put_nowait(make_trade(100.5, event_time=11))
+    queue.put_nowait(make_trade(100.2, event_time=12))
+    await queue.get()
+
+    with patch('core.trader.logger', new_callable=MagicMock):
+        order_client = AsyncMock()
+        trader = Trader(order_client=order_client)
+        trader.state.status = STATUS.IN_POSITION
+        trader.state.position = Position(price=100.0, position_time=10, amount=0.001, sl_price=99.0, tp_price=101.0)
+        while not queue.empty():
+            await trader.handle_message(await queue.get())
+
+    assert trader.state.status == STATUS.IN_POSITION
+    order_client.order_place.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_trader_ignores_trades_before_fill():
+    with patch('core.trader.logger', new_callable=MagicMock):
+        order_client = AsyncMock()
+        trader = Trader(order_client=order_client)
+        trader.state.status = STATUS.IN_POSITION
+        trader.state.position = Position(price=100.0, position_time=10, amount=0.001, sl_price=99.0, tp_price=101.0)
+
+        await trader.handle_message(make_trade(98.0, event_time=9))
+
+    assert trader.state.status == STATUS.IN_POSITION
+    order_client.order_place.assert_not_awaited()
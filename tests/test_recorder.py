@@ -0,0 +1,78 @@
+from unittest.mock import patch
+
+from adapters.recorder import FRAME_HEADER, FrameReader, FrameRecorder
+from core.backtester import load_trades
+
+TRADE_FRAME = '{"e":"trade","E":1713797829314,"s":"BTCUSDT","t":1,"p":"66197.57","q":"0.001","T":1713797829314}'
+
+
+def record_frames(path, frames, **kwargs):
+    recorder = FrameRecorder(path, **kwargs)
+    recorder.start()
+    for channel, data in frames:
+        recorder.record(channel, data)
+    recorder.close()
+    return recorder
+
+
+def test_record_and_read_frames(tmp_path):
+    recorder = record_frames(tmp_path, [("public", TRADE_FRAME), ("user_stream", b'{"e":"unknown"}')])
+    assert recorder.frames_count == 2
+
+    frames = list(FrameReader(tmp_path))
+    assert [frame.channel for frame in frames] == ["public", "user_stream"]
+    assert bytes(frames[0].data) == TRADE_FRAME.encode()
+    assert isinstance(frames[0].data, memoryview)
+    assert frames[0].received_at <= frames[1].received_at
+
+
+def test_segments_rotation(tmp_path):
+    record_frames(tmp_path, [("public", TRADE_FRAME)] * 10, segment_size=100, buffer_size=1)
+    assert len(list(tmp_path.glob("*.seg"))) > 1
+    assert len(list(FrameReader(tmp_path))) == 10
+
+
+def test_write_error_not_masked_by_final_flush(tmp_path):
+    with patch("adapters.recorder.logger") as logger, patch.object(
+        FrameRecorder, "flush", side_effect=OSError("No space left on device")
+    ) as flush:
+        record_frames(tmp_path, [("public", TRADE_FRAME)] * 2, buffer_size=1)
+
+    flush.assert_called_once()
+    logger.error.assert_called_once()
+    assert logger.error.call_args.kwargs["exc_info"]
+
+
+def test_read_truncated_segment(tmp_path):
+    record_frames(tmp_path, [("public", TRADE_FRAME)] * 2)
+    segment = next(tmp_path.glob("*.seg"))
+    segment.write_bytes(segment.read_bytes()[: -FRAME_HEADER.size])
+    assert len(list(FrameReader(segment))) == 1
+
+
+def test_load_recorded_trades(tmp_path):
+    record_frames(tmp_path, [("public", TRADE_FRAME), ("public", '{"result":null,"id":"subscribe"}')])
+    trades = list(load_trades(tmp_path, "BTCUSDT"))
+    assert len(trades) == 1
+    assert trades[0].price == 66197.57
+
+
+def test_load_recorded_book_ticker(tmp_path):
+    record_frames(tmp_path, [("public", '{"u":5,"s":"BTCUSDT","b":"66197.57","B":"1.0","a":"66197.58","A":"2.0"}')])
+    trade = next(load_trades(tmp_path, "BTCUSDT"))
+    assert trade.price == 66197.57
+    assert trade.trade_time == next(iter(FrameReader(tmp_path))).received_at // 1_000_000  # receive time as the clock
+
+
+def test_record_redundant_and_depth_channels(tmp_path):
+    record_frames(tmp_path, [("public_1", TRADE_FRAME), ("public_12", TRADE_FRAME), ("depth", b'{"e":"depthUpdate"}')])
+    assert [frame.channel for frame in FrameReader(tmp_path)] == ["public_1", "public_12", "depth"]
+
+
+def test_load_recorded_trades_from_redundant_connections(tmp_path):
+    second = TRADE_FRAME.replace('"t":1', '"t":2').replace("66197.57", "66198.00")
+    frames = [("public_1", TRADE_FRAME), ("public", TRADE_FRAME), ("public_1", second), ("depth", second)]
+    record_frames(tmp_path, frames)
+    trades = list(load_trades(tmp_path, "BTCUSDT"))
+    assert [trade.trade_id for trade in trades] == [1, 2]  # duplicates and depth frames are skipped
+    assert trades[1].price == 66198.00
@@ -0,0 +1,138 @@
+import sqlite3
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from adapters.binance_wss import RequestError
+from adapters.state_store import StateStore
+from core.timers import TimerQueue
+from core.trader import ORDER_RETRY_DELAY, Trader
+from models import STATUS, Order, Position
+from models.state import StateSnapshot
+from settings import settings
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(tmp_path / "state.db", flush_interval=0.05)
+    store.start()
+    yield store
+    store.close()
+
+
+def test_snapshots_written_behind_and_coalesced(tmp_path, store):
+    for total_pnl in (1.0, 2.0, 3.0):
+        store.save("BTCUSDT", StateSnapshot(status=STATUS.SLEEPING.value, sleeping_at=1000, total_pnl=total_pnl))
+    store.save("ETHUSDT", StateSnapshot(status=STATUS.IN_POSITION.value, position=Position(price=3000.0)))
+    store.close()
+
+    assert store.commits_count == 1
+    assert store.load("BTCUSDT") == StateSnapshot(status=STATUS.SLEEPING.value, sleeping_at=1000, total_pnl=3.0)
+    assert store.load("ETHUSDT").position.price == 3000.0
+    assert store.load("BNBUSDT") is None
+    with sqlite3.connect(tmp_path / "state.db") as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_write_error_not_masked_by_final_flush(tmp_path):
+    store = StateStore(tmp_path / "state.db", flush_interval=0)
+    with patch("adapters.state_store.logger") as logger, patch.object(
+        StateStore, "flush", side_effect=sqlite3.OperationalError("disk I/O error")
+    ) as flush:
+        store.start()
+        store.save("BTCUSDT", StateSnapshot(status=STATUS.SLEEPING.value))
+        store.close()
+
+    flush.assert_called_once()
+    logger.error.assert_called_once()
+    assert logger.error.call_args.kwargs["exc_info"]
+
+
+@pytest.fixture
+def mock_logger(store):
+    with patch('core.trader.logger', new_callable=MagicMock) as logger, patch.object(Trader, 'store', store):
+        logger.ainfo = AsyncMock()
+        yield logger
+
+
+def make_trader(clock=lambda: 0):
+    return Trader(order_client=AsyncMock(), clock=clock, timers=TimerQueue(clock))
+
+
+@pytest.mark.asyncio
+async def test_position_saved_and_restored(store, mock_logger):
+    trader = make_trader()
+    trader.state.status = STATUS.ENTERING_POSITION
+    trader.state.position = Position(amount=0.001)
+    trader.state.total_pnl = 1.5
+    await trader.process_order(
+        Order(event_time=1000, symbol="BTCUSDT", side="BUY", order_type="MARKET", quantity=0.001, price=0.0,
+              current_order_status="FILLED", last_executed_quantity=0.001, last_executed_price=100.0,
+              commission_amount=0.0, commission_asset="USDT", transaction_time=1000)
+    )
+    store.close()
+
+    restored = make_trader()
+    assert restored.state.status == STATUS.IN_POSITION
+    assert restored.state.position == trader.state.position
+    assert restored.state.total_pnl == 1.5
+    assert restored.timers.next_deadline() == 1000 + settings.POSITION_HOLD_TIME * 1000
+
+
+@pytest.mark.asyncio
+async def test_restored_sleep_delays_ready(store, mock_logger):
+    store.save("BTCUSDT", StateSnapshot(status=STATUS.SLEEPING.value, sleeping_at=5000))
+    store.close()
+
+    now = [4.0]
+    trader = make_trader(clock=lambda: now[0])
+    trader.state.last_price = 100.0
+    trader.state.stream_ready = trader.state.balance_ready = trader.state.symbols_ready = True
+    await trader.check_state()
+    assert trader.state.status == STATUS.INITIAL
+
+    now[0] = 5.0
+    await trader.check_state()
+    assert trader.state.status == STATUS.READY
+
+
+@pytest.mark.asyncio
+async def test_order_in_flight_restored_and_reconciled(store, mock_logger):
+    trader = make_trader()
+    trader.state.status = STATUS.ENTERING_POSITION
+    trader.state.position = Position(amount=0.001)
+    await trader.place_order("BUY", 0.001)
+    client_order_id = trader.order_client.order_place.call_args.kwargs["client_order_id"]
+    store.close()
+
+    restored = make_trader()
+    assert restored.state.status == STATUS.ENTERING_POSITION
+    assert restored.state.pending_order.client_order_id == client_order_id
+    restored.order_client.order_status.return_value = {
+        "status": "FILLED", "origQty": "0.00100000", "executedQty": "0.00100000", "cummulativeQuoteQty": "0.10000000",
+        "updateTime": 500,
+    }
+    await restored.timers.run_due(ORDER_RETRY_DELAY)
+
+    restored.order_client.order_status.assert_awaited_once_with("BTCUSDT", client_order_id)
+    assert restored.state.status == STATUS.IN_POSITION
+    assert restored.state.position.price == pytest.approx(100.0)
+    assert restored.state.pending_order is None
+
+
+@pytest.mark.asyncio
+async def test_close_order_not_found_after_restart_is_retried(store, mock_logger):
+    trader = make_trader()
+    trader.state.status = STATUS.CLOSING_POSITION
+    trader.state.position = Position(price=100.0, amount=0.001, position_time=0)
+    await trader.place_order("SELL", 0.001)
+    store.close()
+
+    restored = make_trader()
+    assert restored.state.status == STATUS.CLOSING_POSITION
+    restored.order_client.order_status.side_effect = RequestError("order.status", 400, -2013, "Order does not exist.")
+    await restored.timers.run_due(ORDER_RETRY_DELAY)
+
+    assert restored.state.status == STATUS.IN_POSITION
+    assert restored.state.pending_order is None
+    assert restored.hold_timer is not None
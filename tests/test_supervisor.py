@@ -0,0 +1,109 @@
+import multiprocessing
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from adapters.binance_wss import BinancePrivateWSS
+from core.supervisor import ACCOUNT_METHODS, Supervisor, split_symbols
+from core.trader import Trader
+from models import AccountPosition, BalanceUpdate, Order
+from models.state import SharedBalances
+
+
+def read_balance(balances, asset, results):
+    balance = getattr(balances, asset)
+    results.put((balance.free, balance.locked))
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = Supervisor(["BTCUSDT", "ETHUSDT", "BNBUSDT"], workers=2)
+    yield supervisor
+    for queue in supervisor.queues:
+        queue.close()
+        queue.cancel_join_thread()
+
+
+def make_order(symbol):
+    return Order(event_time=1, symbol=symbol, side="BUY", order_type="MARKET", quantity=0.001, price=0.0,
+                 current_order_status="FILLED", last_executed_quantity=0.001, last_executed_price=60000.0,
+                 commission_amount=0.0, commission_asset="USDT", transaction_time=1)
+
+
+def test_split_symbols():
+    assert split_symbols(["A", "B", "C"], 2) == [["A", "C"], ["B"]]
+    assert split_symbols(["A"], 4) == [["A"]]
+
+
+def test_shared_balances_reader_view():
+    balances = SharedBalances()
+    reader = balances.reader()
+    balances.update_balance("USDT", 100.0, 1.0)
+    balances.update_balance("BTC", 0.5, 0.0)
+    balances.update_balance("USDT", 90.0, 0.0)
+
+    assert reader.USDT.free == 90.0
+    assert reader.BTC.free == 0.5
+    assert reader.ETH is None
+
+    reader.update_balance("USDT", 0.0, 0.0)  # only the owner writes
+    assert balances.USDT.free == 90.0
+
+
+def test_shared_balances_in_worker_process():
+    context = multiprocessing.get_context("spawn")
+    balances = SharedBalances()
+    balances.update_balance("USDT", 1234.5, 0.5)
+    results = context.Queue()
+
+    process = context.Process(target=read_balance, args=(balances.reader(), "USDT", results))
+    process.start()
+    process.join(timeout=30)
+
+    assert results.get(timeout=1) == (1234.5, 0.5)
+
+
+@pytest.mark.asyncio
+async def test_orders_routed_to_symbol_worker(supervisor):
+    await supervisor.handle_message(make_order("BNBUSDT"))
+    assert supervisor.queues[0].get(timeout=1).symbol == "BNBUSDT"
+    assert supervisor.queues[1].empty()
+
+
+@pytest.mark.asyncio
+async def test_account_messages_update_shared_balances(supervisor):
+    message = {"id": "account_status_1", "status": 200, "channel": "private_account_status",
+               "result": {"balances": [{"asset": "USDT", "free": "1000.0", "locked": "0.0"}]}}
+    await supervisor.handle_message(message)
+    assert supervisor.balances.USDT.free == 1000.0
+    assert all(queue.get(timeout=1)["channel"] == "private_account_status" for queue in supervisor.queues)
+
+    await supervisor.handle_message(
+        AccountPosition(event_time=2, balances=[BalanceUpdate(asset="USDT", free=940.0, locked=0.0)])
+    )
+    assert supervisor.balances.reader().USDT.free == 940.0
+
+
+@pytest.mark.asyncio
+async def test_worker_trader_reads_shared_balances(supervisor):
+    with patch('core.trader.logger', new_callable=MagicMock):
+        trader = Trader(order_client=AsyncMock(), balances=supervisor.balances.reader())
+        trader.state.base_asset, trader.state.quote_asset = "BTC", "USDT"
+        supervisor.balances.update_balance("USDT", 500.0, 0.0)
+        supervisor.balances.update_balance("BTC", 0.0, 0.0)
+
+        trader.parse_and_update_balances({"balances": [{"asset": "USDT", "free": "1.0", "locked": "0.0"}]})
+
+    assert trader.state.balance_ready
+    assert trader.state.balances.USDT.free == 500.0
+
+
+@pytest.mark.asyncio
+async def test_startup_methods(pkey):
+    client = BinancePrivateWSS(symbols=["BTCUSDT"], channel="private", url="", api_key="key",
+                               private_key_base64=pkey)
+    client.wss_client = MagicMock()
+    with patch.object(client, 'send_json', new_callable=AsyncMock) as send_json, \
+            patch.object(client, 'startup_methods', ACCOUNT_METHODS):
+        await client.after_connect()
+    assert [call.args[0]["method"] for call in send_json.call_args_list] == list(ACCOUNT_METHODS)
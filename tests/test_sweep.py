@@ -0,0 +1,113 @@
+import argparse
+import random
+from unittest.mock import patch
+
+import pytest
+
+from core.backtester import load_trades
+from models import Trade
+from settings import settings
+from tools.sweep import (
+    SweepPoint,
+    grid_points,
+    init_worker,
+    parse_values,
+    replay_point,
+    run_point,
+    scan_point,
+    share_trades,
+    sweep,
+    worker,
+)
+
+
+def sweep_args(**kwargs):
+    defaults = dict(symbol="BTCUSDT", quantity=0.001, sl="0.25", tp="0.25", hold="60", sleep="30", samples=0, seed=0,
+                    balance=10000.0, commission=0.001, latency=0, workers=1, sort="total_pnl", loglevel="WARNING",
+                    exact=False, check=1)
+    return argparse.Namespace(**{**defaults, **kwargs})
+
+
+def worker_settings():
+    restored = ("SYMBOL", "POSITION_QUANTITY", "LOGLEVEL", "POSITION_SL_PERCENT", "POSITION_TP_PERCENT",
+                "POSITION_HOLD_TIME", "POSITION_SLEEP_TIME")
+    return patch.multiple(settings, **{name: getattr(settings, name) for name in restored})
+
+
+@pytest.fixture
+def trades_csv(tmp_path):
+    """Price oscillates +-0.5% every 10 seconds for 10 minutes"""
+    start, rows = 1713744000000, ["id,price,qty,quote_qty,time,is_buyer_maker,is_best_match"]
+    for index in range(600):
+        price = 60000.0 * (1 + 0.005 * ((index // 10) % 3 - 1))
+        rows.append(f"{index + 1},{price:.2f},0.001,60.0,{start + index * 1000},True,True")
+    path = tmp_path / "BTCUSDT-trades.csv"
+    path.write_text("\n".join(rows) + "\n")
+    return path
+
+
+def test_parse_values():
+    assert parse_values("0.1,0.25", float) == [0.1, 0.25]
+    assert parse_values("0.1:0.5:0.1", float) == [0.1, 0.2, 0.3, 0.4, 0.5]
+    assert parse_values("30:90:30", int) == [30, 60, 90]
+
+
+def test_grid_points():
+    points = grid_points(sweep_args(sl="0.1,0.2", tp="0.1:0.3:0.1", hold="60", sleep="10,20"))
+    assert len(points) == 12
+    assert SweepPoint(sl=0.2, tp=0.3, hold=60, sleep=20) in points
+    sample = grid_points(sweep_args(sl="0.1,0.2", tp="0.1:0.3:0.1", sleep="10,20", samples=5, seed=1))
+    assert len(set(sample)) == 5 and set(sample) <= set(points)
+    assert sample == grid_points(sweep_args(sl="0.1,0.2", tp="0.1:0.3:0.1", sleep="10,20", samples=5, seed=1))
+
+
+def test_sweep_in_worker_processes(trades_csv):
+    args = sweep_args(sl="0.25,1.0", tp="0.25,1.0", hold="30")
+    buffer, count = share_trades(load_trades(trades_csv, "BTCUSDT"))
+    assert count == 600
+
+    results = sweep(buffer, count, grid_points(args), args)
+    assert [result.total_pnl for result in results] == sorted((result.total_pnl for result in results), reverse=True)
+    assert {(result.sl, result.tp) for result in results} == {(0.25, 0.25), (0.25, 1.0), (1.0, 0.25), (1.0, 1.0)}
+
+    with worker_settings():
+        init_worker(buffer, count, args)
+        expected = run_point(SweepPoint(sl=1.0, tp=0.25, hold=30, sleep=30))  # same point in this process
+    result = next(result for result in results if (result.sl, result.tp) == (1.0, 0.25))
+    assert expected.round_trips > 0 and expected.total_tp_trades > 0
+    assert (result.round_trips, result.total_pnl) == (expected.round_trips, expected.total_pnl)
+
+
+def random_walk(count, seed):
+    """Trades with repeated milliseconds (fill and the previous trade at the same time)"""
+    rng, trades, trade_time, price = random.Random(seed), [], 1713744000000, 60000.0
+    for index in range(count):
+        trade_time += rng.choice((0, 0, 1, 50, 300))
+        price = round(price * (1 + rng.gauss(0, 0.0005)), 2)
+        trades.append(Trade(event_time=trade_time, symbol="BTCUSDT", price=price, trade_time=trade_time,
+                            quantity=0.001, trade_id=index + 1))
+    return trades
+
+
+@pytest.mark.parametrize("latency", [0, 40])
+def test_scan_equals_per_event_replay(latency):
+    args = sweep_args(latency=latency, loglevel="CRITICAL")
+    buffer, count = share_trades(random_walk(5000, seed=latency))
+    points = [SweepPoint(sl=sl, tp=tp, hold=hold, sleep=sleep)
+              for sl, tp, hold, sleep in ((0.05, 0.05, 5, 1), (0.1, 0.02, 0, 0), (0.02, 0.1, 1, 0), (0.3, 0.3, 60, 10))]
+    with worker_settings(), patch('tools.sweep.setup_logging'):
+        init_worker(buffer, count, args)
+        for point in points:
+            scanned = scan_point(worker["times"], worker["prices"], point, args)
+            replayed = replay_point(point)
+            assert replayed.round_trips > 0
+            assert (scanned.round_trips, scanned.total_tp_trades, scanned.total_pnl, scanned.quote_balance) == (
+                replayed.round_trips, replayed.total_tp_trades, replayed.total_pnl, replayed.quote_balance)
+
+
+def test_scan_falls_back_on_balance_check(trades_csv):
+    args = sweep_args(balance=1.0)
+    buffer, count = share_trades(load_trades(trades_csv, "BTCUSDT"))
+    with worker_settings(), patch('tools.sweep.setup_logging'):
+        init_worker(buffer, count, args)
+        assert scan_point(worker["times"], worker["prices"], SweepPoint(sl=1.0, tp=1.0, hold=30, sleep=30), args) is None
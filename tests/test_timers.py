@@ -0,0 +1,148 @@
+import asyncio
+import time
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
+
+import pytest
+import structlog
+
+from core.portfolio import Portfolio
+from core.timers import TimerQueue
+from core.trader import Trader
+from models import STATUS, Order, Position
+from settings import settings
+
+
+def recorder(fired, name):
+    async def callback():
+        fired.append(name)
+    return callback
+
+
+def filled_order(side, transaction_time, price=100.0):
+    return Order(event_time=transaction_time, symbol="BTCUSDT", side=side, order_type="MARKET", quantity=0.001,
+                 price=0.0, current_order_status="FILLED", last_executed_quantity=0.001, last_executed_price=price,
+                 commission_amount=0.0, commission_asset="USDT", transaction_time=transaction_time)
+
+
+@pytest.mark.asyncio
+async def test_run_due_in_deadline_order():
+    fired = []
+    timers = TimerQueue()
+    timers.schedule(300, recorder(fired, "c"))
+    timers.schedule(100, recorder(fired, "a"))
+    timers.schedule(200, recorder(fired, "b"))
+    cancelled = timers.schedule(150, recorder(fired, "cancelled"))
+    cancelled.cancel()
+
+    assert not timers.due(99)
+    await timers.run_due(200)
+    assert fired == ["a", "b"]
+    assert timers.next_deadline() == 300
+
+
+@pytest.mark.asyncio
+async def test_run_wakes_at_deadline():
+    fired = []
+    timers = TimerQueue()
+    task = asyncio.create_task(timers.run())
+    await asyncio.sleep(0)
+
+    started = time.time()
+    timers.schedule(started * 1000 + 500, recorder(fired, "late"))
+    timers.schedule(started * 1000 + 50, recorder(fired, "early"))  # earlier timer wakes the sleeping task
+    await asyncio.sleep(0.2)
+    assert fired == ["early"]
+
+    task.cancel()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_failed_callback_does_not_stop_timers():
+    fired = []
+
+    async def failing():
+        raise ConnectionError("send failed")
+
+    timers = TimerQueue()
+    timers.schedule(100, failing, symbol="BTCUSDT")
+    timers.schedule(200, recorder(fired, "next"))
+    with patch("core.timers.logger") as logger:
+        await timers.run_due(200)
+    assert fired == ["next"]
+    logger.exception.assert_called_once_with("Timer callback failed", channel="trader", symbol="BTCUSDT")
+
+
+@pytest.mark.asyncio
+async def test_timers_task_binds_timer_symbol():
+    symbols = []
+
+    async def callback():
+        symbols.append(structlog.contextvars.get_contextvars().get("symbol"))
+
+    timers = TimerQueue()
+    structlog.contextvars.bind_contextvars(symbol="BTCUSDT,ETHUSDT")  # process wide binding (see worker_main)
+    timers.schedule(100, callback, symbol="BTCUSDT")
+    await asyncio.create_task(timers.run_due(100))
+    assert symbols == ["BTCUSDT"]
+    structlog.contextvars.clear_contextvars()
+
+
+@pytest.fixture
+def trader():
+    with patch('core.trader.logger', new_callable=MagicMock) as logger:
+        logger.ainfo = AsyncMock()
+        trader = Trader(order_client=AsyncMock(), timers=TimerQueue(clock=lambda: 0))
+        trader.state.last_price = 100.0
+        yield trader
+
+
+@pytest.mark.asyncio
+async def test_hold_timer_closes_position(trader):
+    trader.state.status = STATUS.ENTERING_POSITION
+    trader.state.position = Position(amount=0.001)
+    await trader.process_order(filled_order("BUY", 1000))
+
+    deadline = 1000 + settings.POSITION_HOLD_TIME * 1000
+    assert trader.timers.next_deadline() == deadline
+    await trader.timers.run_due(deadline - 1)
+    assert trader.state.status == STATUS.IN_POSITION
+
+    await trader.timers.run_due(deadline)
+    assert trader.state.status == STATUS.CLOSING_POSITION
+    trader.order_client.order_place.assert_awaited_once_with(
+        side="SELL", quantity=0.001, symbol="BTCUSDT", client_order_id=ANY
+    )
+
+
+@pytest.mark.asyncio
+async def test_hold_timer_cancelled_by_stop_loss(trader):
+    trader.state.status = STATUS.ENTERING_POSITION
+    trader.state.position = Position(amount=0.001)
+    await trader.process_order(filled_order("BUY", 1000))
+    trader.state.last_price = 90.0
+    await trader.check_position_actions()
+
+    assert trader.hold_timer is None
+    assert trader.timers.next_deadline() is None
+
+
+@pytest.mark.asyncio
+async def test_sleep_timer_enters_new_position(trader):
+    trader.state.quote_asset = "USDT"
+    trader.state.balances.update_balance("USDT", 1000.0, 0.0)
+    trader.state.status = STATUS.CLOSING_POSITION
+    trader.state.position = Position(price=100.0, amount=0.001)
+    await trader.process_order(filled_order("SELL", 5000))
+    assert trader.state.status == STATUS.SLEEPING
+
+    await trader.timers.run_due(5000 + settings.POSITION_SLEEP_TIME * 1000)
+    assert trader.state.status == STATUS.ENTERING_POSITION
+    trader.order_client.order_place.assert_awaited_once_with(
+        side="BUY", quantity=settings.POSITION_QUANTITY, symbol="BTCUSDT", client_order_id=ANY
+    )
+
+
+def test_portfolio_shares_one_timer_queue():
+    portfolio = Portfolio(["BTCUSDT", "ETHUSDT"], order_client=AsyncMock())
+    assert all(trader.timers is portfolio.timers for trader in portfolio.traders.values())
@@ -1,11 +1,14 @@
 import asyncio
+import math
 import os
 import signal
 
 import pytest
-from unittest.mock import AsyncMock, patch, MagicMock, Mock
+from unittest.mock import ANY, AsyncMock, patch, MagicMock, Mock
+from adapters.binance_wss import RequestError
+from core.order_book import OrderBooks
 from core.trader import Trader
-from models import Trade, Order, STATUS, Position
+from models import BookTicker, Trade, Order, STATUS, Position
 from settings import settings
 import logging
 
@@ -213,6 +216,14 @@ async def test_process_trade(test_trader, test_trade_json):
     assert test_trader.state.last_price == float(parsed_trade.price)
 
 
+@pytest.mark.asyncio
+async def test_process_trade_ignores_overtaken(test_trader):
+    trade = dict(event_time=2000, symbol="BTCUSDT", quantity=0.001)
+    await test_trader.process_trade(Trade(**trade, price=101.0, trade_time=2000))
+    await test_trader.process_trade(Trade(**trade, price=100.0, trade_time=1000))
+    assert (test_trader.state.last_price, test_trader.state.last_price_time) == (101.0, 2000)
+
+
 @pytest.fixture
 def event_message_connected():
     return {'channel': 'user_stream', 'event': 'connected'}
@@ -263,7 +274,7 @@ async def test_process_order_entering_position(test_trader, test_execution_repor
     assert test_trader.state.status == STATUS.IN_POSITION
     mock_async_logger.ainfo.assert_awaited_once_with(
         f"Position entered at: {order.last_executed_price}, quantity: {order.last_executed_quantity} "
-        f"{test_trader.state.base_asset}", channel="trader"
+        f"{test_trader.state.base_asset}", channel="trader", symbol="BTCUSDT"
     )
 
 
@@ -287,9 +298,9 @@ async def test_check_position_actions_take_profit(mock_order_place, test_trader,
                                           tp_price=1050)
     test_trader.state.last_price = 1060
     await test_trader.check_position_actions()
-    mock_order_place.assert_awaited_once_with(side="SELL", quantity=1)
+    mock_order_place.assert_awaited_once_with(side="SELL", quantity=1, symbol="BTCUSDT", client_order_id=ANY)
     mock_async_logger.ainfo.assert_awaited_once_with(f"Closing position (take profit): {test_trader.state.last_price}",
-                                                     channel="trader")
+                                                     channel="trader", symbol="BTCUSDT")
 
 
 @pytest.mark.asyncio
@@ -312,9 +323,9 @@ async def test_check_position_actions_stop_loss(mock_order_place, mock_async_log
                                           tp_price=1050)
     test_trader.state.last_price = 940
     await test_trader.check_position_actions()
-    mock_order_place.assert_awaited_once_with(side="SELL", quantity=1)
+    mock_order_place.assert_awaited_once_with(side="SELL", quantity=1, symbol="BTCUSDT", client_order_id=ANY)
     mock_async_logger.ainfo.assert_awaited_once_with(f"Closing position (stop loss): {test_trader.state.last_price}",
-                                                     channel="trader")
+                                                     channel="trader", symbol="BTCUSDT")
 
 
 @pytest.mark.asyncio
@@ -332,4 +343,169 @@ async def test_create_new_position_ready(mock_order_place, mock_async_logger, te
     test_trader.state.last_price = 1000
     test_trader.state.min_notional = 0.1
     await test_trader.create_new_position()
-    mock_order_place.assert_awaited_once_with(side="BUY", quantity=settings.POSITION_QUANTITY)
+    mock_order_place.assert_awaited_once_with(
+        side="BUY", quantity=settings.POSITION_QUANTITY, symbol="BTCUSDT", client_order_id=ANY
+    )
+
+
+@pytest.mark.asyncio
+@patch('adapters.binance_wss.private_wss_client.order_place', new_callable=AsyncMock)
+async def test_create_new_position_once_for_timer_and_trade(mock_order_place, mock_async_logger, test_trader):
+    test_trader.state.status = STATUS.SLEEPING
+    test_trader.state.last_price = 1000
+    test_trader.state.min_notional = 0.1
+    entered = asyncio.Event()
+
+    async def slow_log(*args, **kwargs):
+        entered.set()
+        await asyncio.sleep(0.01)  # timer task yields while entering
+
+    with patch.object(test_trader, 'check_position_limitations', side_effect=slow_log):
+        timer = asyncio.create_task(test_trader.sleep_expired())
+        await entered.wait()
+        await test_trader.create_new_position()  # trade handled meanwhile
+        await timer
+    mock_order_place.assert_awaited_once_with(
+        side="BUY", quantity=settings.POSITION_QUANTITY, symbol="BTCUSDT", client_order_id=ANY
+    )
+    assert test_trader.state.status == STATUS.ENTERING_POSITION
+
+
+@pytest.mark.asyncio
+@patch('adapters.binance_wss.private_wss_client.order_place', new_callable=AsyncMock)
+async def test_create_new_position_slippage_cap(mock_order_place, mock_async_logger, test_trader,
+                                                test_execution_report_json):
+    test_trader.state.status = STATUS.READY
+    test_trader.state.min_notional = 0.1
+    books = OrderBooks([test_trader.symbol], AsyncMock())
+    book = books.get(test_trader.symbol)
+    book.load_snapshot({"lastUpdateId": 1, "bids": [["9999.0", "1.0"]],
+                        "asks": [["10000.0", "0.0005"], ["10100.0", "1.0"]]})
+    with patch('adapters.binance_wss.BinanceWSS.books', books), \
+            patch.object(settings, 'POSITION_MAX_SLIPPAGE', 0.1):
+        await test_trader.create_new_position()  # 0.5% for 0.001
+        await test_trader.create_new_position()
+        assert test_trader.state.status == STATUS.READY
+        assert mock_async_logger.warning.call_count == 1  # postponed entry is logged once
+        mock_order_place.assert_not_awaited()
+
+        book.asks.update(10000.0, 0.001)
+        await test_trader.create_new_position()
+    mock_order_place.assert_awaited_once()
+    assert test_trader.order_quote == (10000.0, 10000.0)
+
+    order = test_trader.parse_message({**test_execution_report_json, 'L': '10010.00000000'})
+    assert test_trader.fill_slippage(order) == {"expected_price": 10000.0, "slippage": 0.1}
+
+
+def rejected_order():
+    future = asyncio.get_running_loop().create_future()
+    future.set_exception(RequestError("order.place", 400, -2010, "Account has insufficient balance"))
+    return future
+
+
+@pytest.mark.asyncio
+async def test_rejected_entry_order_starts_sleeping(mock_async_logger, test_trader):
+    test_trader.state.status = STATUS.READY
+    test_trader.state.last_price = 1000
+    test_trader.state.min_notional = 0.1
+    with patch('adapters.binance_wss.private_wss_client.order_place', new_callable=AsyncMock) as mock_order_place:
+        mock_order_place.return_value = rejected_order()
+        await test_trader.create_new_position()
+        await asyncio.sleep(0)
+
+    assert test_trader.state.status == STATUS.SLEEPING
+    assert test_trader.state.position is None
+    assert test_trader.timers.next_deadline() == test_trader.state.sleeping_at
+
+
+@pytest.mark.asyncio
+async def test_rejected_close_order_keeps_position(mock_async_logger, test_trader):
+    test_trader.state.status = STATUS.IN_POSITION
+    test_trader.state.position = Position(price=1000, amount=1, position_time=1713797483678, sl_price=950,
+                                          tp_price=1050)
+    test_trader.state.last_price = 940
+    with patch('adapters.binance_wss.private_wss_client.order_place', new_callable=AsyncMock) as mock_order_place:
+        mock_order_place.return_value = rejected_order()
+        await test_trader.check_position_actions()
+        await asyncio.sleep(0)
+
+    assert test_trader.state.status == STATUS.IN_POSITION
+    assert test_trader.hold_timer is not None
+
+
+@pytest.mark.asyncio
+async def test_rejected_close_order_not_resent_on_next_trade(mock_async_logger):
+    now = [1713797490.0]
+    trader = Trader(order_client=AsyncMock(), clock=lambda: now[0])
+    trader.state.status = STATUS.IN_POSITION
+    trader.state.position = Position(price=1000, amount=1, position_time=1713797483678, sl_price=950, tp_price=1050)
+    trader.state.last_price = 940
+    trader.order_client.order_place.side_effect = lambda **kwargs: rejected_order()
+    await trader.check_position_actions()
+    await asyncio.sleep(0)
+    assert trader.close_retry_at == 1713797491000
+
+    await trader.check_position_actions()  # next trade, SL still crossed
+    assert trader.order_client.order_place.await_count == 1
+
+    now[0] += 1.0
+    await trader.check_position_actions()
+    await asyncio.sleep(0)
+    assert trader.order_client.order_place.await_count == 2
+    assert trader.close_retry_at == 1713797493000  # backoff doubled
+
+
+@pytest.mark.asyncio
+async def test_position_levels(test_trader):
+    with patch.object(settings, 'POSITION_SL_PERCENT', 0.5), patch.object(settings, 'POSITION_TP_PERCENT', 1.0):
+        assert test_trader.position_levels(1000.0) == pytest.approx((995.0, 1010.0))
+
+    with patch.object(settings, 'POSITION_LEVELS', "volatility"), patch.object(settings, 'INDICATOR_WINDOW', 3), \
+            patch.object(settings, 'POSITION_SL_MULTIPLIER', 1.0), patch.object(settings, 'POSITION_TP_MULTIPLIER', 2.0):
+        trader = Trader(order_client=AsyncMock())
+        assert trader.position_levels(1000.0) == pytest.approx((997.5, 1002.5))  # percents until warmed up
+        for price in (1000.0, 1010.0, 1000.0):
+            await trader.process_trade(Trade(symbol="BTCUSDT", price=price, quantity=1.0, trade_time=1000,
+                                             event_time=1000))
+        unit = 1000.0 * math.sqrt(2 * math.log(1.01) ** 2)
+        assert trader.position_levels(1000.0) == pytest.approx((1000.0 - unit, 1000.0 + 2 * unit))
+
+
+@pytest.mark.asyncio
+async def test_book_ticker_not_weighted_in_vwap():
+    with patch.object(settings, 'POSITION_LEVELS', "atr"):
+        trader = Trader(order_client=AsyncMock())
+    await trader.process_trade(Trade(symbol="BTCUSDT", price=1000.0, quantity=1.0, trade_time=1000, event_time=1000))
+    await trader.process_trade(BookTicker(symbol="BTCUSDT", price=1010.0, quantity=50.0, trade_time=1500))
+    assert trader.indicators.vwap == 1000.0  # bid size is not a traded volume
+    assert (trader.indicators.bar_high, trader.state.last_price_time) == (1010.0, 1500)
+
+
+@pytest.mark.asyncio
+@patch('adapters.binance_wss.private_wss_client.order_place', new_callable=AsyncMock)
+async def test_fixed_point_position(mock_order_place, test_exchangeinfo_json, test_execution_report_json,
+                                    mock_async_logger):
+    with patch.object(settings, 'FIXED_POINT', True), patch.object(settings, 'POSITION_TP_PERCENT', 0.1):
+        trader = Trader(order_client=AsyncMock())
+        trader.parse_exchange_info(test_exchangeinfo_json["result"])
+        assert trader.fixed and trader.fixed.price_decimals == 2
+        trader.state.base_asset = "BTC"
+        trader.state.status = STATUS.ENTERING_POSITION
+        trader.state.position = Position(amount=0.001)
+        await trader.process_order(trader.parse_message(test_execution_report_json))  # filled at 66250.98
+
+    position = trader.state.position
+    assert (position.price_units, position.amount_units) == (6625098, 100)
+    assert (position.sl_units, position.tp_units) == (6608535, 6631724)  # 66085.35..., 66317.23098 up to the tick
+    trader.state.last_price = 66317.23
+    await trader.check_position_actions()
+    assert trader.state.status == STATUS.IN_POSITION
+    trader.state.last_price = 66317.24
+    await trader.check_position_actions()
+    assert trader.state.status == STATUS.CLOSING_POSITION
+
+    trader.state.total_pnl = 0.1
+    closing = {**test_execution_report_json, 'S': 'SELL', 'L': '66317.24000000', 'n': '0.06631724', 'N': 'USDT'}
+    assert trader.pnl_calculation(trader.parse_message(closing)) == -0.000057  # 0.06626 profit - 0.06631724
+    assert trader.state.total_pnl == 0.09994276 and trader.state.total_sl_trades == 1  # exact, no float drift